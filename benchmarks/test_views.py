@@ -0,0 +1,63 @@
+"""
+pytest-benchmark suite for the main views, sharing the scenarios in tracker/bench.py.
+
+Needs pytest-django and pytest-benchmark:
+
+    pip install pytest-django pytest-benchmark
+    DJANGO_SETTINGS_MODULE=expiry_tracker.settings pytest benchmarks/ --benchmark-json=bench.json
+    pytest benchmarks/ --benchmark-compare   # diff against the last saved run
+
+BENCH_USERS / BENCH_ITEMS / BENCH_LOGS scale the seeded fixture.
+"""
+import io
+import os
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+pytest.importorskip('pytest_django')
+
+from django.conf import settings as django_settings  # noqa: E402
+
+if not django_settings.configured:
+    pytest.skip('Set DJANGO_SETTINGS_MODULE (or pass --ds) to run the benchmarks', allow_module_level=True)
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from tracker import bench  # noqa: E402
+
+
+@pytest.fixture
+def bench_user(db, settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    call_command(
+        'seed',
+        users=int(os.environ.get('BENCH_USERS', 20)),
+        items_per_user=int(os.environ.get('BENCH_ITEMS', 500)),
+        logs_per_user=int(os.environ.get('BENCH_LOGS', 1000)),
+        stdout=io.StringIO(),
+    )
+    return User.objects.filter(username__startswith='seed_user_').order_by('username').first()
+
+
+@pytest.mark.parametrize('view', list(bench.SCENARIOS))
+def test_view(benchmark, client, bench_user, view):
+    client.force_login(bench_user)
+    ctx = bench.make_context(bench_user, iterations=200)
+    scenario = bench.SCENARIOS[view]
+    calls = 0
+
+    def counted(*args):
+        nonlocal calls
+        calls += 1
+        return scenario(*args)
+
+    timer = bench.QueryTimer()
+    with connection.execute_wrapper(timer):
+        response = benchmark(counted, client, ctx)
+
+    assert response.status_code in (200, 302)
+    benchmark.extra_info['queries_per_call'] = timer.count / calls
+    benchmark.extra_info['db_ms_per_call'] = round(timer.seconds * 1000 / calls, 3)
@@ -21,6 +21,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover every other middleware (no-op unless TRACKER_METRICS=1)
+    'tracker.middleware.RequestMetricsMiddleware',
+    # No-op unless a read replica is configured
+    'tracker.middleware.PrimaryPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,18 +54,63 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'expiry_tracker.wsgi.application'
 
-# Database: PostgreSQL
-DATABASES = {
+# Database: PostgreSQL, configured from the environment (defaults: the local dev database)
+#   DATABASE_HOST, DATABASE_PORT, DATABASE_NAME, DATABASE_USER, DATABASE_PASSWORD, DATABASE_ENGINE
+# DATABASE_POOL=1 keeps a psycopg 3 connection pool per process (pip install "psycopg[pool]"),
+# sized by DATABASE_POOL_MIN_SIZE/DATABASE_POOL_MAX_SIZE; use it under ASGI (uvicorn).
+# Otherwise connections close after every request, unless DATABASE_CONN_MAX_AGE (seconds)
+# is set to let each worker thread reuse its own - only under WSGI: ASGI runs every
+# request in a new thread, so persistent connections would pile up unused.
+# Any DATABASE_REPLICA_* variable (same names, unset ones inherited) adds a read replica
+# used by the read-only pages, exports and nightly jobs; see tracker/routers.py.
+def _database(prefix, fallback):
+    config = {key: os.environ.get(f'{prefix}_{key}', default) for key, default in fallback.items()}
+    if os.environ.get('DATABASE_POOL') == '1' and config['ENGINE'] == 'django.db.backends.postgresql':
+        # Pooled connections are returned to the pool at the end of every request
+        config['OPTIONS'] = {'pool': {
+            'min_size': int(os.environ.get('DATABASE_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DATABASE_POOL_MAX_SIZE', 10)),
+        }}
+    else:
+        config['CONN_MAX_AGE'] = int(os.environ.get('DATABASE_CONN_MAX_AGE', 0))
+        config['CONN_HEALTH_CHECKS'] = True
+    return config
+
+
+_DATABASE_SETTINGS = {
+    'ENGINE': 'django.db.backends.postgresql',
+    'NAME': 'innovatex_db',       # Make sure you created this DB in Postgres
+    'USER': 'postgres',           # Default Postgres user
+    'PASSWORD': '123123',  # <--- CHANGE THIS (or set DATABASE_PASSWORD)
+    'HOST': 'localhost',
+    'PORT': '5432',
+}
+DATABASES = {'default': _database('DATABASE', _DATABASE_SETTINGS)}
+if any(name.startswith('DATABASE_REPLICA_') for name in os.environ):
+    DATABASES['replica'] = _database('DATABASE_REPLICA', {
+        key: DATABASES['default'][key] for key in _DATABASE_SETTINGS
+    })
+    # Under `manage.py test` the replica is a second connection to the test database.
+    # It only sees committed rows, so run the suite with DATABASE_REPLICA_* set only
+    # for the replica tests (tracker.tests.ReplicaReadTests)
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['tracker.routers.PrimaryReplicaRouter']
+# How long a client's replica reads stay on the primary after it writes
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+
+# Cache: per-process locmem by default; point at Redis/Memcached in production, e.g.
+# DJANGO_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache DJANGO_CACHE_LOCATION=redis://127.0.0.1:6379
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'innovatex_db',       # Make sure you created this DB in Postgres
-        'USER': 'postgres',           # Default Postgres user
-        'PASSWORD': '123123',  # <--- CHANGE THIS to your actual password
-        'HOST': 'localhost',
-        'PORT': '5432',
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', 'food-tracker'),
     }
 }
 
+# Request metrics: Server-Timing headers and the /metrics endpoint
+TRACKER_METRICS_ENABLED = os.environ.get('TRACKER_METRICS', '0') == '1'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -87,4 +136,7 @@ import os
 MEDIA_URL = '/receipts/'  
 
 # 2. The folder on your computer where files are saved
-MEDIA_ROOT = os.path.join(BASE_DIR, 'receipts')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'receipts')
+
+# 3. Receipt thumbnails: 'thread' (background worker), 'sync' or 'off' (manage.py process_receipts)
+RECEIPT_WORKER = os.environ.get('RECEIPT_WORKER', 'thread')
\ No newline at end of file
@@ -1,3 +1,132 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db import transaction
+from django.template.response import TemplateResponse
 
-# Register your models here.
+from . import rollups, search
+from .models import ConsumptionLog, FoodItem, Profile, Resource
+from .pagination import EstimatedCountPaginator
+from .services import delete_items_in_bulk, delete_logs_in_bulk, shift_expiry_in_bulk
+
+# --- Admin ---
+# Built for tables with millions of rows:
+#   - no COUNT(*): EstimatedCountPaginator on PostgreSQL and no "N total" query
+#   - owners are joined in (list_select_related) and picked by id (raw_id_fields)
+#     instead of a <select> of every user
+#   - search only hits indexes: an exact username, or the full-text index
+#     (tracker/search.py) for names and titles; sorting only on indexed columns
+#   - date hierarchies on indexed date columns
+#   - delete/shift actions run set-based (tracker/services.py), not per row
+#     through the delete collector and signals
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    full_text_search = False  # also match the term against tracker/search.py's index
+    set_based_delete = False  # replaces the stock delete_selected with a delete_selected_<model> action
+
+    def get_search_results(self, request, queryset, search_term):
+        # search_fields hold exact, indexed lookups like =user__username
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        matches = search.matching_ids(self.model, search_term) if self.full_text_search else None
+        if matches is not None:
+            results |= queryset.filter(pk__in=matches)
+        return results, may_have_duplicates
+
+    def get_actions(self, request):
+        # The stock delete_selected collects, signals and deletes row by row
+        actions = super().get_actions(request)
+        if self.set_based_delete:
+            actions.pop('delete_selected', None)
+        return actions
+
+
+def _confirm_delete(modeladmin, request, queryset, delete):
+    # A one-page "are you sure" like the stock delete action, without collecting related objects
+    if request.POST.get('post') == 'yes':
+        deleted = delete(queryset)
+        modeladmin.message_user(request, f'Deleted {deleted} {modeladmin.opts.verbose_name_plural}.', messages.SUCCESS)
+        return None
+    return TemplateResponse(request, 'admin/tracker/bulk_delete_confirmation.html', {
+        **modeladmin.admin_site.each_context(request),
+        'title': 'Are you sure?',
+        'opts': modeladmin.opts,
+        'selected': request.POST.getlist(admin.helpers.ACTION_CHECKBOX_NAME),
+        'select_across': request.POST.get('select_across') == '1',
+        'action': request.POST.get('action'),
+    })
+
+
+@admin.register(FoodItem)
+class FoodItemAdmin(LargeTableAdmin):
+    list_display = ('name', 'user', 'category', 'quantity', 'expiry_date', 'updated_at')
+    list_select_related = ('user',)
+    list_filter = ('category',)
+    sortable_by = ('expiry_date',)
+    search_fields = ('=user__username',)
+    full_text_search = True
+    date_hierarchy = 'expiry_date'
+    raw_id_fields = ('user', 'receipt')
+    readonly_fields = ('created_at', 'updated_at', 'sync_version')
+    actions = ('delete_selected_items', 'extend_expiry_week')
+    set_based_delete = True
+
+    @admin.action(description='Delete selected food items', permissions=['delete'])
+    def delete_selected_items(self, request, queryset):
+        return _confirm_delete(self, request, queryset, delete_items_in_bulk)
+
+    @admin.action(description='Extend expiry by 7 days', permissions=['change'])
+    def extend_expiry_week(self, request, queryset):
+        changed = shift_expiry_in_bulk(queryset, 7)
+        self.message_user(request, f'Moved the expiry date of {changed} items.', messages.SUCCESS)
+
+
+@admin.register(ConsumptionLog)
+class ConsumptionLogAdmin(LargeTableAdmin):
+    list_display = ('food_name', 'user', 'category', 'quantity', 'date_consumed')
+    list_select_related = ('user',)
+    sortable_by = ('date_consumed',)
+    search_fields = ('=user__username',)
+    date_hierarchy = 'date_consumed'
+    raw_id_fields = ('user', 'source_item')
+    readonly_fields = ('updated_at', 'sync_version')
+    actions = ('delete_selected_logs',)
+    set_based_delete = True
+
+    @admin.action(description='Delete selected consumption logs', permissions=['delete'])
+    def delete_selected_logs(self, request, queryset):
+        return _confirm_delete(self, request, queryset, delete_logs_in_bulk)
+
+    # Every way of writing a log keeps the daily rollups in step with it
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            if change:
+                rollups.add_consumption([ConsumptionLog.objects.select_for_update().get(pk=obj.pk)], sign=-1)
+            super().save_model(request, obj, form, change)
+            rollups.add_consumption([obj])
+
+    def delete_model(self, request, obj):
+        delete_logs_in_bulk(ConsumptionLog.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        delete_logs_in_bulk(queryset)
+
+
+@admin.register(Resource)
+class ResourceAdmin(LargeTableAdmin):
+    # Saved and deleted one by one on purpose: the signals move the catalog version
+    list_display = ('title', 'category', 'resource_type')
+    list_filter = ('resource_type', 'category')
+    search_fields = ('=category',)
+    full_text_search = True
+
+
+@admin.register(Profile)
+class ProfileAdmin(LargeTableAdmin):
+    list_display = ('user', 'household_size', 'budget_range', 'location')
+    list_select_related = ('user',)
+    list_filter = ('budget_range',)
+    sortable_by = ()
+    search_fields = ('=user__username',)
+    raw_id_fields = ('user',)
@@ -0,0 +1,177 @@
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from .models import ConsumptionLog, FoodItem, Profile, UserInsights, WasteLog
+
+# --- Insights engine ---
+# Pulls the raw rows for a set of users with one values_list pass per table,
+# turns them into NumPy columns and computes every metric for every user at
+# once with bincount/lexsort, instead of one ORM aggregate per user per metric.
+# `manage.py compute_insights` runs it over all users nightly and stores the
+# results in UserInsights; the insights page reads the user's row for today
+# (cached until midnight) and falls back to a one-user run that stores its own.
+
+WINDOW_DAYS = 90
+TOP_ITEMS = 10
+# Days-to-expiry buckets for the current inventory: (label, upper bound inclusive)
+EXPIRY_BUCKETS = [('Expired', -1), ('0-3 days', 3), ('4-7 days', 7), ('8-14 days', 14),
+                  ('15-30 days', 30), ('30+ days', None)]
+KEY_PREFIX = 'insights'
+
+
+def insights_key(user_id, today=None):
+    return f'{KEY_PREFIX}:{user_id}:{(today or date.today()).isoformat()}'
+
+
+def _seconds_until_midnight():
+    tomorrow = datetime.combine(date.today() + timedelta(days=1), time.min)
+    return max(int((tomorrow - datetime.now()).total_seconds()), 1)
+
+
+def _columns(queryset, *fields):
+    """One values_list pass -> a tuple of lists, one per field."""
+    rows = list(queryset.values_list(*fields).iterator(chunk_size=5000))
+    if not rows:
+        return tuple([] for _ in fields)
+    return tuple(map(list, zip(*rows)))
+
+
+def _codes(values, vocabulary):
+    # Strings -> dense integer codes against a shared, sorted vocabulary
+    return np.searchsorted(vocabulary, np.asarray(values, dtype=object)).astype(np.int64)
+
+
+def _group_sum(keys, weights, size):
+    return np.bincount(keys, weights=weights, minlength=size) if len(keys) else np.zeros(size)
+
+
+def compute(user_ids, today=None, window_days=WINDOW_DAYS):
+    """Returns {user_id: insights} for every id in user_ids (a list, not a queryset)."""
+    today = today or date.today()
+    since = today - timedelta(days=window_days - 1)
+    users = np.asarray(sorted(set(user_ids)), dtype=np.int64)
+    if not len(users):
+        return {}
+
+    in_users = Q(user_id__in=users.tolist())
+    log_user, log_name, log_cat, log_qty, log_cost = _columns(
+        ConsumptionLog.objects.filter(in_users, date_consumed__gte=since, date_consumed__lte=today),
+        'user_id', 'food_name', 'category', 'quantity', 'cost_per_unit')
+    item_user, item_cat, item_qty, item_cost, item_expiry = _columns(
+        FoodItem.objects.filter(in_users), 'user_id', 'category', 'quantity', 'cost_per_unit', 'expiry_date')
+    waste_user, waste_cat, waste_qty, waste_cost = _columns(
+        WasteLog.objects.filter(in_users, date_wasted__gte=since, date_wasted__lte=today),
+        'user_id', 'category', 'quantity', 'cost_per_unit')
+    household = dict(Profile.objects.filter(in_users).values_list('user_id', 'household_size'))
+
+    categories = np.asarray(sorted(set(log_cat) | set(item_cat) | set(waste_cat)), dtype=object)
+    names = np.asarray(sorted(set(log_name)), dtype=object)
+    n_users, n_cats, n_names = len(users), len(categories), len(names)
+
+    # Row -> position of its user in `users`
+    log_u = np.searchsorted(users, np.asarray(log_user, dtype=np.int64))
+    item_u = np.searchsorted(users, np.asarray(item_user, dtype=np.int64))
+    waste_u = np.searchsorted(users, np.asarray(waste_user, dtype=np.int64))
+
+    log_qty = np.asarray(log_qty, dtype=np.float64)
+    log_value = log_qty * np.asarray(log_cost, dtype=np.float64)
+    item_qty = np.asarray(item_qty, dtype=np.float64)
+    item_value = item_qty * np.asarray(item_cost, dtype=np.float64)
+    waste_value = np.asarray(waste_qty, dtype=np.float64) * np.asarray(waste_cost, dtype=np.float64)
+    days_left = np.asarray([(d - today).days for d in item_expiry], dtype=np.int64)
+
+    # Waste cost per (user, category): the waste ledger plus expired stock still on the shelf
+    expired = days_left < 0
+    waste_by_cat = (
+        _group_sum(waste_u * n_cats + _codes(waste_cat, categories), waste_value, n_users * n_cats)
+        + _group_sum((item_u * n_cats + _codes(item_cat, categories))[expired], item_value[expired], n_users * n_cats)
+    ).reshape(n_users, n_cats)
+    consumed_by_cat = _group_sum(log_u * n_cats + _codes(log_cat, categories), log_value,
+                                 n_users * n_cats).reshape(n_users, n_cats)
+
+    # Consumption rate per (user, item name), units per day over the window. Sparse:
+    # only the pairs that occur, sorted by user, then rate (desc), then name.
+    pairs, pair_of_row = np.unique(log_u * n_names + _codes(log_name, names), return_inverse=True)
+    pair_units = np.bincount(pair_of_row, weights=log_qty, minlength=len(pairs))
+    pair_user, pair_name = pairs // max(n_names, 1), pairs % max(n_names, 1)
+    order = np.lexsort((pair_name, -pair_units, pair_user))
+    pair_user, pair_name, pair_units = pair_user[order], pair_name[order], pair_units[order]
+    first_pair = np.searchsorted(pair_user, np.arange(n_users + 1))
+
+    # Days-to-expiry histogram per user
+    bounds = np.asarray([b for _, b in EXPIRY_BUCKETS[:-1]])
+    bucket = np.searchsorted(bounds, days_left, side='left')
+    histogram = _group_sum(item_u * len(EXPIRY_BUCKETS) + bucket, None,
+                           n_users * len(EXPIRY_BUCKETS)).reshape(n_users, len(EXPIRY_BUCKETS))
+
+    units_eaten = _group_sum(log_u, log_qty, n_users)
+    inventory_value = _group_sum(item_u, item_value, n_users)
+    size = np.asarray([max(household.get(int(u), 1), 1) for u in users], dtype=np.float64)
+    total_waste = waste_by_cat.sum(axis=1)
+    total_consumed = consumed_by_cat.sum(axis=1)
+    spent = total_waste + total_consumed
+    waste_share = np.divide(total_waste, spent, out=np.zeros(n_users), where=spent > 0)
+
+    results = {}
+    for i, user_id in enumerate(users.tolist()):
+        results[user_id] = {
+            'today': today,
+            'window_days': window_days,
+            'household_size': int(size[i]),
+            'waste_by_category': [
+                {'category': categories[c], 'wasted': round(float(waste_by_cat[i, c]), 2),
+                 'consumed': round(float(consumed_by_cat[i, c]), 2)}
+                for c in np.flatnonzero(waste_by_cat[i] + consumed_by_cat[i])
+            ],
+            'consumption_rates': [
+                {'name': names[n], 'per_day': round(float(units / window_days), 3)}
+                for n, units in zip(pair_name[first_pair[i]:first_pair[i + 1]][:TOP_ITEMS],
+                                    pair_units[first_pair[i]:first_pair[i + 1]][:TOP_ITEMS])
+            ],
+            'expiry_histogram': [
+                {'label': label, 'count': int(histogram[i, b])} for b, (label, _) in enumerate(EXPIRY_BUCKETS)
+            ],
+            'total_wasted': round(float(total_waste[i]), 2),
+            'total_consumed': round(float(total_consumed[i]), 2),
+            'waste_share': round(float(waste_share[i]), 4),
+            'per_person': {
+                'units_per_day': round(float(units_eaten[i] / window_days / size[i]), 3),
+                'wasted': round(float(total_waste[i] / size[i]), 2),
+                'inventory_value': round(float(inventory_value[i] / size[i]), 2),
+            },
+        }
+    return results
+
+
+def store(results, today=None):
+    today = today or date.today()
+    rows = [UserInsights(user_id=user_id, data={k: v for k, v in data.items() if k != 'today'}, computed_on=today)
+            for user_id, data in results.items()]
+    with transaction.atomic():
+        stale = UserInsights.objects.filter(user_id__in=list(results))
+        stale._raw_delete(stale.db)
+        UserInsights.objects.bulk_create(rows)
+
+
+def _stored(user_id, today):
+    data = UserInsights.objects.filter(user_id=user_id, computed_on=today).values_list('data', flat=True).first()
+    return None if data is None else {**data, 'today': today}
+
+
+def get_insights(user):
+    """Tonight's precomputed insights for the user, or a fresh one-user run on a miss."""
+    today = date.today()
+    key = insights_key(user.pk, today)
+    insights = cache.get(key)
+    if insights is not None:
+        return insights
+    insights = _stored(user.pk, today)
+    if insights is None:
+        insights = compute([user.pk], today)[user.pk]
+        store({user.pk: insights}, today)
+    cache.set(key, insights, timeout=_seconds_until_midnight())
+    return insights
@@ -0,0 +1,150 @@
+from django.http import JsonResponse
+from django.views.decorators.http import condition, require_GET
+
+from . import versions
+from .models import ConsumptionLog, FoodItem, Tombstone
+from .pagination import KeysetPaginator
+from .recommendations import get_index
+
+# --- JSON API ---
+# Read-only JSON for mobile and widget clients, authenticated by the normal
+# session. Rows are sent as arrays under a shared `fields` header. The list
+# endpoints carry a strong ETag built from a change counter (tracker/versions.py),
+# so a poll with a matching If-None-Match gets a 304 after a single primary-key
+# lookup, without running the inventory queries; /api/sync/ sends only changes.
+
+ITEM_FIELDS = ['id', 'name', 'category', 'quantity', 'expiry_date', 'cost_per_unit']
+LOG_FIELDS = ['id', 'food_name', 'category', 'quantity', 'cost_per_unit', 'date_consumed']
+RESOURCE_FIELDS = ['id', 'title', 'description', 'url', 'category', 'resource_type']
+LOG_PAGE_SIZE = 200
+
+
+def _json(payload, status=200):
+    return JsonResponse(payload, status=status, json_dumps_params={'separators': (',', ':')})
+
+
+def _unauthorized():
+    return _json({'error': 'authentication required'}, status=401)
+
+
+def _counter(request, key):
+    # etag_func and last_modified_func both need it; read it once per request
+    cached = getattr(request, '_api_counter', None)
+    if cached is None or cached[0] != key:
+        request._api_counter = (key, versions.get(key))
+    return request._api_counter[1]
+
+
+def _inventory_key(request):
+    return versions.inventory_key(request.user.pk) if request.user.is_authenticated else None
+
+
+def inventory_etag(request, *args, **kwargs):
+    key = _inventory_key(request)
+    if key is None:
+        return None
+    # The user id is part of it: two accounts on one device must not share 304s
+    return f'inv-{request.user.pk}-{_counter(request, key)[0]}'
+
+
+def inventory_last_modified(request, *args, **kwargs):
+    key = _inventory_key(request)
+    return _counter(request, key)[1] if key else None
+
+
+def resources_etag(request, *args, **kwargs):
+    return f'res-{_counter(request, versions.RESOURCES_KEY)[0]}'
+
+
+def resources_last_modified(request, *args, **kwargs):
+    return _counter(request, versions.RESOURCES_KEY)[1]
+
+
+@require_GET
+@condition(etag_func=inventory_etag, last_modified_func=inventory_last_modified)
+def items(request):
+    if not request.user.is_authenticated:
+        return _unauthorized()
+    rows = FoodItem.objects.filter(user=request.user).order_by('expiry_date', 'id').values_list(*ITEM_FIELDS)
+    return _json({
+        'version': _counter(request, _inventory_key(request))[0],
+        'fields': ITEM_FIELDS,
+        'items': list(rows),
+    })
+
+
+@require_GET
+@condition(etag_func=inventory_etag, last_modified_func=inventory_last_modified)
+def logs(request):
+    # Newest first; follow `next` (?after=<cursor>) for older pages
+    if not request.user.is_authenticated:
+        return _unauthorized()
+    queryset = ConsumptionLog.objects.filter(user=request.user).only(*LOG_FIELDS)
+    page = KeysetPaginator(queryset, keys=('date_consumed', 'id'), per_page=LOG_PAGE_SIZE).page(
+        after=request.GET.get('after'))
+    return _json({
+        'version': _counter(request, _inventory_key(request))[0],
+        'fields': LOG_FIELDS,
+        'logs': [[getattr(log, field) for field in LOG_FIELDS] for log in page],
+        'next': page.next_cursor,
+    })
+
+
+@require_GET
+@condition(etag_func=resources_etag, last_modified_func=resources_last_modified)
+def resources(request):
+    # Served from the recommendation index of the version in the ETag: no
+    # Resource query on a cache hit, and the body always matches the ETag
+    if not request.user.is_authenticated:
+        return _unauthorized()
+    current = _counter(request, versions.RESOURCES_KEY)[0]
+    rows = [
+        [getattr(resource, field) for field in RESOURCE_FIELDS]
+        for by_type in get_index(current).values() for ranked in by_type.values() for resource in ranked
+    ]
+    return _json({
+        'version': current,
+        'fields': RESOURCE_FIELDS,
+        'resources': sorted(rows),
+    })
+
+
+def _token(raw):
+    try:
+        return max(int(raw), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+@require_GET
+def sync(request):
+    """
+    Delta sync for offline clients. Without `since` (or with a token from a
+    reset database) it returns the full inventory and logs; with `since=<token>`
+    only rows written and deleted after it. Either way `token` is the value to
+    send next time. Every read is a range-scan on (user, sync_version).
+    """
+    if not request.user.is_authenticated:
+        return _unauthorized()
+    user = request.user
+    version = _counter(request, _inventory_key(request))[0]
+    since = _token(request.GET.get('since'))
+    full = since is None or since > version
+
+    # Rows stamped after `version` committed after the counter was read: next sync
+    window = {'sync_version__lte': version} if full else {'sync_version__gt': since, 'sync_version__lte': version}
+    items = FoodItem.objects.filter(user=user, **window).order_by('id').values_list(*ITEM_FIELDS)
+    logs = ConsumptionLog.objects.filter(user=user, **window).order_by('id').values_list(*LOG_FIELDS)
+    deleted = {'item': [], 'log': []}
+    if not full:
+        tombstones = Tombstone.objects.filter(user=user, **window).order_by('object_id')
+        for kind, object_id in tombstones.values_list('kind', 'object_id'):
+            deleted[kind].append(object_id)
+
+    return _json({
+        'token': str(version),
+        'full': full,
+        'items': {'fields': ITEM_FIELDS, 'rows': list(items)},
+        'logs': {'fields': LOG_FIELDS, 'rows': list(logs)},
+        'deleted': {'items': deleted['item'], 'logs': deleted['log']},
+    })
@@ -1,6 +1,23 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def _reinstall_search(sender, using, **kwargs):
+    # A migration that rebuilds tracker_fooditem/tracker_resource on SQLite drops
+    # the FTS triggers with the old table; put them back (a no-op when present)
+    from django.db import connections
+    from .search import install
+    if connections[using].vendor == 'sqlite':
+        install(connections[using])
 
 
 class TrackerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tracker'
+
+    def ready(self):
+        # Connects the dashboard summary / resource index / catalog invalidation,
+        # receipt refcount and change counter signals, and keeps the search
+        # index installed
+        from . import catalog, receipts, recommendations, summary, versions  # noqa: F401
+        post_migrate.connect(_reinstall_search, sender=self)
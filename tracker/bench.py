@@ -0,0 +1,344 @@
+import asyncio
+import base64
+import io
+import json
+import math
+import threading
+import time
+from datetime import date, timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from .models import FoodItem
+
+# --- Per-view benchmarks ---
+# Each scenario is a function (client, ctx) -> response that hits one view
+# through the Django test client. `measure()` runs a scenario N times and
+# records wall time, SQL query count and time spent inside the database.
+
+# 1x1 transparent PNG, so upload_image does not depend on Pillow being installed
+TINY_PNG = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII='
+)
+
+
+def dashboard(client, ctx):
+    return client.get(reverse('dashboard'))
+
+
+def dashboard_filter(client, ctx):
+    # What a filter click fetches (see views.dashboard_items)
+    return client.get(reverse('dashboard_items'), {'status': 'soon'}, HTTP_X_FRAGMENT='1')
+
+
+def consumption_history(client, ctx):
+    return client.get(reverse('history'))
+
+
+def resources(client, ctx):
+    return client.get(reverse('resources'))
+
+
+def search_as_you_type(client, ctx):
+    # One keystroke's fetch (see views.search)
+    return client.get(reverse('search'), {'q': 'ite'}, HTTP_X_FRAGMENT='1')
+
+
+def add_item(client, ctx):
+    return client.post(reverse('add_item'), {
+        'name': 'Bench Milk',
+        'category': 'Dairy',
+        'quantity': 2,
+        'expiry_date': (date.today() + timedelta(days=5)).isoformat(),
+        'cost_per_unit': '1.50',
+    })
+
+
+def log_food(client, ctx):
+    return client.post(reverse('log_food', args=[ctx['item'].pk]), {'quantity': 1})
+
+
+def log_food_fragment(client, ctx):
+    return client.post(reverse('log_food', args=[ctx['item'].pk]), {'quantity': 1}, HTTP_X_FRAGMENT='1')
+
+
+def upload_image(client, ctx):
+    upload = SimpleUploadedFile('receipt.png', TINY_PNG, content_type='image/png')
+    return client.post(reverse('upload_image', args=[ctx['item'].pk]), {'receipt_image': upload})
+
+
+SCENARIOS = {
+    'dashboard': dashboard,
+    'dashboard_filter': dashboard_filter,
+    'consumption_history': consumption_history,
+    'resources': resources,
+    'search_as_you_type': search_as_you_type,
+    'add_item': add_item,
+    'log_food': log_food,
+    'log_food_fragment': log_food_fragment,
+    'upload_image': upload_image,
+}
+
+
+def pick_user(username=None):
+    # Default: the first synthetic user (see `seed --users`), then the demo user
+    from django.contrib.auth.models import User
+
+    if username:
+        return User.objects.filter(username=username).first()
+    return (User.objects.filter(username__startswith='seed_user_').order_by('username').first()
+            or User.objects.filter(username='demo_user').first())
+
+
+def make_context(user, iterations):
+    # log_food eats one unit per request, so give it enough to never finish the item
+    item = FoodItem.objects.create(
+        user=user, name='Bench Rice', category='Grains', quantity=iterations * len(SCENARIOS) + 10,
+        expiry_date=date.today() + timedelta(days=30),
+    )
+    return {'item': item}
+
+
+def percentile(samples, pct):
+    # Nearest-rank percentile; fine for the few hundred samples a run takes
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class QueryTimer:
+    """
+    connection.execute_wrapper hook counting queries and their total time.
+
+    Only time inside cursor.execute() is counted; rows of a large result that
+    the driver fetches lazily afterwards show up as view time instead.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def measure(scenario, client, ctx, iterations, warmup=2):
+    for _ in range(warmup):
+        scenario(client, ctx)
+
+    latencies, queries, db_times, statuses = [], [], [], set()
+    for _ in range(iterations):
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            started = time.perf_counter()
+            response = scenario(client, ctx)
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(timer.count)
+        db_times.append(timer.seconds * 1000)
+        statuses.add(response.status_code)
+
+    return {
+        'iterations': iterations,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'queries': percentile(queries, 50),
+        'db_ms': round(percentile(db_times, 50), 3),
+        'status_codes': sorted(statuses),
+    }
+
+
+def run(user, iterations=50, views=None):
+    client = Client()
+    client.force_login(user)
+    ctx = make_context(user, iterations)
+    results = {}
+    for name in views or SCENARIOS:
+        results[name] = measure(SCENARIOS[name], client, ctx, iterations)
+    return {
+        'meta': {
+            'iterations': iterations,
+            'user': user.username,
+            'items': FoodItem.objects.filter(user=user).count(),
+            'database': connection.vendor,
+            'date': date.today().isoformat(),
+        },
+        'views': results,
+    }
+
+
+def compare(current, baseline, tolerance=0.2):
+    """Returns human-readable regressions: p95 or query count up by more than `tolerance`."""
+    regressions = []
+    for name, stats in current['views'].items():
+        base = baseline.get('views', {}).get(name)
+        if not base:
+            continue
+        if stats['queries'] > base['queries']:
+            regressions.append(f"{name}: queries {base['queries']} -> {stats['queries']}")
+        if base['p95_ms'] and stats['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95_ms']:.1f}ms -> {stats['p95_ms']:.1f}ms")
+    return regressions
+
+
+def load(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def save(results, path):
+    with open(path, 'w') as fh:
+        json.dump(results, fh, indent=2, sort_keys=True)
+
+
+# --- Concurrent-client throughput: WSGI vs ASGI ---
+# The same Django app is driven through WSGIHandler by N client threads (what a
+# threaded WSGI server does) and through ASGIHandler by N client tasks on one
+# event loop (what uvicorn/daphne do), without a socket in between, so the
+# numbers compare the two request paths rather than the HTTP servers.
+
+CONCURRENT_VIEWS = {
+    'dashboard': 'dashboard',
+    'consumption_history': 'history',
+    'resources': 'resources',
+}
+
+
+def _shares(total, clients):
+    return [total // clients + (1 if i < total % clients else 0) for i in range(clients)]
+
+
+def _throughput(latencies, statuses, wall):
+    return {
+        'requests': len(latencies),
+        'wall_s': round(wall, 3),
+        'rps': round(len(latencies) / wall, 1) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'status_codes': sorted(set(statuses)),
+    }
+
+
+def run_wsgi(path, cookie, clients, total):
+    from django.core.handlers.wsgi import WSGIHandler
+
+    handler = WSGIHandler()
+    latencies, statuses = [], []
+
+    def client(count):
+        try:
+            for _ in range(count):
+                environ = {
+                    'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+                    'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                    'HTTP_HOST': 'testserver', 'HTTP_COOKIE': cookie,
+                    'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+                }
+                status = []
+                started = time.perf_counter()
+                body = handler(environ, lambda line, headers, exc_info=None: status.append(line))
+                try:
+                    for _chunk in body:
+                        pass
+                finally:
+                    body.close()
+                latencies.append((time.perf_counter() - started) * 1000)
+                statuses.append(int(status[0].split()[0]))
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in _shares(total, clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return _throughput(latencies, statuses, time.perf_counter() - started)
+
+
+async def _run_asgi(path, cookie, clients, total):
+    from django.core.handlers.asgi import ASGIHandler
+
+    handler = ASGIHandler()
+    latencies, statuses = [], []
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }
+
+    async def request():
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+        status = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.Event().wait()  # the client never disconnects early
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        started = time.perf_counter()
+        await handler(dict(scope), receive, send)
+        latencies.append((time.perf_counter() - started) * 1000)
+        statuses.append(status[0])
+
+    async def client(count):
+        for _ in range(count):
+            await request()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in _shares(total, clients)))
+    wall = time.perf_counter() - started
+    await sync_to_async(connections.close_all)()
+    return _throughput(latencies, statuses, wall)
+
+
+def run_asgi(path, cookie, clients, total):
+    return asyncio.run(_run_asgi(path, cookie, clients, total))
+
+
+def run_concurrent(user, clients=20, requests=400, views=None):
+    """Throughput of each read view under both handlers. Needs committed data (no transaction)."""
+    from django.conf import settings
+
+    session = Client()
+    session.force_login(user)
+    cookie = f"{settings.SESSION_COOKIE_NAME}={session.cookies[settings.SESSION_COOKIE_NAME].value}"
+    results = {}
+    try:
+        for name in views or CONCURRENT_VIEWS:
+            path = reverse(CONCURRENT_VIEWS[name])
+            run_wsgi(path, cookie, min(clients, 2), min(requests, 4))  # warm up both paths
+            run_asgi(path, cookie, min(clients, 2), min(requests, 4))
+            results[name] = {
+                'wsgi': run_wsgi(path, cookie, clients, requests),
+                'asgi': run_asgi(path, cookie, clients, requests),
+            }
+    finally:
+        session.logout()
+    return {
+        'meta': {
+            'clients': clients,
+            'requests': requests,
+            'user': user.username,
+            'database': connection.vendor,
+            'date': date.today().isoformat(),
+        },
+        'views': results,
+    }
@@ -0,0 +1,67 @@
+from urllib.parse import quote
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.http import Http404
+from django.template.loader import render_to_string
+
+from .recommendations import aget_index, aversion, get_index, type_rank, version
+
+# --- Resource catalog ---
+# /resources/ is the same for everyone and changes only when `seed` or an admin
+# writes a Resource. Each (category, page) of it is rendered once per catalog
+# version and kept in the cache. The version is the resources version as
+# cached by tracker/recommendations.py, so a repeat view makes no query: the
+# listing comes from the recommendation index of that version and the HTML from
+# the fragment cache. Fragment keys embed the version, so a write orphans the
+# old ones instead of deleting them. The version is also the ETag of the public
+# fragment endpoint (views.resource_catalog), which browsers and proxies may
+# cache. A write in another process shows up once the cached version expires
+# (recommendations.VERSION_TIMEOUT, kept below MAX_AGE).
+
+PAGE_SIZE = 12
+MAX_AGE = 300  # seconds a browser/proxy may reuse a page before revalidating
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+TEMPLATE = 'tracker/partials/resource_catalog.html'
+
+
+def etag(category, page):
+    return f'res-{version()}-{category}-{page}'
+
+
+def _listing(index, category):
+    if category and category not in index:
+        raise Http404('No such resource category')
+    names = [category] if category else sorted(index)
+    return [resource for name in names
+            for resource_type in sorted(index[name], key=type_rank) for resource in index[name][resource_type]]
+
+
+def _page(current, index, category, page):
+    page = Paginator(_listing(index, category), PAGE_SIZE).get_page(page)
+    key = f'resource-catalog:{current}:{quote(category)}:{page.number}'
+    return key, page
+
+
+def render(category='', page=1):
+    """The catalog fragment for one category (all when empty) and page, as HTML."""
+    current = version()
+    index = get_index(current)
+    key, page = _page(current, index, category, page)
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string(TEMPLATE, {'page': page, 'category': category, 'categories': sorted(index)})
+        cache.set(key, html, timeout=FRAGMENT_TIMEOUT)
+    return html
+
+
+async def arender(category='', page=1):
+    current = await aversion()
+    index = await aget_index(current)
+    key, page = _page(current, index, category, page)
+    html = await cache.aget(key)
+    if html is None:
+        html = render_to_string(TEMPLATE, {'page': page, 'category': category, 'categories': sorted(index)})
+        await cache.aset(key, html, timeout=FRAGMENT_TIMEOUT)
+    return html
+
@@ -0,0 +1,81 @@
+import csv
+import json
+
+from django.http import StreamingHttpResponse
+
+from .models import ConsumptionLog, FoodItem
+
+# --- Streaming exports ---
+# Rows come from values_list(...).iterator(), which uses a server-side cursor on
+# PostgreSQL and fetches `CHUNK_SIZE` rows at a time elsewhere, and are written
+# out as they arrive, so an export never holds the whole table in memory.
+# The rows are read after the view has returned, so the database alias is
+# resolved up front (see tracker/routers.py).
+
+CHUNK_SIZE = 2000
+ROWS_PER_WRITE = 500
+
+ITEM_FIELDS = ['id', 'name', 'category', 'quantity', 'expiry_date', 'cost_per_unit', 'created_at']
+LOG_FIELDS = ['id', 'date_consumed', 'food_name', 'category', 'quantity', 'source_item_id']
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class _Echo:
+    # csv.writer wants a file; this one just hands the formatted line back
+    def write(self, value):
+        return value
+
+
+def _buffered(lines):
+    # Yielding one line at a time makes the WSGI server flush per row; batch them
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= ROWS_PER_WRITE:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def csv_lines(fields, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(fields, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(fields, row)), default=str) + '\n'
+
+
+def item_rows(user, start=None, end=None):
+    queryset = FoodItem.objects.filter(user=user)
+    if start:
+        queryset = queryset.filter(expiry_date__gte=start)
+    if end:
+        queryset = queryset.filter(expiry_date__lte=end)
+    return queryset.using(queryset.db).order_by('expiry_date', 'id').values_list(*ITEM_FIELDS).iterator(
+        chunk_size=CHUNK_SIZE)
+
+
+def log_rows(user, start=None, end=None):
+    queryset = ConsumptionLog.objects.filter(user=user)
+    if start:
+        queryset = queryset.filter(date_consumed__gte=start)
+    if end:
+        queryset = queryset.filter(date_consumed__lte=end)
+    return queryset.using(queryset.db).order_by('date_consumed', 'id').values_list(*LOG_FIELDS).iterator(
+        chunk_size=CHUNK_SIZE)
+
+
+def export_response(fields, rows, fmt, filename):
+    lines = ndjson_lines(fields, rows) if fmt == 'ndjson' else csv_lines(fields, rows)
+    response = StreamingHttpResponse(_buffered(lines), content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
@@ -0,0 +1,117 @@
+from datetime import date, timedelta
+
+import numpy as np
+from django.db import transaction
+
+from .analytics import _codes, _columns
+from .models import ConsumptionLog, FoodItem, ItemForecast
+from .routers import replica_reads
+
+# --- Depletion forecast ---
+# For every item: how fast does this user eat this food? Rate = units eaten per
+# day over the history window, by food name, falling back to the category rate
+# split across the names eaten in it. Predicted depletion = today + quantity /
+# rate; items that would outlive their expiry date are flagged at_risk. Items
+# with no rate at all get no row and keep the plain expiring-soon rule.
+# `manage.py forecast_items` runs this nightly for all users; the dashboard
+# reads the stored rows (see FoodItemQuerySet.at_risk).
+
+WINDOW_DAYS = 90
+# A user with two days of history has not shown a rate yet; spread it over at least this
+MIN_SPAN_DAYS = 14
+MAX_HORIZON_DAYS = 3650
+
+
+def _rates(keys, units, span_of_key):
+    """Sums units per distinct key; returns (sorted keys, units per day)."""
+    distinct, group = np.unique(keys, return_inverse=True)
+    totals = np.bincount(group, weights=units, minlength=len(distinct))
+    return distinct, totals / span_of_key(distinct)
+
+
+def _lookup(distinct, values, keys):
+    # values[distinct == key] per key, 0 where the key never occurred
+    if not len(distinct):
+        return np.zeros(len(keys))
+    position = np.minimum(np.searchsorted(distinct, keys), len(distinct) - 1)
+    return np.where(distinct[position] == keys, values[position], 0.0)
+
+
+def forecast(user_ids, today=None, window_days=WINDOW_DAYS):
+    """Returns unsaved ItemForecast rows for every item of the given users."""
+    today = today or date.today()
+    users = np.asarray(sorted(set(user_ids)), dtype=np.int64)
+    if not len(users):
+        return []
+
+    log_user, log_name, log_cat, log_qty, log_date = _columns(
+        ConsumptionLog.objects.filter(user_id__in=users.tolist(),
+                                      date_consumed__gt=today - timedelta(days=window_days),
+                                      date_consumed__lte=today),
+        'user_id', 'food_name', 'category', 'quantity', 'date_consumed')
+    item_id, item_user, item_name, item_cat, item_qty, item_expiry = _columns(
+        FoodItem.objects.filter(user_id__in=users.tolist()),
+        'id', 'user_id', 'name', 'category', 'quantity', 'expiry_date')
+    if not item_id:
+        return []
+
+    names = np.asarray(sorted(set(log_name) | set(item_name)), dtype=object)
+    categories = np.asarray(sorted(set(log_cat) | set(item_cat)), dtype=object)
+    n_names, n_cats = len(names), len(categories)
+
+    log_u = np.searchsorted(users, np.asarray(log_user, dtype=np.int64))
+    item_u = np.searchsorted(users, np.asarray(item_user, dtype=np.int64))
+    log_qty = np.asarray(log_qty, dtype=np.float64)
+
+    # Days of history per user: since their first log in the window
+    age = np.asarray([(today - d).days + 1 for d in log_date], dtype=np.int64)
+    span = np.full(len(users), MIN_SPAN_DAYS, dtype=np.float64)
+    if len(age):
+        np.maximum.at(span, log_u, np.minimum(age, window_days).astype(np.float64))
+
+    # Per (user, name) and per (user, category) rates
+    name_keys, name_rate = _rates(log_u * n_names + _codes(log_name, names), log_qty,
+                                  lambda keys: span[keys // n_names])
+    cat_keys, cat_rate = _rates(log_u * n_cats + _codes(log_cat, categories), log_qty,
+                                lambda keys: span[keys // n_cats])
+    # ... the category rate is shared by the distinct names eaten in that category
+    pair_keys = np.unique(log_u * n_names * n_cats + _codes(log_cat, categories) * n_names + _codes(log_name, names))
+    names_per_cat = np.bincount(np.searchsorted(cat_keys, pair_keys // n_names), minlength=len(cat_keys))
+    cat_rate = cat_rate / np.maximum(names_per_cat, 1)
+
+    rate = _lookup(name_keys, name_rate, item_u * n_names + _codes(item_name, names))
+    rate = np.where(rate > 0, rate, _lookup(cat_keys, cat_rate, item_u * n_cats + _codes(item_cat, categories)))
+
+    quantity = np.asarray(item_qty, dtype=np.float64)
+    days_left = np.asarray([(d - today).days for d in item_expiry], dtype=np.int64)
+    with np.errstate(divide='ignore'):
+        days_to_empty = np.where(rate > 0, np.ceil(quantity / rate), np.inf)
+    # Eaten by the end of its expiry day is in time
+    at_risk = days_to_empty > days_left + 1
+    days_to_empty = np.minimum(days_to_empty, MAX_HORIZON_DAYS)
+
+    # No rate (nothing like it eaten in the window) is no forecast: without a row
+    # the item falls back to the expiring-soon rule (FoodItemQuerySet._at_risk_q)
+    return [
+        ItemForecast(
+            item_id=pk,
+            user_id=user_id,
+            daily_rate=round(float(r), 4),
+            predicted_depletion=today + timedelta(days=int(d)),
+            at_risk=bool(risk),
+            computed_on=today,
+        )
+        for pk, user_id, r, d, risk in zip(item_id, item_user, rate, days_to_empty, at_risk)
+        if r > 0
+    ]
+
+
+def refresh(user_ids, today=None, window_days=WINDOW_DAYS, batch_size=1000):
+    """Replaces the stored forecasts of the given users. Returns the number written."""
+    with replica_reads():
+        rows = forecast(user_ids, today, window_days)
+    with transaction.atomic():
+        stale = ItemForecast.objects.filter(user_id__in=list(user_ids))
+        stale._raw_delete(stale.db)
+        ItemForecast.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
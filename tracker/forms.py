@@ -2,9 +2,12 @@ from django import forms
 from .models import Profile, FoodItem
 
 class FoodItemForm(forms.ModelForm):
+    # Not a model field: uploads are stored (and de-duplicated) as ReceiptImage rows
+    receipt_image = forms.ImageField(required=False)
+
     class Meta:
         model = FoodItem
-        fields = ['name', 'category', 'quantity', 'expiry_date', 'cost_per_unit', 'receipt_image']
+        fields = ['name', 'category', 'quantity', 'expiry_date', 'cost_per_unit']
         widgets = {
             'expiry_date': forms.DateInput(attrs={'type': 'date'})
         }
@@ -16,4 +19,33 @@ class ProfileForm(forms.ModelForm):
         widgets = {
             'dietary_preferences': forms.TextInput(attrs={'placeholder': 'e.g. Vegetarian, Nut-free'}),
             'location': forms.TextInput(attrs={'placeholder': 'City/Area'}),
-        }
\ No newline at end of file
+        }
+
+class HistoryFilterForm(forms.Form):
+    start = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    end = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    category = forms.ChoiceField(required=False, choices=[('', 'All categories')] + FoodItem.CATEGORIES)
+
+    def filter(self, queryset, date_field):
+        # Applies whichever filters validated; invalid ones are simply ignored
+        data = self.cleaned_data if self.is_valid() else {}
+        if data.get('start'):
+            queryset = queryset.filter(**{f'{date_field}__gte': data['start']})
+        if data.get('end'):
+            queryset = queryset.filter(**{f'{date_field}__lte': data['end']})
+        if data.get('category'):
+            queryset = queryset.filter(category=data['category'])
+        return queryset
+
+class BulkActionForm(forms.Form):
+    # The selected item ids come in as repeated item=<pk>, like log_meal
+    ACTIONS = [('consume', 'Eat all'), ('delete', 'Delete'), ('shift', 'Shift expiry')]
+
+    action = forms.ChoiceField(choices=ACTIONS)
+    days = forms.IntegerField(required=False, min_value=-365, max_value=365)
+
+    def clean(self):
+        data = super().clean()
+        if data.get('action') == 'shift' and not data.get('days'):
+            self.add_error('days', 'How many days to move the expiry date by.')
+        return data
@@ -0,0 +1,126 @@
+import csv
+import io
+import json
+
+from django.db import transaction
+
+from .forms import FoodItemForm
+from .models import FoodItem
+from .summary import invalidate_summary
+from .versions import stamp
+
+# --- Bulk inventory import ---
+# Rows are read one at a time from the (possibly huge) file, validated with the
+# same FoodItemForm as the "Add Item" page and flushed with bulk_create every
+# `batch_size` rows, so memory stays flat no matter how long the file is.
+
+IMPORT_FIELDS = ['name', 'category', 'quantity', 'expiry_date', 'cost_per_unit']
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportItemForm(FoodItemForm):
+    receipt_image = None
+
+    class Meta(FoodItemForm.Meta):
+        fields = IMPORT_FIELDS
+
+    def rebind(self, data):
+        # Building a form deep-copies every field; re-validating one instance
+        # per row with fresh data roughly doubles import throughput.
+        self.data = data
+        self.instance = FoodItem()
+        self._errors = None
+        self._bound_fields_cache = {}
+        return self
+
+
+def detect_format(filename):
+    name = (filename or '').lower()
+    if name.endswith(('.ndjson', '.jsonl', '.json')):
+        return 'ndjson'
+    return 'csv'
+
+
+def _text(fileobj):
+    # Uploaded files and `open(..., 'rb')` are binary; decode lazily
+    if isinstance(fileobj, io.TextIOBase):
+        return fileobj
+    return io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+
+
+def iter_rows(fileobj, fmt='csv'):
+    """Yields (line_number, row_dict); malformed NDJSON lines yield (line_number, None)."""
+    text = _text(fileobj)
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def _flush(user, batch):
+    # One inventory version per batch, committed with the rows it stamps
+    with transaction.atomic():
+        version = stamp(user.pk)
+        for item in batch:
+            item.sync_version = version
+        FoodItem.objects.bulk_create(batch)
+    return len(batch)
+
+
+def import_items(user, fileobj, fmt='csv', batch_size=BATCH_SIZE):
+    """
+    Imports every valid row for `user` and keeps going past invalid ones.
+
+    Returns {'created': n, 'failed': n, 'errors': [(line, {field: [msgs]}), ...]};
+    only the first MAX_REPORTED_ERRORS errors are kept. A file that can't be
+    decoded or parsed stops the import there: the rows before it are still
+    imported, and a (None, {'file': [msg]}) entry reports it.
+    """
+    created, failed, errors, batch = 0, 0, [], []
+    form = ImportItemForm(data={})
+    line_number = None
+
+    try:
+        for line_number, row in iter_rows(fileobj, fmt):
+            if row is None:
+                row_errors = {'__all__': ['Malformed row.']}
+            else:
+                form.rebind(row)
+                row_errors = None if form.is_valid() else {f: list(msgs) for f, msgs in form.errors.items()}
+            if row_errors:
+                failed += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append((line_number, row_errors))
+                continue
+
+            item = form.save(commit=False)
+            item.user = user
+            batch.append(item)
+            if len(batch) >= batch_size:
+                created += _flush(user, batch)
+                batch = []
+    except (UnicodeDecodeError, csv.Error) as exc:
+        # The rest of the file can't be read; keep what was imported and say where it stopped
+        problem = ('The file is not UTF-8 text (save it as "CSV UTF-8")' if isinstance(exc, UnicodeDecodeError)
+                   else f'Malformed CSV: {exc}')
+        read = f'Nothing after line {line_number} was read.' if line_number else 'No rows could be read.'
+        errors.append((None, {'file': [f'{problem}. {read}']}))
+
+    if batch:
+        created += _flush(user, batch)
+
+    # bulk_create sends no signals
+    if created:
+        invalidate_summary(user.pk)
+
+    return {'created': created, 'failed': failed, 'errors': errors}
@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from tracker import bench
+import tempfile
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the main views (p50/p95/p99 latency, SQL queries, DB time); all writes are rolled back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--user', help='Username to benchmark as (default: first seed_user_*, then demo_user)')
+        parser.add_argument('--views', nargs='+', choices=list(bench.SCENARIOS))
+        parser.add_argument('--users', type=int, default=0,
+                            help='Seed this many synthetic users first (inside the rolled-back transaction)')
+        parser.add_argument('--items-per-user', type=int, default=500)
+        parser.add_argument('--logs-per-user', type=int, default=1000)
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--baseline', help='JSON results from an earlier run to diff against')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed p95 slowdown (0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        baseline = bench.load(options['baseline']) if options['baseline'] else None
+
+        # Everything happens in one transaction that is rolled back, so the
+        # benchmark never leaves add_item/log_food/seed data behind.
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            MEDIA_ROOT=media_root, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+        ):
+            try:
+                with transaction.atomic():
+                    results = self.run_benchmarks(options)
+                    raise Rollback
+            except Rollback:
+                pass
+
+        self.report(results)
+        if options['output']:
+            bench.save(results, options['output'])
+            self.stdout.write(f"Saved results to {options['output']}")
+        if baseline:
+            regressions = bench.compare(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError("Regressions against baseline:\n  " + "\n  ".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
+
+    def run_benchmarks(self, options):
+        if options['users']:
+            call_command('seed', users=options['users'], items_per_user=options['items_per_user'],
+                         logs_per_user=options['logs_per_user'], stdout=self.stdout)
+        user = self.pick_user(options['user'])
+        self.stdout.write(f"Benchmarking as {user.username} ({options['iterations']} iterations per view)...")
+        return bench.run(user, options['iterations'], options['views'])
+
+    def pick_user(self, username):
+        user = bench.pick_user(username)
+        if user is None:
+            raise CommandError("No user to benchmark; run 'manage.py seed' or pass --user/--users.")
+        return user
+
+    def report(self, results):
+        self.stdout.write(f"{'view':<22}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}{'db ms':>9}")
+        for name, stats in results['views'].items():
+            self.stdout.write(
+                f"{name:<22}{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}"
+                f"{stats['queries']:>9}{stats['db_ms']:>9.2f}"
+            )
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from tracker import bench
+
+
+class Command(BaseCommand):
+    help = 'Compares concurrent-client throughput of the read views through the WSGI and the ASGI handler'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=20, help='Concurrent clients (threads for WSGI, tasks for ASGI)')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per view and handler')
+        parser.add_argument('--user', help='Username to benchmark as (default: first seed_user_*, then demo_user)')
+        parser.add_argument('--views', nargs='+', choices=list(bench.CONCURRENT_VIEWS))
+        parser.add_argument('--output', help='Write results as JSON to this file')
+
+    def handle(self, *args, **options):
+        user = self.pick_user(options['user'])
+        self.stdout.write(f"{options['clients']} clients x {options['requests']} requests per view as {user.username}...")
+        # Read-only views, so unlike `bench` nothing has to be rolled back; each
+        # client thread needs its own committed view of the data anyway.
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            results = bench.run_concurrent(user, max(options['clients'], 1), max(options['requests'], 1),
+                                           options['views'])
+
+        self.stdout.write(f"{'view':<22}{'handler':>8}{'req/s':>10}{'p50':>9}{'p95':>9}  status")
+        for name, modes in results['views'].items():
+            for mode, stats in modes.items():
+                self.stdout.write(
+                    f"{name:<22}{mode:>8}{stats['rps']:>10.1f}{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}"
+                    f"  {','.join(map(str, stats['status_codes']))}"
+                )
+        if options['output']:
+            bench.save(results, options['output'])
+            self.stdout.write(f"Saved results to {options['output']}")
+
+    def pick_user(self, username):
+        user = bench.pick_user(username)
+        if user is None:
+            raise CommandError("No user to benchmark; run 'manage.py seed' or pass --user.")
+        return user
@@ -0,0 +1,28 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from tracker import analytics
+from tracker.routers import replica_reads
+import time
+
+class Command(BaseCommand):
+    help = "Computes every user's insights in one vectorized pass per batch of users and stores them in UserInsights (run nightly from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Users per pass; bounds how many rows are held in memory at once')
+        parser.add_argument('--window-days', type=int, default=analytics.WINDOW_DAYS)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+        size = max(options['batch_size'], 1)
+        for offset in range(0, len(user_ids), size):
+            with replica_reads():
+                results = analytics.compute(user_ids[offset:offset + size], window_days=options['window_days'])
+            analytics.store(results)
+            if options['verbosity'] > 1:
+                self.stdout.write(f"   - {offset + len(results)} users done")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Computed insights for {len(user_ids)} users in {time.perf_counter() - started:.1f}s"
+        ))
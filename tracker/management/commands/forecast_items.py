@@ -0,0 +1,30 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from tracker import forecast
+from tracker.summary import invalidate_all_summaries
+import time
+
+class Command(BaseCommand):
+    help = "Predicts when every item will be used up and flags those that will expire first (run nightly from cron, after sweep_expired)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Users per pass; bounds how many rows are held in memory at once')
+        parser.add_argument('--window-days', type=int, default=forecast.WINDOW_DAYS,
+                            help='Days of consumption history to learn rates from')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+        size = max(options['batch_size'], 1)
+        written = 0
+        for offset in range(0, len(user_ids), size):
+            written += forecast.refresh(user_ids[offset:offset + size], window_days=options['window_days'])
+            if options['verbosity'] > 1:
+                self.stdout.write(f"   - {min(offset + size, len(user_ids))} users done")
+
+        # Rescue recipes on the cached dashboards depend on the forecasts
+        invalidate_all_summaries()
+        self.stdout.write(self.style.SUCCESS(
+            f"Forecast {written} items for {len(user_ids)} users in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,37 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from tracker.importers import BATCH_SIZE, detect_format, import_items
+import time
+
+class Command(BaseCommand):
+    help = 'Streams a CSV or NDJSON file of food items into a user\'s inventory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or NDJSON (.ndjson/.jsonl) file')
+        parser.add_argument('--user', required=True, help='Username that will own the items')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['user']!r}")
+
+        fmt = options['format'] or detect_format(options['path'])
+        started = time.perf_counter()
+        with open(options['path'], 'rb') as fileobj:
+            result = import_items(user, fileobj, fmt=fmt, batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+
+        for line_number, errors in result['errors']:
+            for field, messages in errors.items():
+                where = f"line {line_number}" if line_number else "file"
+                self.stderr.write(f"   - {where}: {field}: {' '.join(messages)}")
+        if result['failed'] > len(result['errors']):
+            self.stderr.write(f"   ... and {result['failed'] - len(result['errors'])} more invalid rows")
+
+        rate = result['created'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['created']} items ({result['failed']} rejected) in {elapsed:.1f}s ({rate:.0f} rows/s)"
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from tracker.models import ReceiptImage
+from tracker.receipts import generate_variants
+
+class Command(BaseCommand):
+    help = 'Generates missing thumbnail/web variants for receipt images (for RECEIPT_WORKER=off or after a restart)'
+
+    def handle(self, *args, **options):
+        pending = ReceiptImage.objects.filter(Q(thumbnail='') | Q(web='')).order_by('pk')
+        done = 0
+        for receipt in pending.iterator(chunk_size=100):
+            generate_variants(receipt)
+            done += 1
+        self.stdout.write(self.style.SUCCESS(f"Processed {done} receipt image(s)"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from tracker import rollups
+import time
+
+class Command(BaseCommand):
+    help = 'Recomputes the daily consumption/waste rollups from the ledgers, or checks them with --verify'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Only compare the stored rollups with the ledgers; exit non-zero on a mismatch')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['verify']:
+            mismatches = rollups.verify()
+            for key, expected, stored in mismatches[:20]:
+                self.stdout.write(f"   - {key}: expected {expected}, stored {stored}")
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} rollup rows disagree with the ledgers; run rebuild_rollups")
+            self.stdout.write(self.style.SUCCESS("Rollups match the ledgers"))
+            return
+
+        rows = rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {rows} rollup rows in {time.perf_counter() - started:.1f}s"
+        ))
@@ -1,14 +1,169 @@
 from django.core.management.base import BaseCommand
-from tracker.models import FoodItem, Resource, Profile
+from tracker.models import FoodItem, Resource, Profile, ConsumptionLog, WasteLog, DailyRollup, ItemForecast, Tombstone
+from tracker import rollups
 from django.contrib.auth.models import User
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, timedelta
+import django
 import random
+import time
+
+# --- Synthetic data (benchmark fixture) ---
+# `seed --users N` adds N deterministic users on top of the demo data. Every
+# user gets their own Random(seed, user index), so the output is identical no
+# matter how the users are split across worker processes.
+
+SYNTHETIC_PREFIX = 'seed_user_'
+SYNTHETIC_PASSWORD = 'password123'
+
+FOOD_NAMES = {
+    'Dairy': ["Milk", "Yogurt", "Eggs", "Cheese", "Butter", "Paneer"],
+    'Fruits': ["Banana", "Mango", "Guava", "Apple", "Orange", "Papaya"],
+    'Vegetables': ["Spinach", "Potato", "Onion", "Tomato", "Green Chilies", "Eggplant"],
+    'Meat': ["Chicken Breast", "Beef", "Rohu Fish", "Mutton", "Hilsa"],
+    'Grains': ["Rice", "Lentils", "Flour", "Oats", "Bread"],
+    'Snacks': ["Biscuits", "Chanachur", "Chips", "Tea Leaves", "Nuts"],
+}
+# Rough shelf life in days per category: (min, max) relative to today
+SHELF_LIFE = {
+    'Dairy': (-5, 14), 'Fruits': (-4, 10), 'Vegetables': (-4, 21),
+    'Meat': (-3, 7), 'Grains': (-10, 365), 'Snacks': (-10, 180),
+}
+
+
+def _user_rng(seed, index):
+    return random.Random(seed * 1_000_003 + index)
+
+
+def generate_items(rng, user_id, count, today):
+    for _ in range(count):
+        category = rng.choice(list(FOOD_NAMES))
+        low, high = SHELF_LIFE[category]
+        yield FoodItem(
+            user_id=user_id,
+            name=rng.choice(FOOD_NAMES[category]),
+            category=category,
+            quantity=rng.randint(1, 6),
+            expiry_date=today + timedelta(days=rng.randint(low, high)),
+            cost_per_unit=rng.randint(20, 500),
+        )
+
+
+def generate_logs(rng, user_id, count, days_of_history, today):
+    for _ in range(count):
+        category = rng.choice(list(FOOD_NAMES))
+        yield ConsumptionLog(
+            user_id=user_id,
+            food_name=rng.choice(FOOD_NAMES[category]),
+            category=category,
+            quantity=rng.randint(1, 3),
+            date_consumed=today - timedelta(days=rng.randint(0, days_of_history)),
+            cost_per_unit=rng.randint(20, 500),
+        )
+
+
+def _bulk_insert(model, objects, batch_size):
+    batch, total = [], 0
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def seed_user_data(job):
+    """Worker entry point: items and logs for a slice of [(index, user_id), ...]."""
+    users, options, today = job
+    items = logs = 0
+    for index, user_id in users:
+        rng = _user_rng(options['seed'], index)
+        items += _bulk_insert(FoodItem, generate_items(rng, user_id, options['items_per_user'], today),
+                              options['batch_size'])
+        logs += _bulk_insert(ConsumptionLog, generate_logs(rng, user_id, options['logs_per_user'],
+                                                           options['days_of_history'], today),
+                             options['batch_size'])
+    return items, logs
+
+
+def _init_worker():
+    # Works for both fork (Linux) and spawn (Windows/macOS) start methods
+    django.setup()
+    connections.close_all()
+
 
 class Command(BaseCommand):
     help = 'Seeds the database with Part 1 Requirements (Profiles, Foods, Resources)'
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=0, help='Synthetic users to generate (seed_user_NNNNNN)')
+        parser.add_argument('--items-per-user', type=int, default=50)
+        parser.add_argument('--logs-per-user', type=int, default=200)
+        parser.add_argument('--days-of-history', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; same seed, same data')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes (ignored on SQLite)')
+
+    def handle(self, *args, **options):
         self.stdout.write("🌱 Starting Database Seeder...")
+        self.seed_demo()
+        if options['users']:
+            self.seed_synthetic(options)
+        self.stdout.write(self.style.SUCCESS('✅ Database Seeded Successfully!'))
+
+    def seed_synthetic(self, options):
+        started = time.perf_counter()
+        today = date.today()
+
+        # Re-running replaces the previous synthetic users. _raw_delete skips the
+        # collector, which would otherwise load millions of rows just to delete them.
+        old_users = User.objects.filter(username__startswith=SYNTHETIC_PREFIX)
+        for model in (ConsumptionLog, WasteLog, DailyRollup, ItemForecast, Tombstone, FoodItem, Profile):
+            model.objects.filter(user__in=old_users)._raw_delete(model.objects.db)
+        old_users.delete()
+
+        # bulk_create skips the post_save signal, so Profiles are created here too
+        password = make_password(SYNTHETIC_PASSWORD)
+        users = User.objects.bulk_create([
+            User(username=f'{SYNTHETIC_PREFIX}{i:06d}', password=password)
+            for i in range(options['users'])
+        ], batch_size=options['batch_size'])
+        if not all(u.pk for u in users):  # backends without RETURNING
+            users = list(User.objects.filter(username__startswith=SYNTHETIC_PREFIX).order_by('username'))
+        Profile.objects.bulk_create([
+            Profile(user=u, household_size=_user_rng(options['seed'], i).randint(1, 6))
+            for i, u in enumerate(users)
+        ], batch_size=options['batch_size'])
+        self.stdout.write(f"   - Created {len(users)} synthetic users ({SYNTHETIC_PREFIX}*, {SYNTHETIC_PASSWORD})")
+
+        # SQLite allows a single writer, so extra processes would only queue up on the lock
+        workers = 1 if connection.vendor == 'sqlite' else max(options['workers'], 1)
+        indexed = [(i, u.pk) for i, u in enumerate(users)]
+        jobs = [(indexed[w::workers], options, today) for w in range(workers)]
+
+        if workers == 1:
+            results = [seed_user_data(jobs[0])]
+        else:
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                results = list(pool.map(seed_user_data, jobs))
+
+        # bulk_create skipped the incremental rollup updates; recompute them in one pass
+        rollups.rebuild()
+
+        items = sum(r[0] for r in results)
+        logs = sum(r[1] for r in results)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"   - Seeded {items} Food Items and {logs} Consumption Logs "
+                          f"in {elapsed:.1f}s using {workers} worker(s)")
+
+    def seed_demo(self):
 
         # ---------------------------------------------------------
         # 1. Create Demo User & Profile (Requirement 1 & 2)
@@ -123,6 +278,4 @@ class Command(BaseCommand):
                 category=cat,
                 resource_type=rtype
             )
-        self.stdout.write(f"   - Seeded {len(recipe_data)} Recipes")
-
-        self.stdout.write(self.style.SUCCESS('✅ Database Seeded Successfully!'))
\ No newline at end of file
+        self.stdout.write(f"   - Seeded {len(recipe_data)} Recipes")
\ No newline at end of file
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from tracker.sweep import BATCH_SIZE, sweep_expired
+import time
+
+class Command(BaseCommand):
+    help = 'Moves expired inventory items of all users into the waste ledger (safe to re-run; run nightly from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-days', type=int, default=0,
+                            help='Only sweep items that expired more than this many days ago')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be swept')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = 0
+        for total in sweep_expired(grace_days=options['grace_days'], batch_size=options['batch_size'],
+                                   dry_run=options['dry_run']):
+            if not options['dry_run'] and options['verbosity'] > 1:
+                self.stdout.write(f"   - {total} items moved so far")
+
+        if options['dry_run']:
+            self.stdout.write(f"{total} expired items would be moved to the waste ledger")
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Moved {total} expired items to the waste ledger in {time.perf_counter() - started:.1f}s"
+            ))
@@ -0,0 +1,92 @@
+import threading
+from bisect import bisect_left
+
+# --- In-process request metrics ---
+# Histograms keyed by URL name, filled by RequestMetricsMiddleware and exposed
+# in the Prometheus text format by the /metrics view. Each worker process keeps
+# its own numbers; Prometheus sums them across scrape targets.
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}  # view -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, view, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(view)
+            if series is None:
+                series = self._series[view] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {view: list(series) for view, series in self._series.items()}
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for view, series in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{view="{view}",le="+Inf"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{view="{view}"}} {series[-1]:.6f}')
+            lines.append(f'{self.name}_count{{view="{view}"}} {cumulative}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, view, amount=1):
+        with self._lock:
+            self._values[view] = self._values.get(view, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        lines += [f'{self.name}{{view="{view}"}} {value}' for view, value in sorted(values.items())]
+        return lines
+
+
+REQUEST_SECONDS = Histogram('tracker_request_duration_seconds', 'Wall time per request.')
+DB_SECONDS = Histogram('tracker_db_duration_seconds', 'Time spent executing SQL per request.')
+TEMPLATE_SECONDS = Histogram('tracker_template_duration_seconds', 'Template rendering time per request.')
+DB_QUERIES = Counter('tracker_db_queries_total', 'SQL queries executed.')
+
+REGISTRY = [REQUEST_SECONDS, DB_SECONDS, TEMPLATE_SECONDS, DB_QUERIES]
+
+
+def record(view, total, db, queries, template):
+    REQUEST_SECONDS.observe(view, total)
+    DB_SECONDS.observe(view, db)
+    TEMPLATE_SECONDS.observe(view, template)
+    DB_QUERIES.inc(view, queries)
+
+
+def render_prometheus(extra_lines=()):
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    lines += extra_lines
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    # Test helper
+    for metric in REGISTRY:
+        metric.__init__(metric.name, metric.help_text)
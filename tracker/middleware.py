@@ -0,0 +1,164 @@
+import contextvars
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics
+from .routers import PIN_COOKIE, REPLICA
+
+# Per-request accumulator, shared with the template render hook below
+_current = contextvars.ContextVar('tracker_request_metrics', default=None)
+
+
+class _RequestMetrics:
+    __slots__ = ('db', 'queries', 'template', 'rendering')
+
+    def __init__(self):
+        self.db = 0.0
+        self.queries = 0
+        self.template = 0.0
+        self.rendering = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+
+def _patch_template_render():
+    # Time the outermost template render of each request (render() / TemplateResponse).
+    # Nested renders (includes, crispy forms) are part of the outer one, so only
+    # depth 0 is counted.
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, '_tracker_timed', False):
+        return
+    original = Template.render
+
+    def render(self, context=None, request=None):
+        current = _current.get()
+        if current is None:
+            return original(self, context, request)
+        current.rendering += 1
+        started = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            current.rendering -= 1
+            if not current.rendering:
+                current.template += time.perf_counter() - started
+
+    render._tracker_timed = True
+    Template.render = render
+
+
+class RequestMetricsMiddleware:
+    """
+    Records wall time, DB time, query count and template time for every request,
+    sends them back as a Server-Timing header and feeds the /metrics histograms.
+
+    Off unless settings.TRACKER_METRICS_ENABLED is true; when off, Django drops
+    the middleware from the chain at startup, so it costs nothing. Works in
+    both the WSGI and the ASGI chain, so async views stay async.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'TRACKER_METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        _patch_template_render()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        current = _RequestMetrics()
+        token = _current.set(current)
+        started = time.perf_counter()
+        try:
+            with self._wrap_queries(current):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, current, started)
+
+    async def __acall__(self, request):
+        current = _RequestMetrics()
+        token = _current.set(current)
+        started = time.perf_counter()
+        try:
+            # Connections are per thread and the async ORM runs every query of
+            # this request in one worker thread, so hook that thread's connections
+            wrappers = await sync_to_async(self._wrap_queries)(current)
+            with wrappers:
+                response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, current, started)
+
+    @staticmethod
+    def _wrap_queries(current):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(current))
+        return stack
+
+    @staticmethod
+    def _finish(request, response, current, started):
+        total = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        metrics.record(view, total, current.db, current.queries, current.template)
+
+        app = max(total - current.db - current.template, 0.0)
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={current.db * 1000:.1f};desc="{current.queries} queries"',
+            f'tpl;dur={current.template * 1000:.1f}',
+            f'app;dur={app * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+        return response
+
+
+class PrimaryPinMiddleware:
+    """
+    After a request that may have written (anything but GET/HEAD/OPTIONS), sets
+    a cookie that keeps the client's @reads_from_replica pages on the primary
+    for settings.REPLICA_PIN_SECONDS, so they never miss the write because the
+    replica lags. Dropped at startup when no replica is configured.
+    """
+    sync_capable = True
+    async_capable = True
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def __init__(self, get_response):
+        if REPLICA not in connections.settings:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._pin(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._pin(request, await self.get_response(request))
+
+    def _pin(self, request, response):
+        if request.method not in self.SAFE_METHODS:
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+from tracker.operations import AddIndexConcurrentlyOnPostgres
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction on PostgreSQL
+    atomic = False
+
+    dependencies = [
+        ('tracker', '0005_alter_resource_resource_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name='consumptionlog',
+            index=models.Index(fields=['user', 'date_consumed', 'id'], name='log_user_date_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='fooditem',
+            index=models.Index(fields=['user', 'expiry_date'], name='food_user_expiry_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='fooditem',
+            index=models.Index(fields=['user', 'category'], name='food_user_category_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='resource',
+            index=models.Index(fields=['category', 'resource_type'], name='resource_cat_type_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:01
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0006_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='consumptionlog',
+            name='date_consumed',
+            field=models.DateField(default=datetime.date.today),
+        ),
+    ]
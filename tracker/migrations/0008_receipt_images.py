@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:09
+
+import django.db.models.deletion
+import tracker.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0007_consumptionlog_date_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceiptImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('original', models.ImageField(upload_to=tracker.models.receipt_original_path)),
+                ('thumbnail', models.ImageField(blank=True, upload_to='receipts/thumbs/')),
+                ('web', models.ImageField(blank=True, upload_to='receipts/web/')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='fooditem',
+            name='receipt',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='items', to='tracker.receiptimage'),
+        ),
+    ]
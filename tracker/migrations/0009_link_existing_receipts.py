@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:09
+
+import hashlib
+
+from django.core.files.storage import default_storage
+from django.db import migrations
+
+
+def link_existing_receipts(apps, schema_editor):
+    # Hash every existing upload and point items with identical files at one
+    # ReceiptImage. Files stay where they are; variants come from process_receipts.
+    FoodItem = apps.get_model('tracker', 'FoodItem')
+    ReceiptImage = apps.get_model('tracker', 'ReceiptImage')
+    for item in FoodItem.objects.exclude(receipt_image='').exclude(receipt_image__isnull=True).iterator():
+        name = item.receipt_image.name
+        if not default_storage.exists(name):
+            continue
+        digest = hashlib.sha256()
+        with default_storage.open(name, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(64 * 1024), b''):
+                digest.update(chunk)
+        receipt, _ = ReceiptImage.objects.get_or_create(sha256=digest.hexdigest(), defaults={'original': name})
+        FoodItem.objects.filter(pk=item.pk).update(receipt=receipt)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0008_receipt_images'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_existing_receipts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:09
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0009_link_existing_receipts'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='fooditem',
+            name='receipt_image',
+        ),
+    ]
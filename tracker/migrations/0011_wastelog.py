@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:11
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0010_remove_fooditem_receipt_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WasteLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_item_id', models.BigIntegerField(unique=True)),
+                ('food_name', models.CharField(max_length=100)),
+                ('category', models.CharField(max_length=50)),
+                ('quantity', models.IntegerField()),
+                ('cost_per_unit', models.DecimalField(decimal_places=2, default=0.0, max_digits=6)),
+                ('expiry_date', models.DateField()),
+                ('date_wasted', models.DateField(default=datetime.date.today)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'date_wasted'], name='waste_user_date_idx')],
+            },
+        ),
+    ]
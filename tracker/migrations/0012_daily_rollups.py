@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+
+
+def backfill_and_build(apps, schema_editor):
+    # Logs written before cost_per_unit existed take it from their item, if it still exists
+    ConsumptionLog = apps.get_model('tracker', 'ConsumptionLog')
+    FoodItem = apps.get_model('tracker', 'FoodItem')
+    WasteLog = apps.get_model('tracker', 'WasteLog')
+    DailyRollup = apps.get_model('tracker', 'DailyRollup')
+    ConsumptionLog.objects.filter(source_item__isnull=False).update(
+        cost_per_unit=Subquery(FoodItem.objects.filter(pk=OuterRef('source_item_id')).values('cost_per_unit')[:1])
+    )
+
+    # Initial rollups; afterwards they are maintained incrementally
+    value = ExpressionWrapper(F('quantity') * F('cost_per_unit'), output_field=DecimalField(max_digits=12, decimal_places=2))
+    rollups = {}
+    for model, date_field, prefix in ((ConsumptionLog, 'date_consumed', 'consumed'), (WasteLog, 'date_wasted', 'wasted')):
+        rows = model.objects.values_list('user_id', date_field, 'category').annotate(units=Sum('quantity'), value=Sum(value)).order_by()
+        for user_id, day, category, units, total in rows.iterator():
+            row = rollups.setdefault((user_id, day, category), DailyRollup(user_id=user_id, day=day, category=category))
+            setattr(row, f'{prefix}_units', units)
+            setattr(row, f'{prefix}_value', total or 0)
+    DailyRollup.objects.bulk_create(rollups.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0011_wastelog'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='consumptionlog',
+            name='cost_per_unit',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=6),
+        ),
+        migrations.AddField(
+            model_name='wastelog',
+            name='reason',
+            field=models.CharField(choices=[('expired', 'Expired'), ('discarded', 'Discarded')], default='expired', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('category', models.CharField(max_length=50)),
+                ('consumed_units', models.IntegerField(default=0)),
+                ('consumed_value', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('wasted_units', models.IntegerField(default=0)),
+                ('wasted_value', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'day', 'category'), name='rollup_user_day_category_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_and_build, migrations.RunPython.noop),
+    ]
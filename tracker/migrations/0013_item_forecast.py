@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:17
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0012_daily_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemForecast',
+            fields=[
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='forecast', serialize=False, to='tracker.fooditem')),
+                ('daily_rate', models.FloatField(default=0)),
+                ('predicted_depletion', models.DateField(blank=True, null=True)),
+                ('at_risk', models.BooleanField(default=False)),
+                ('computed_on', models.DateField(default=datetime.date.today)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'at_risk'], name='forecast_user_risk_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def install_search(apps, schema_editor):
+    # GIN indexes on PostgreSQL, FTS5 tables + triggers on SQLite (tracker/search.py)
+    from tracker.search import install
+    install(schema_editor.connection)
+
+
+def uninstall_search(apps, schema_editor):
+    from tracker.search import uninstall
+    uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction on PostgreSQL
+    atomic = False
+
+    dependencies = [
+        ('tracker', '0015_delta_sync'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+from tracker.operations import AddIndexConcurrentlyOnPostgres
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction on PostgreSQL
+    atomic = False
+
+    dependencies = [
+        ('tracker', '0016_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name='consumptionlog',
+            index=models.Index(fields=['date_consumed'], name='log_date_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='fooditem',
+            index=models.Index(fields=['expiry_date'], name='food_expiry_idx'),
+        ),
+    ]
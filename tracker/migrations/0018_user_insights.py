@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:26
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0017_admin_date_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserInsights',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='insights', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('data', models.JSONField()),
+                ('computed_on', models.DateField(default=datetime.date.today)),
+            ],
+        ),
+    ]
@@ -1,8 +1,12 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import Case, Count, DurationField, ExpressionWrapper, F, Q, Sum, Value, When
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from datetime import date
+from datetime import date, timedelta
+
+# Items expiring within this many days (inclusive) count as "expiring soon"
+EXPIRING_SOON_DAYS = 3
 
 # --- REQUIREMENT 1 & 2: User Profile Data ---
 class Profile(models.Model):
@@ -31,8 +35,132 @@ def create_user_profile(sender, instance, created, **kwargs):
 def save_user_profile(sender, instance, **kwargs):
     instance.profile.save()
 
+# --- REQUIREMENT 6: Receipt Images ---
+def receipt_original_path(instance, filename):
+    # Content-addressed: the same photo uploaded twice lands on the same name
+    ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else 'jpg'
+    return f'receipts/{instance.sha256[:2]}/{instance.sha256}.{ext}'
+
+
+class ReceiptImage(models.Model):
+    """
+    One stored receipt photo, shared by every FoodItem from the same shopping trip.
+    Thumbnail and web-sized variants are filled in by the background worker
+    (tracker/receipts.py); until then the original is served.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    original = models.ImageField(upload_to=receipt_original_path)
+    thumbnail = models.ImageField(upload_to='receipts/thumbs/', blank=True)
+    web = models.ImageField(upload_to='receipts/web/', blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256[:12]
+
+    @property
+    def url(self):
+        return self.original.url
+
+    @property
+    def thumbnail_url(self):
+        return (self.thumbnail or self.original).url
+
+    @property
+    def web_url(self):
+        return (self.web or self.original).url
+
+
+# --- Delta Sync ---
+class SyncTracked(models.Model):
+    """
+    Rows that offline clients mirror through /api/sync/. Every write stamps
+    sync_version with the user's next inventory version (tracker/versions.py),
+    and deletes leave a Tombstone, so a sync is an index range-scan on
+    (user, sync_version).
+    """
+    updated_at = models.DateTimeField(auto_now=True)
+    sync_version = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        # The version bump (pre_save) and the row must commit together, or a
+        # sync in between could hand out a token that skips this row
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'updated_at', 'sync_version'}
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+
 # --- REQUIREMENT 3: Inventory Item ---
-class FoodItem(models.Model):
+class FoodItemQuerySet(models.QuerySet):
+    """Expiry logic pushed into SQL so the dashboard never loops over items in Python."""
+
+    def _status_q(self, today=None):
+        today = today or date.today()
+        expired = Q(expiry_date__lt=today)
+        soon = Q(expiry_date__range=[today, today + timedelta(days=EXPIRING_SOON_DAYS)])
+        return today, expired, soon
+
+    def with_status(self, today=None):
+        # Adds `days_remaining` and `status` ('expired' / 'soon' / 'fresh') as annotations
+        today, expired, soon = self._status_q(today)
+        return self.annotate(
+            days_remaining=ExpressionWrapper(F('expiry_date') - Value(today), output_field=DurationField()),
+            status=Case(
+                When(expired, then=Value('expired')),
+                When(soon, then=Value('soon')),
+                default=Value('fresh'),
+                output_field=models.CharField(),
+            ),
+        )
+
+    def expired(self, today=None):
+        return self.filter(self._status_q(today)[1])
+
+    def expiring_soon(self, today=None):
+        return self.filter(self._status_q(today)[2])
+
+    def _at_risk_q(self, today=None):
+        # Not yet expired, and forecast to outlive its expiry date (ItemForecast);
+        # items added since the last forecast run count if they expire soon
+        today, expired, soon = self._status_q(today)
+        return (Q(expiry_date__gte=today) & Q(forecast__at_risk=True)) | (soon & Q(forecast=None))
+
+    def at_risk(self, today=None):
+        return self.filter(self._at_risk_q(today))
+
+    def category_profile(self, today=None):
+        # Units and value held per category, and how much of it is at risk - one GROUP BY
+        risk = self._at_risk_q(today)
+        value = lambda: ExpressionWrapper(F('quantity') * F('cost_per_unit'),
+                                          output_field=models.DecimalField(max_digits=12, decimal_places=2))
+        return self.values('category').annotate(
+            total_quantity=Sum('quantity'),
+            total_value=Sum(value()),
+            at_risk_quantity=Sum('quantity', filter=risk, default=0),
+            at_risk_value=Sum(value(), filter=risk, default=0),
+        ).order_by('category')
+
+    def _status_counters(self, today=None):
+        # One conditional-aggregate query instead of a table scan per counter
+        today, expired, soon = self._status_q(today)
+        return {
+            'total': Count('id'),
+            'expired_count': Count('id', filter=expired),
+            'soon_count': Count('id', filter=soon),
+        }
+
+    def status_counts(self, today=None):
+        return self.aggregate(**self._status_counters(today))
+
+    async def astatus_counts(self, today=None):
+        return await self.aaggregate(**self._status_counters(today))
+
+
+class FoodItem(SyncTracked):
     CATEGORIES = [
         ('Dairy', 'Dairy'), ('Fruits', 'Fruits'),
         ('Vegetables', 'Vegetables'), ('Meat', 'Meat'),
@@ -45,21 +173,42 @@ class FoodItem(models.Model):
     quantity = models.IntegerField(default=1)
     expiry_date = models.DateField()
     cost_per_unit = models.DecimalField(max_digits=6, decimal_places=2, default=0.00)
-    receipt_image = models.ImageField(upload_to='receipts/', blank=True, null=True)
+    receipt = models.ForeignKey(ReceiptImage, on_delete=models.SET_NULL, null=True, blank=True, related_name='items')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = FoodItemQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Dashboard ordering and the rescue window range-scan
+            models.Index(fields=['user', 'expiry_date'], name='food_user_expiry_idx'),
+            # Category filter buttons and per-user category lookups
+            models.Index(fields=['user', 'category'], name='food_user_category_idx'),
+            # Delta sync: changes since a client's token
+            models.Index(fields=['user', 'sync_version'], name='food_user_version_idx'),
+            # Admin date hierarchy and date-range filters across all users
+            models.Index(fields=['expiry_date'], name='food_expiry_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
     @property
     def days_remaining(self):
+        # Use the SQL annotation from with_status() when present
+        if hasattr(self, '_days_remaining'):
+            return self._days_remaining
         return (self.expiry_date - date.today()).days
 
+    @days_remaining.setter
+    def days_remaining(self, value):
+        self._days_remaining = value.days if isinstance(value, timedelta) else value
+
     @property
     def status_color(self):
         days = self.days_remaining
         if days < 0: return 'danger'
-        if days <= 3: return 'warning'
+        if days <= EXPIRING_SOON_DAYS: return 'warning'
         return 'success'
 
 # --- REQUIREMENT 4: Resources ---
@@ -77,9 +226,15 @@ class Resource(models.Model):
     category = models.CharField(max_length=50) 
     resource_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
 
+    class Meta:
+        indexes = [
+            # Rescue-recipe lookup: category__in=... AND resource_type='Recipe'
+            models.Index(fields=['category', 'resource_type'], name='resource_cat_type_idx'),
+        ]
+
     def __str__(self):
         return self.title
-class ConsumptionLog(models.Model):
+class ConsumptionLog(SyncTracked):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     
     # 1. The Link: Connects to Inventory, but keeps log if Item is deleted
@@ -95,7 +250,143 @@ class ConsumptionLog(models.Model):
     food_name = models.CharField(max_length=100)
     category = models.CharField(max_length=50)
     quantity = models.IntegerField()
-    date_consumed = models.DateField(auto_now_add=True)
+    cost_per_unit = models.DecimalField(max_digits=6, decimal_places=2, default=0.00)
+    # default (not auto_now_add) so imports and the seeder can backfill past dates
+    date_consumed = models.DateField(default=date.today)
+
+    class Meta:
+        indexes = [
+            # History page and "Recent Activity" ordered by date_consumed
+            models.Index(fields=['user', 'date_consumed', 'id'], name='log_user_date_idx'),
+            models.Index(fields=['user', 'sync_version'], name='log_user_version_idx'),
+            # Admin date hierarchy across all users
+            models.Index(fields=['date_consumed'], name='log_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"Ate {self.quantity} x {self.food_name}"
+
+# --- Waste Ledger ---
+class WasteLog(models.Model):
+    """
+    Snapshot of an item that was thrown away instead of eaten: written in bulk
+    by `manage.py sweep_expired` for expired items, and by delete_item for
+    items discarded by hand.
+    """
+    REASONS = [('expired', 'Expired'), ('discarded', 'Discarded')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Plain id, not a FK: the inventory row is deleted once it is logged here.
+    # Unique so a batch can never be recorded twice.
+    source_item_id = models.BigIntegerField(unique=True)
+    food_name = models.CharField(max_length=100)
+    category = models.CharField(max_length=50)
+    quantity = models.IntegerField()
+    cost_per_unit = models.DecimalField(max_digits=6, decimal_places=2, default=0.00)
+    expiry_date = models.DateField()
+    date_wasted = models.DateField(default=date.today)
+    reason = models.CharField(max_length=20, choices=REASONS, default='expired')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date_wasted'], name='waste_user_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"Wasted {self.quantity} x {self.food_name}"
+
+
+# --- Analytics Rollup ---
+class DailyRollup(models.Model):
+    """
+    Per user, day and category totals of what was eaten (ConsumptionLog) and
+    wasted (WasteLog). Kept up to date incrementally by tracker/rollups.py and
+    rebuildable from the two ledgers with `manage.py rebuild_rollups`.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    day = models.DateField()
+    category = models.CharField(max_length=50)
+    consumed_units = models.IntegerField(default=0)
+    consumed_value = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    wasted_units = models.IntegerField(default=0)
+    wasted_value = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            # Also the index for per-user date-range reads
+            models.UniqueConstraint(fields=['user', 'day', 'category'], name='rollup_user_day_category_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.day} {self.category}"
+
+
+# --- Depletion Forecast ---
+class ItemForecast(models.Model):
+    """
+    When an item is expected to be used up, from the user's past consumption of
+    that food (or, failing that, its category). Written for all users at once by
+    `manage.py forecast_items`; at_risk marks items predicted to expire first.
+    """
+    item = models.OneToOneField(FoodItem, on_delete=models.CASCADE, primary_key=True, related_name='forecast')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    daily_rate = models.FloatField(default=0)
+    predicted_depletion = models.DateField(null=True, blank=True)
+    at_risk = models.BooleanField(default=False)
+    computed_on = models.DateField(default=date.today)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'at_risk'], name='forecast_user_risk_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.item_id} -> {self.predicted_depletion}"
+
+
+class UserInsights(models.Model):
+    """
+    A user's insights (tracker/analytics.py) as of computed_on. Written for all
+    users at once by `manage.py compute_insights`, so the cron process's results
+    outlive it and every web process reads the same rows.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='insights')
+    data = models.JSONField()
+    computed_on = models.DateField(default=date.today)
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.computed_on}"
+
+
+# --- Change Counters ---
+class ChangeCounter(models.Model):
+    """
+    Monotonic version numbers for cacheable data: 'inventory:<user_id>' for a
+    user's items and logs, 'resources' for the Resource catalog. Bumped by
+    tracker/versions.py on every write; the JSON API derives ETags from them.
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.key}={self.value}"
+
+
+class Tombstone(models.Model):
+    """A deleted FoodItem or ConsumptionLog, so delta sync can tell clients to drop their copy."""
+    KINDS = [('item', 'FoodItem'), ('log', 'ConsumptionLog')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=4, choices=KINDS)
+    object_id = models.BigIntegerField()
+    sync_version = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'sync_version'], name='tombstone_user_version_idx'),
+        ]
 
     def __str__(self):
-        return f"Ate {self.quantity} x {self.food_name}"
\ No newline at end of file
+        return f"{self.kind} {self.object_id} @ {self.sync_version}"
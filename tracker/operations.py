@@ -0,0 +1,37 @@
+from django.db import NotSupportedError
+from django.db.migrations.operations import AddIndex
+
+
+# A migration operation that builds an index without locking the table on
+# PostgreSQL (CREATE INDEX CONCURRENTLY; reversed with DROP INDEX CONCURRENTLY)
+# and falls back to the plain operation on other backends (SQLite in
+# development). Migrations using it must set `atomic = False`, because Postgres
+# refuses CONCURRENTLY inside a transaction.
+
+def _check_concurrent(schema_editor):
+    if schema_editor.connection.in_atomic_block:
+        raise NotSupportedError(
+            "Concurrent index operations need a non-atomic migration (set atomic = False)."
+        )
+
+
+class AddIndexConcurrentlyOnPostgres(AddIndex):
+    def describe(self):
+        return "Concurrently create index %s on %s" % (self.index.name, self.model_name)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        _check_concurrent(schema_editor)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, concurrently=True)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        _check_concurrent(schema_editor)
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, concurrently=True)
+
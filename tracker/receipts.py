@@ -0,0 +1,159 @@
+import hashlib
+import io
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import FoodItem, ReceiptImage
+
+logger = logging.getLogger(__name__)
+
+# --- Receipt image pipeline ---
+# Uploads are stored once per distinct file (keyed by SHA-256), shared by every
+# item they are attached to, and deleted from disk only when the last item lets
+# go. Thumbnail/web variants are resized off the request path:
+#   RECEIPT_WORKER = 'thread' (default) - in-process background worker thread
+#                    'sync'             - inline, for tests and debugging
+#                    'off'              - leave it to `manage.py process_receipts`
+
+VARIANTS = {
+    # field: (max size, JPEG quality)
+    'thumbnail': ((160, 160), 70),
+    'web': ((1024, 1024), 80),
+}
+
+
+def _sha256(upload):
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+def store_receipt(upload):
+    """Returns the ReceiptImage for this file, saving it only if it is new."""
+    sha = _sha256(upload)
+    existing = ReceiptImage.objects.filter(sha256=sha).first()
+    if existing:
+        return existing
+
+    receipt = ReceiptImage(sha256=sha)
+    receipt.original.save(upload.name, upload, save=False)
+    try:
+        with transaction.atomic():
+            receipt.save()
+    except IntegrityError:
+        # A concurrent upload of the same file won the race; keep theirs
+        receipt.original.delete(save=False)
+        return ReceiptImage.objects.get(sha256=sha)
+    enqueue_variants(receipt.pk)
+    return receipt
+
+
+def attach_receipt(item, upload):
+    previous = item.receipt_id
+    item.receipt = store_receipt(upload)
+    item.save(update_fields=['receipt'])
+    if previous and previous != item.receipt_id:
+        release_receipt(previous)
+
+
+def detach_receipt(item):
+    previous = item.receipt_id
+    item.receipt = None
+    item.save(update_fields=['receipt'])
+    if previous:
+        release_receipt(previous)
+
+
+def release_receipt(receipt_id):
+    """Deletes the receipt and its files once no FoodItem references it. Returns True if deleted."""
+    with transaction.atomic():
+        receipt = ReceiptImage.objects.select_for_update().filter(pk=receipt_id).first()
+        if receipt is None or receipt.items.exists():
+            return False
+        files = [f for f in (receipt.original, receipt.thumbnail, receipt.web) if f]
+        storage, names = receipt.original.storage, [f.name for f in files]
+        receipt.delete()
+        # Only touch the disk once the row is really gone
+        transaction.on_commit(lambda: [storage.delete(name) for name in names])
+    return True
+
+
+def generate_variants(receipt):
+    from PIL import Image, ImageOps
+
+    try:
+        with receipt.original.open('rb') as fh:
+            image = ImageOps.exif_transpose(Image.open(fh))
+            image.load()
+    except (OSError, ValueError):
+        logger.warning("Receipt %s is not a readable image; serving the original", receipt.pk)
+        return
+
+    names = {}
+    for field, (size, quality) in VARIANTS.items():
+        variant = image.copy()
+        variant.thumbnail(size)
+        buffer = io.BytesIO()
+        variant.convert('RGB').save(buffer, 'JPEG', quality=quality, optimize=True)
+        file = getattr(receipt, field)
+        file.save(f'{receipt.sha256}.jpg', ContentFile(buffer.getvalue()), save=False)
+        names[field] = file.name
+    # update() so a concurrent change to the row is not overwritten
+    ReceiptImage.objects.filter(pk=receipt.pk).update(**names)
+
+
+def process_receipt(receipt_id):
+    receipt = ReceiptImage.objects.filter(pk=receipt_id).first()
+    if receipt is not None:
+        generate_variants(receipt)
+
+
+# Background worker: one daemon thread per process, started on first use
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _run_worker():
+    while True:
+        receipt_id = _queue.get()
+        close_old_connections()
+        try:
+            process_receipt(receipt_id)
+        except Exception:
+            logger.exception("Generating variants for receipt %s failed", receipt_id)
+        finally:
+            _queue.task_done()
+
+
+def _submit(receipt_id):
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_worker, name='receipt-worker', daemon=True)
+            _worker.start()
+    _queue.put(receipt_id)
+
+
+def enqueue_variants(receipt_id):
+    mode = getattr(settings, 'RECEIPT_WORKER', 'thread')
+    if mode == 'sync':
+        process_receipt(receipt_id)
+    elif mode == 'thread':
+        # The worker uses its own connection, so wait until the row is committed
+        transaction.on_commit(lambda: _submit(receipt_id))
+
+
+@receiver(post_delete, sender=FoodItem)
+def release_deleted_item_receipt(sender, instance, **kwargs):
+    if instance.receipt_id:
+        release_receipt(instance.receipt_id)
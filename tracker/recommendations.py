@@ -0,0 +1,129 @@
+from itertools import chain, zip_longest
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import versions
+from .models import Resource
+
+# --- Resource recommendation index ---
+# The whole Resource table, grouped as {category: {resource_type: [ranked...]}},
+# is built with one query per resources version (versions.RESOURCES_KEY) and
+# kept in the cache under that version, so a stale index is never served under
+# a newer version. The dashboard scores the candidates against the user's
+# inventory in memory, so rendering recommendations costs no Resource query.
+# The version itself is cached for VERSION_TIMEOUT seconds: a write in this
+# process drops it at once, one in another process (`seed`, another worker)
+# shows up when it expires, since the default cache is per process.
+
+VERSION_KEY = 'resource-index:version'
+VERSION_TIMEOUT = 60
+INDEX_TIMEOUT = 60 * 60 * 24  # old versions' indexes just expire
+RESCUE_TYPE = 'Recipe'
+# Within a category: recipes first, then videos, then articles
+TYPE_ORDER = [RESCUE_TYPE, 'Video', 'Article']
+LIMIT = 3
+
+
+def _index_queryset():
+    # Within a type, editorial (creation) order
+    return Resource.objects.order_by('category', 'resource_type', 'pk')
+
+
+def _group(resources):
+    index = {}
+    for resource in resources:
+        index.setdefault(resource.category, {}).setdefault(resource.resource_type, []).append(resource)
+    return index
+
+
+def build_index():
+    return _group(_index_queryset())
+
+
+def version():
+    current = cache.get(VERSION_KEY)
+    if current is None:
+        current = versions.get(versions.RESOURCES_KEY)[0]
+        cache.set(VERSION_KEY, current, timeout=VERSION_TIMEOUT)
+    return current
+
+
+async def aversion():
+    current = await cache.aget(VERSION_KEY)
+    if current is None:
+        current = (await versions.aget(versions.RESOURCES_KEY))[0]
+        await cache.aset(VERSION_KEY, current, timeout=VERSION_TIMEOUT)
+    return current
+
+
+def index_key(current):
+    return f'resource-index:{current}'
+
+
+def get_index(current=None):
+    """The index at resources version `current` (default: version())."""
+    key = index_key(version() if current is None else current)
+    index = cache.get(key)
+    if index is None:
+        index = build_index()
+        cache.set(key, index, timeout=INDEX_TIMEOUT)
+    return index
+
+
+async def aget_index(current=None):
+    key = index_key(await aversion() if current is None else current)
+    index = await cache.aget(key)
+    if index is None:
+        index = _group([resource async for resource in _index_queryset()])
+        await cache.aset(key, index, timeout=INDEX_TIMEOUT)
+    return index
+
+
+def invalidate_index():
+    cache.delete(VERSION_KEY)
+
+
+def type_rank(resource_type):
+    return TYPE_ORDER.index(resource_type) if resource_type in TYPE_ORDER else len(TYPE_ORDER)
+
+
+def _round_robin(lists, exclude=(), limit=LIMIT):
+    # First pick of every category, then the second of every category, ...
+    picked, seen = [], {r.pk for r in exclude}
+    lists = [[r for r in resources if r.pk not in seen] for resources in lists]
+    for resource in chain.from_iterable(zip_longest(*lists)):
+        if resource is not None and resource.pk not in seen:
+            picked.append(resource)
+            seen.add(resource.pk)
+            if len(picked) == limit:
+                break
+    return picked
+
+
+def recommend(index, profile):
+    """
+    profile: rows of FoodItemQuerySet.category_profile(). Categories are ranked
+    by value at risk, then units at risk, then value held. Returns
+    (rescue recipes for at-risk categories, other resources for held categories).
+    """
+    ranked = sorted(profile, key=lambda row: (-(row['at_risk_value'] or 0), -(row['at_risk_quantity'] or 0),
+                                              -(row['total_value'] or 0), row['category']))
+    at_risk = [row['category'] for row in ranked if row['at_risk_quantity']]
+    rescue = _round_robin([index.get(c, {}).get(RESCUE_TYPE, []) for c in at_risk])
+
+    general = []
+    for row in ranked:
+        by_type = index.get(row['category'], {})
+        general.append(list(chain.from_iterable(by_type[t] for t in sorted(by_type, key=type_rank))))
+    return rescue, _round_robin(general, exclude=rescue)
+
+
+@receiver(post_save, sender=Resource)
+@receiver(post_delete, sender=Resource)
+def invalidate_resource_index(sender, instance, **kwargs):
+    # A request between the write and its commit may re-cache the old version
+    invalidate_index()
+    transaction.on_commit(invalidate_index)
@@ -0,0 +1,132 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+
+from .models import ConsumptionLog, DailyRollup, WasteLog
+
+# --- Daily rollups ---
+# Every write that eats or wastes food adds its units and value to the
+# (user, day, category) row with an upsert that increments in place:
+#   INSERT ... ON CONFLICT (user_id, day, category) DO UPDATE SET x = x + excluded.x
+# (PostgreSQL and SQLite >= 3.24 share this syntax), so concurrent writers never
+# overwrite each other and a whole meal is one statement.
+
+MEASURES = ['consumed_units', 'consumed_value', 'wasted_units', 'wasted_value']
+COLUMNS = ['user_id', 'day', 'category'] + MEASURES
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def _upsert_prefix():
+    table = _quote(DailyRollup._meta.db_table)
+    return f"INSERT INTO {table} ({', '.join(map(_quote, COLUMNS))}) "
+
+
+def _upsert_suffix():
+    table = _quote(DailyRollup._meta.db_table)
+    updates = ', '.join(f"{_quote(m)} = {table}.{_quote(m)} + excluded.{_quote(m)}" for m in MEASURES)
+    return f" ON CONFLICT ({_quote('user_id')}, {_quote('day')}, {_quote('category')}) DO UPDATE SET {updates}"
+
+
+def add(deltas):
+    """deltas: {(user_id, day, category): {'consumed_units': n, ...}} -> one upsert statement."""
+    if not deltas:
+        return
+    rows, params = [], []
+    adapt_date = connection.ops.adapt_datefield_value
+    adapt_decimal = connection.ops.adapt_decimalfield_value
+    for (user_id, day, category), values in deltas.items():
+        rows.append('(' + ', '.join(['%s'] * len(COLUMNS)) + ')')
+        params += [
+            user_id, adapt_date(day), category,
+            values.get('consumed_units', 0), adapt_decimal(Decimal(values.get('consumed_value', 0)), 12, 2),
+            values.get('wasted_units', 0), adapt_decimal(Decimal(values.get('wasted_value', 0)), 12, 2),
+        ]
+    with connection.cursor() as cursor:
+        cursor.execute(_upsert_prefix() + 'VALUES ' + ', '.join(rows) + _upsert_suffix(), params)
+
+
+def add_consumption(logs, sign=1):
+    # sign=-1 takes deleted logs back out
+    deltas = defaultdict(lambda: defaultdict(Decimal))
+    for log in logs:
+        values = deltas[(log.user_id, log.date_consumed, log.category)]
+        values['consumed_units'] += sign * log.quantity
+        values['consumed_value'] += sign * log.quantity * Decimal(log.cost_per_unit)
+    add(deltas)
+
+
+def add_waste(entries):
+    deltas = defaultdict(lambda: defaultdict(Decimal))
+    for entry in entries:
+        values = deltas[(entry.user_id, entry.date_wasted, entry.category)]
+        values['wasted_units'] += entry.quantity
+        values['wasted_value'] += entry.quantity * Decimal(entry.cost_per_unit)
+    add(deltas)
+
+
+def add_from_select(select_sql, params):
+    """Upserts the rows of a SELECT yielding COLUMNS in order (used by the expiry sweep)."""
+    with connection.cursor() as cursor:
+        cursor.execute(_upsert_prefix() + select_sql + _upsert_suffix(), params)
+
+
+def category_totals(rows):
+    """Per-category sums over a (filtered) DailyRollup queryset - reads one row per category-day."""
+    return rows.values('category').annotate(**{m: Sum(m) for m in MEASURES}).order_by('category')
+
+
+def _ledger_select(model, date_column, units_target, value_target):
+    # SELECT user_id, day, category, <4 measures> FROM ledger GROUP BY user_id, day, category
+    measures = {
+        units_target: f"SUM({_quote('quantity')})",
+        value_target: f"SUM({_quote('quantity')} * {_quote('cost_per_unit')})",
+    }
+    select = ', '.join(measures.get(m, '0') for m in MEASURES)
+    group = f"{_quote('user_id')}, {_quote(date_column)}, {_quote('category')}"
+    # WHERE 1=1 keeps SQLite's parser from mistaking ON CONFLICT for a join clause
+    return f"SELECT {group}, {select} FROM {_quote(model._meta.db_table)} WHERE 1=1 GROUP BY {group}"
+
+
+def rebuild():
+    """Recomputes every rollup row from ConsumptionLog and WasteLog."""
+    with transaction.atomic():
+        DailyRollup.objects.all()._raw_delete(DailyRollup.objects.db)
+        add_from_select(_ledger_select(ConsumptionLog, 'date_consumed', 'consumed_units', 'consumed_value'), [])
+        add_from_select(_ledger_select(WasteLog, 'date_wasted', 'wasted_units', 'wasted_value'), [])
+    return DailyRollup.objects.count()
+
+
+def _ledger_totals(model, date_field, prefix):
+    value = ExpressionWrapper(F('quantity') * F('cost_per_unit'),
+                              output_field=DecimalField(max_digits=12, decimal_places=2))
+    totals = {}
+    rows = (model.objects.values_list('user_id', date_field, 'category')
+            .annotate(units=Sum('quantity'), value=Sum(value)).order_by())
+    for user_id, day, category, units, val in rows.iterator():
+        totals[(user_id, day, category)] = {f'{prefix}_units': units, f'{prefix}_value': Decimal(val or 0)}
+    return totals
+
+
+def verify():
+    """Returns (key, expected, stored) for every rollup row that disagrees with the ledgers."""
+    expected = defaultdict(lambda: dict.fromkeys(MEASURES, 0))
+    for prefix, model, date_field in (('consumed', ConsumptionLog, 'date_consumed'),
+                                      ('wasted', WasteLog, 'date_wasted')):
+        for key, values in _ledger_totals(model, date_field, prefix).items():
+            expected[key].update(values)
+
+    mismatches = []
+    stored = {}
+    for row in DailyRollup.objects.values_list('user_id', 'day', 'category', *MEASURES).iterator():
+        stored[row[:3]] = dict(zip(MEASURES, row[3:]))
+    for key in expected.keys() | stored.keys():
+        want = {m: round(Decimal(expected[key][m]), 2) for m in MEASURES} if key in expected else None
+        have = {m: round(Decimal(stored[key][m]), 2) for m in MEASURES} if key in stored else None
+        if want != have and not (want is None and not any(have.values())):
+            mismatches.append((key, want, have))
+    return mismatches
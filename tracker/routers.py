@@ -0,0 +1,78 @@
+import contextvars
+import functools
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# --- Primary / replica routing ---
+# Writes always go to the primary ('default'). Reads go there too, except inside
+# replica_reads(): the read-only pages (@reads_from_replica), exports and the
+# nightly analytics jobs. The replica is the optional 'replica' alias from
+# settings.py; without it everything stays on the primary.
+#
+# Read-your-writes: a write inside a replica_reads() block moves the rest of the
+# block back to the primary, and PrimaryPinMiddleware (tracker/middleware.py)
+# gives a client that just POSTed a short-lived cookie that keeps its replica
+# pages on the primary until the replica has caught up (REPLICA_PIN_SECONDS).
+
+REPLICA = 'replica'
+PIN_COOKIE = 'pin_primary'
+
+# {'alias': ...} for the current replica_reads() block, None outside one
+_reads = contextvars.ContextVar('tracker_replica_reads', default=None)
+
+
+def replica_alias():
+    return REPLICA if REPLICA in connections.settings else DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def replica_reads(alias=None):
+    token = _reads.set({'alias': alias or replica_alias()})
+    try:
+        yield
+    finally:
+        _reads.reset(token)
+
+
+def reads_from_replica(view):
+    """Runs a read-only view's queries on the replica, unless the client wrote something moments ago."""
+    def pinned(request):
+        return bool(request.COOKIES.get(PIN_COOKIE))
+
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if pinned(request):
+                return await view(request, *args, **kwargs)
+            with replica_reads():
+                return await view(request, *args, **kwargs)
+    else:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if pinned(request):
+                return view(request, *args, **kwargs)
+            with replica_reads():
+                return view(request, *args, **kwargs)
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        reads = _reads.get()
+        return reads['alias'] if reads else None
+
+    def db_for_write(self, model, **hints):
+        reads = _reads.get()
+        if reads:
+            reads['alias'] = DEFAULT_DB_ALIAS  # read our own write for the rest of the block
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both aliases
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema through replication
+        return db != REPLICA
@@ -0,0 +1,195 @@
+import re
+
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import FoodItem, Resource
+
+# --- Full-text search ---
+# Prefix search (search-as-you-type: "chi" finds "Chicken Breast") over a
+# user's FoodItem names and over Resource title/category/description, ranked
+# and paged in SQL. Each backend answers from an index:
+#   PostgreSQL - GIN indexes on tsvector expressions (simple config for item
+#                names, led by user_id via btree_gin; english, weighted
+#                title > category > description, for resources)
+#   SQLite     - FTS5 tables kept in sync by triggers on the base tables, so
+#                bulk_create, raw deletes and the sweep can't leave them stale
+# install() creates them (migration 0016); on SQLite it also runs after every
+# migrate, because rebuilding a table in a later migration drops its triggers.
+# Other backends fall back to an unindexed icontains.
+# A search is two queries: ranked ids for one page, then the rows.
+
+PAGE_SIZE = 20
+MAX_TERMS = 8
+
+ITEM_VECTOR = "to_tsvector('simple', name)"
+RESOURCE_VECTOR = ("setweight(to_tsvector('english', title), 'A') || "
+                   "setweight(to_tsvector('english', category), 'B') || "
+                   "setweight(to_tsvector('english', description), 'C')")
+
+# CONCURRENTLY, as in tracker/operations.py: the build doesn't block writes to
+# the table, and must run outside a transaction (migration 0016 is non-atomic)
+_POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS food_name_search_idx ON tracker_fooditem "
+    f"USING gin (user_id, ({ITEM_VECTOR}))",
+    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS resource_search_idx ON tracker_resource "
+    f"USING gin (({RESOURCE_VECTOR}))",
+]
+_POSTGRES_DROP = [
+    "DROP INDEX CONCURRENTLY IF EXISTS food_name_search_idx",
+    "DROP INDEX CONCURRENTLY IF EXISTS resource_search_idx",
+]
+
+# table: (fts columns, SQL for their values from a base-table row, base columns they come from, tokenizer)
+_FTS_TABLES = {
+    'tracker_fooditem': (['name', 'owner'], "{row}.name, 'u' || {row}.user_id", 'name, user_id',
+                         'unicode61 remove_diacritics 2'),
+    'tracker_resource': (['title', 'category', 'description'], "{row}.title, {row}.category, {row}.description",
+                         'title, category, description', 'porter unicode61 remove_diacritics 2'),
+}
+
+
+def _sqlite_ddl(table, existing):
+    columns, values, sources, tokenizer = _FTS_TABLES[table]
+    fts = f'{table}_fts'
+    names = ', '.join(columns)
+    statements = []
+    if fts not in existing:
+        statements += [
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, tokenize='{tokenizer}', prefix='2 3')",
+            f"INSERT INTO {fts} (rowid, {names}) SELECT id, {values.format(row=table)} FROM {table}",
+        ]
+    insert = f"INSERT INTO {fts} (rowid, {names}) VALUES (new.id, {values.format(row='new')});"
+    delete = f"DELETE FROM {fts} WHERE rowid = old.id;"
+    statements += [
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN {delete} END",
+        # Only when an indexed column is written: quantity and expiry updates skip it
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {sources} ON {table} BEGIN {delete} {insert} END",
+    ]
+    return statements
+
+
+def install(conn=connection):
+    """Creates the search indexes (idempotent); a no-op on backends without one."""
+    if conn.vendor == 'postgresql':
+        _execute(conn, _POSTGRES_DDL)
+    elif conn.vendor == 'sqlite':
+        existing = set(conn.introspection.table_names())
+        # Table, backfill and triggers together, so an interrupted run can't leave a half-filled index
+        with transaction.atomic(using=conn.alias):
+            _execute(conn, [sql for table in _FTS_TABLES if table in existing for sql in _sqlite_ddl(table, existing)])
+
+
+def uninstall(conn=connection):
+    if conn.vendor == 'postgresql':
+        statements = _POSTGRES_DROP
+    elif conn.vendor == 'sqlite':
+        statements = [f'DROP TABLE IF EXISTS {table}_fts' for table in _FTS_TABLES]  # its triggers go with it
+        statements += [f'DROP TRIGGER IF EXISTS {table}_fts_{event}'
+                       for table in _FTS_TABLES for event in ('insert', 'delete', 'update')]
+    else:
+        return
+    _execute(conn, statements)
+
+
+def _execute(conn, statements):
+    with conn.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def terms(query):
+    # Words only: nothing the user types reaches tsquery/MATCH syntax
+    return re.findall(r'\w+', (query or '').lower())[:MAX_TERMS]
+
+
+def _tsquery(words):
+    return ' & '.join(f'{word}:*' for word in words)
+
+
+def _match(words, column=None):
+    prefix = f'{column}:' if column else ''
+    return ' AND '.join(f'{prefix}"{word}"*' for word in words)
+
+
+def _page(conn, sql, params, page, per_page):
+    # One extra row tells whether there is a next page, without a COUNT
+    with conn.cursor() as cursor:
+        cursor.execute(f'{sql} LIMIT %s OFFSET %s', [*params, per_page + 1, (page - 1) * per_page])
+        ids = [row[0] for row in cursor.fetchall()]
+    return ids[:per_page], len(ids) > per_page
+
+
+def _fallback(queryset, words, fields, ordering, page, per_page):
+    # No index: every word must appear in one of the fields
+    for word in words:
+        queryset = queryset.filter(Q(*[(f'{field}__icontains', word) for field in fields], _connector=Q.OR))
+    ids = list(queryset.order_by(*ordering).values_list('id', flat=True)[(page - 1) * per_page:page * per_page + 1])
+    return ids[:per_page], len(ids) > per_page
+
+
+def _rows(queryset, ids):
+    by_id = queryset.in_bulk(ids)
+    return [by_id[pk] for pk in ids if pk in by_id]
+
+
+def matching_ids(model, query):
+    """
+    The ids of FoodItem or Resource rows matching every word of `query`, as a
+    subquery for filter(pk__in=...) (the admin's search box); None where there
+    is no index.
+    """
+    words = terms(query)
+    conn = connections[model.objects.db]
+    table = model._meta.db_table
+    if not words:
+        return None
+    if conn.vendor == 'postgresql':
+        vector, config = (ITEM_VECTOR, 'simple') if model is FoodItem else (RESOURCE_VECTOR, 'english')
+        return RawSQL(f"SELECT id FROM {table} WHERE {vector} @@ to_tsquery('{config}', %s)", [_tsquery(words)])
+    if conn.vendor == 'sqlite':
+        match = _match(words, 'name' if model is FoodItem else None)
+        return RawSQL(f"SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH %s", [match])
+    return None
+
+
+def search_items(user, query, page=1, per_page=PAGE_SIZE):
+    """The user's items matching every word of `query` as a prefix, best match first. Returns (items, has_next)."""
+    words = terms(query)
+    if not words:
+        return [], False
+    conn = connections[FoodItem.objects.db]  # the replica on @reads_from_replica pages
+    if conn.vendor == 'postgresql':
+        sql = (f"SELECT id FROM tracker_fooditem WHERE user_id = %s AND {ITEM_VECTOR} @@ to_tsquery('simple', %s) "
+               f"ORDER BY ts_rank({ITEM_VECTOR}, to_tsquery('simple', %s)) DESC, expiry_date, id")
+        ids, has_next = _page(conn, sql, [user.pk, _tsquery(words), _tsquery(words)], page, per_page)
+    elif conn.vendor == 'sqlite':
+        sql = "SELECT rowid FROM tracker_fooditem_fts WHERE tracker_fooditem_fts MATCH %s ORDER BY rank, rowid"
+        ids, has_next = _page(conn, sql, [f'owner:u{user.pk} AND {_match(words, "name")}'], page, per_page)
+    else:
+        ids, has_next = _fallback(FoodItem.objects.filter(user=user), words, ['name'],
+                                  ['expiry_date', 'id'], page, per_page)
+    return _rows(FoodItem.objects.with_status().select_related('receipt'), ids), has_next
+
+
+def search_resources(query, page=1, per_page=PAGE_SIZE):
+    """Resources matching every word of `query`; title hits rank above category and description hits."""
+    words = terms(query)
+    if not words:
+        return [], False
+    conn = connections[Resource.objects.db]
+    if conn.vendor == 'postgresql':
+        sql = (f"SELECT id FROM tracker_resource WHERE {RESOURCE_VECTOR} @@ to_tsquery('english', %s) "
+               f"ORDER BY ts_rank({RESOURCE_VECTOR}, to_tsquery('english', %s)) DESC, id")
+        ids, has_next = _page(conn, sql, [_tsquery(words), _tsquery(words)], page, per_page)
+    elif conn.vendor == 'sqlite':
+        sql = ("SELECT rowid FROM tracker_resource_fts WHERE tracker_resource_fts MATCH %s "
+               "ORDER BY bm25(tracker_resource_fts, 10.0, 5.0, 1.0), rowid")
+        ids, has_next = _page(conn, sql, [_match(words)], page, per_page)
+    else:
+        ids, has_next = _fallback(Resource.objects.all(), words, ['title', 'category', 'description'],
+                                  ['id'], page, per_page)
+    return _rows(Resource.objects.all(), ids), has_next
@@ -0,0 +1,247 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from . import rollups
+from .models import ConsumptionLog, FoodItem, ItemForecast, Tombstone, WasteLog
+from .receipts import release_receipt
+from .summary import invalidate_summary
+from .versions import stamp, stamp_many
+
+
+# --- Consumption service ---
+# One transaction for a whole meal: lock the rows, write every log with one
+# bulk_create, decrement the partly eaten items with one UPDATE and delete the
+# finished ones with one DELETE.
+
+
+def _remove_items(items, version_of):
+    """
+    Deletes locked inventory rows set-based: what the collector and the delete
+    signals would do row by row (SET_NULL the logs, drop the forecasts, leave
+    tombstones, release receipts), in a fixed handful of statements.
+    version_of maps each owner's user id to the inventory version to bury them at.
+    """
+    ids = [item.pk for item in items]
+    Tombstone.objects.bulk_create([
+        Tombstone(user_id=item.user_id, kind='item', object_id=item.pk, sync_version=version_of[item.user_id])
+        for item in items
+    ])
+    ConsumptionLog.objects.filter(source_item__in=ids).update(source_item=None)
+    for model, field in ((ItemForecast, 'item__in'), (FoodItem, 'pk__in')):
+        doomed = model.objects.filter(**{field: ids})
+        doomed._raw_delete(doomed.db)
+    for receipt_id in sorted({item.receipt_id for item in items if item.receipt_id}):
+        release_receipt(receipt_id)
+
+def consume_items(user, quantities):
+    """
+    Consume `quantities` ({item_id: units}) from the user's inventory.
+
+    Rows are locked with SELECT ... FOR UPDATE, so a double-submit waits for the
+    first one and then sees the decremented quantity. Requests for more units
+    than are left are capped at what is left, and None means all of it; unknown
+    or already finished items are skipped. Returns {'logs': [...], 'finished': [...names]}.
+    """
+    wanted = {int(pk): None if qty is None else int(qty)
+              for pk, qty in quantities.items() if qty is None or int(qty) > 0}
+    if not wanted:
+        return {'logs': [], 'finished': []}
+
+    with transaction.atomic():
+        items = list(FoodItem.objects.select_for_update().filter(user=user, pk__in=wanted).order_by('pk'))
+
+        logs, finished, decrements = [], [], {}
+        for item in items:
+            consumed = item.quantity if wanted[item.pk] is None else min(wanted[item.pk], item.quantity)
+            if consumed <= 0:
+                continue
+            logs.append(ConsumptionLog(
+                user=user,
+                source_item=item,
+                food_name=item.name,
+                category=item.category,
+                quantity=consumed,
+                cost_per_unit=item.cost_per_unit,
+            ))
+            if consumed >= item.quantity:
+                finished.append(item)
+            else:
+                decrements[item.pk] = consumed
+
+        # One inventory version for the logs, the decrements and the tombstones
+        version = stamp(user.pk)
+        for log in logs:
+            log.sync_version = version
+        ConsumptionLog.objects.bulk_create(logs)
+        rollups.add_consumption(logs)
+
+        if decrements:
+            FoodItem.objects.filter(pk__in=decrements).update(
+                quantity=F('quantity') - Case(*[When(pk=pk, then=Value(n)) for pk, n in decrements.items()]),
+                sync_version=version,
+                updated_at=timezone.now(),
+            )
+        if finished:
+            # source_item on the new logs is SET_NULL here, same as deleting one by one
+            _remove_items(finished, {user.pk: version})
+
+    # bulk_create/update send no signals, so drop the cached dashboard summary here
+    invalidate_summary(user.pk)
+
+    return {'logs': logs, 'finished': [item.name for item in finished]}
+
+
+def discard_item(item):
+    """Deletes an item by hand; whatever was left of it goes into the waste ledger."""
+    entries = discard_items(item.user, [item.pk])
+    return entries[0] if entries else None
+
+
+# --- Bulk actions ---
+# The dashboard's "selected items" toolbar. Each action is one transaction
+# with a fixed number of statements however many items are selected.
+
+def consume_all(user, item_ids):
+    """Eats everything left of the given items."""
+    return consume_items(user, dict.fromkeys(item_ids))
+
+
+def discard_items(user, item_ids):
+    """Deletes the items; what was left of them goes into the waste ledger. Returns the WasteLog rows."""
+    with transaction.atomic():
+        items = list(FoodItem.objects.select_for_update().filter(user=user, pk__in=item_ids).order_by('pk'))
+        if not items:
+            return []
+        entries = WasteLog.objects.bulk_create([
+            WasteLog(
+                user_id=item.user_id,
+                source_item_id=item.pk,
+                food_name=item.name,
+                category=item.category,
+                quantity=item.quantity,
+                cost_per_unit=item.cost_per_unit,
+                expiry_date=item.expiry_date,
+                reason='discarded',
+            )
+            for item in items
+        ])
+        rollups.add_waste(entries)
+        _remove_items(items, {user.pk: stamp(user.pk)})
+    invalidate_summary(user.pk)
+    return entries
+
+
+# What an item's forecast was computed from (tracker/forecast.py): an edit to any
+# of them voids its at-risk verdict, and the item falls back to the
+# expiring-soon rule until tonight's run
+FORECAST_INPUTS = {'name', 'category', 'quantity', 'expiry_date'}
+
+
+def _drop_forecasts(items):
+    stale = ItemForecast.objects.filter(item__in=items)
+    stale._raw_delete(stale.db)
+
+
+def shift_expiry(user, item_ids, days):
+    """Moves the expiry date of the given items by `days` (negative: earlier). Returns the number changed."""
+    with transaction.atomic():
+        items = list(FoodItem.objects.select_for_update().filter(user=user, pk__in=item_ids).order_by('pk'))
+        if not items:
+            return 0
+        version, now = stamp(user.pk), timezone.now()
+        for item in items:
+            item.expiry_date += timedelta(days=days)
+            item.sync_version, item.updated_at = version, now
+        FoodItem.objects.bulk_update(items, ['expiry_date', 'sync_version', 'updated_at'])
+        _drop_forecasts(items)
+    invalidate_summary(user.pk)
+    return len(items)
+
+
+def save_item_edit(form):
+    """Saves a FoodItemForm edit; like shift_expiry, drops the forecast if the edit changed what it was based on."""
+    with transaction.atomic():
+        item = form.save()
+        if FORECAST_INPUTS.intersection(form.changed_data):
+            _drop_forecasts([item])
+    return item
+
+
+# --- Admin actions ---
+# An operator's selection can span any number of users and rows. It is worked
+# through in batches of ids; each batch is one transaction with a fixed number
+# of statements, every owner's inventory is bumped by a single upsert and the
+# rows are stamped or buried with their owner's new version, so delta sync
+# clients see admin edits like any other write.
+
+ADMIN_BATCH_SIZE = 1000
+
+
+def _id_batches(queryset):
+    ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+    return [ids[start:start + ADMIN_BATCH_SIZE] for start in range(0, len(ids), ADMIN_BATCH_SIZE)]
+
+
+def delete_items_in_bulk(queryset):
+    """Deletes the items outright (an operator clean-up, so nothing goes into the waste ledger). Returns the count."""
+    deleted, owners = 0, set()
+    for ids in _id_batches(queryset):
+        with transaction.atomic():
+            items = list(FoodItem.objects.select_for_update().filter(pk__in=ids).order_by('pk')
+                         .only('pk', 'user_id', 'receipt_id'))
+            if items:
+                version_of = stamp_many({item.user_id for item in items})
+                _remove_items(items, version_of)
+                deleted += len(items)
+                owners.update(version_of)
+    for user_id in owners:
+        invalidate_summary(user_id)
+    return deleted
+
+
+def delete_logs_in_bulk(queryset):
+    """Deletes the consumption logs and takes them back out of the daily rollups. Returns the count."""
+    deleted, owners = 0, set()
+    for ids in _id_batches(queryset):
+        with transaction.atomic():
+            logs = list(ConsumptionLog.objects.select_for_update().filter(pk__in=ids).order_by('pk'))
+            if not logs:
+                continue
+            version_of = stamp_many({log.user_id for log in logs})
+            Tombstone.objects.bulk_create([
+                Tombstone(user_id=log.user_id, kind='log', object_id=log.pk, sync_version=version_of[log.user_id])
+                for log in logs
+            ])
+            rollups.add_consumption(logs, sign=-1)
+            doomed = ConsumptionLog.objects.filter(pk__in=[log.pk for log in logs])
+            doomed._raw_delete(doomed.db)
+            deleted += len(logs)
+            owners.update(version_of)
+    for user_id in owners:
+        invalidate_summary(user_id)
+    return deleted
+
+
+def shift_expiry_in_bulk(queryset, days):
+    """shift_expiry() for items of any users. Returns the number changed."""
+    changed, owners = 0, set()
+    for ids in _id_batches(queryset):
+        with transaction.atomic():
+            items = list(FoodItem.objects.select_for_update().filter(pk__in=ids).order_by('pk')
+                         .only('pk', 'user_id', 'expiry_date'))
+            if not items:
+                continue
+            version_of, now = stamp_many({item.user_id for item in items}), timezone.now()
+            for item in items:
+                item.expiry_date += timedelta(days=days)
+                item.sync_version, item.updated_at = version_of[item.user_id], now
+            FoodItem.objects.bulk_update(items, ['expiry_date', 'sync_version', 'updated_at'])
+            _drop_forecasts(items)
+            changed += len(items)
+            owners.update(version_of)
+    for user_id in owners:
+        invalidate_summary(user_id)
+    return changed
@@ -0,0 +1,132 @@
+import asyncio
+from datetime import date, datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ConsumptionLog, FoodItem
+from .recommendations import aget_index, aversion, recommend
+
+# --- Per-user dashboard summary cache ---
+# Everything on the dashboard except the (filterable) item table is cached per
+# user. The key embeds today's date so "expiring soon" states roll over at
+# midnight, and a global generation number so a bulk job can invalidate every
+# user's summary at once. A summary also records the resources version its
+# recommendations were ranked from and is rebuilt once that moves, so a
+# Resource write made in any process retires it.
+
+KEY_PREFIX = 'dashboard-summary'
+GENERATION_KEY = f'{KEY_PREFIX}:generation'
+HITS_KEY = f'{KEY_PREFIX}:hits'
+MISSES_KEY = f'{KEY_PREFIX}:misses'
+
+
+def _generation():
+    return cache.get_or_set(GENERATION_KEY, 1, timeout=None)
+
+
+def summary_key(user_id, today=None, generation=None):
+    today = today or date.today()
+    generation = generation or _generation()
+    return f'{KEY_PREFIX}:{user_id}:{today.isoformat()}:{generation}'
+
+
+async def asummary_key(user_id, today=None):
+    return summary_key(user_id, today, await cache.aget_or_set(GENERATION_KEY, 1, timeout=None))
+
+
+def _seconds_until_midnight():
+    tomorrow = datetime.combine(date.today() + timedelta(days=1), time.min)
+    return max(int((tomorrow - datetime.now()).total_seconds()), 1)
+
+
+def _incr(key, initial=1):
+    # incr() on a missing (or evicted) key raises ValueError
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, initial, timeout=None)
+
+
+async def _aincr(key, initial=1):
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aset(key, initial, timeout=None)
+
+
+def _assemble(stats, profile, index, recent_logs, resources):
+    # WASTE RESCUE & SMART RECOMMENDATIONS: ranked in memory from the cached
+    # resource index against what the user holds and what is at risk (tracker/recommendations.py)
+    rescue_recipes, general_resources = recommend(index, profile)
+    return {
+        'resources_version': resources,
+        'total': stats['total'],
+        'expired_count': stats['expired_count'],
+        'soon_count': stats['soon_count'],
+        'categories': [row['category'] for row in profile],
+        'rescue_recipes': rescue_recipes,
+        'resources': general_resources,
+        'recent_logs': recent_logs,
+    }
+
+
+def _recent_logs(user):
+    return ConsumptionLog.objects.filter(user=user).order_by('-date_consumed', '-id')[:3]
+
+
+async def abuild_summary(user, today=None):
+    """Runs the dashboard's stats/recommendation queries, awaited together, and returns plain lists."""
+    fresh_items = FoodItem.objects.filter(user=user)
+
+    async def rows(queryset):
+        return [row async for row in queryset]
+
+    resources = await aversion()
+    return _assemble(*await asyncio.gather(
+        fresh_items.astatus_counts(today),
+        rows(fresh_items.category_profile(today)),
+        aget_index(resources),
+        rows(_recent_logs(user)),
+    ), resources)
+
+
+async def aget_summary(user):
+    key = await asummary_key(user.pk)
+    summary = await cache.aget(key)
+    if summary is not None and summary['resources_version'] == await aversion():
+        await _aincr(HITS_KEY)
+        return summary
+    await _aincr(MISSES_KEY)
+    summary = await abuild_summary(user)
+    await cache.aset(key, summary, timeout=_seconds_until_midnight())
+    return summary
+
+
+def invalidate_summary(user_id):
+    cache.delete(summary_key(user_id))
+
+
+def invalidate_all_summaries():
+    # Bumping the generation orphans every cached summary; they expire at midnight
+    _incr(GENERATION_KEY, initial=2)
+
+
+def cache_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_rate': hits / lookups if lookups else 0.0}
+
+
+@receiver(post_save, sender=FoodItem)
+@receiver(post_delete, sender=FoodItem)
+@receiver(post_save, sender=ConsumptionLog)
+@receiver(post_delete, sender=ConsumptionLog)
+def invalidate_user_summary(sender, instance, **kwargs):
+    # Runs inside SyncTracked.save()'s transaction: a request before the commit
+    # would re-cache the old rows, so drop the summary again once they are visible
+    invalidate_summary(instance.user_id)
+    transaction.on_commit(lambda: invalidate_summary(instance.user_id))
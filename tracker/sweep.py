@@ -0,0 +1,122 @@
+from datetime import date, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import rollups, versions
+from .models import ChangeCounter, ConsumptionLog, FoodItem, ItemForecast, Tombstone, WasteLog
+from .receipts import release_receipt
+from .summary import invalidate_all_summaries
+
+# --- Expiry sweep ---
+# Moves expired inventory into the WasteLog ledger for every user at once.
+# Each batch is a range of FoodItem ids handled by a handful of set-based
+# statements in one transaction (INSERT ... SELECT, UPDATE, DELETE), so a
+# crash loses at most the batch in flight and a re-run simply carries on with
+# whatever is still in inventory.
+
+BATCH_SIZE = 5000
+
+_WASTE_COLUMNS = ['user_id', 'source_item_id', 'food_name', 'category', 'quantity',
+                  'cost_per_unit', 'expiry_date', 'date_wasted', 'reason']
+_ITEM_COLUMNS = ['user_id', 'id', 'name', 'category', 'quantity',
+                 'cost_per_unit', 'expiry_date']
+
+
+def _insert_sql():
+    quote = connection.ops.quote_name
+    return (
+        f"INSERT INTO {quote(WasteLog._meta.db_table)} ({', '.join(map(quote, _WASTE_COLUMNS))}) "
+        f"SELECT {', '.join(map(quote, _ITEM_COLUMNS))}, %s, 'expired' FROM {quote(FoodItem._meta.db_table)} "
+        f"WHERE {quote('expiry_date')} < %s AND {quote('id')} > %s AND {quote('id')} <= %s"
+    )
+
+
+def _batch_users_sql():
+    quote = connection.ops.quote_name
+    return (
+        f"SELECT {quote('user_id')} FROM {quote(FoodItem._meta.db_table)} "
+        f"WHERE {quote('expiry_date')} < %s AND {quote('id')} > %s AND {quote('id')} <= %s"
+    )
+
+
+def _rollup_sql():
+    # One wasted-units/value row per (user, category) in the batch, dated today
+    quote = connection.ops.quote_name
+    value = f"SUM({quote('quantity')} * {quote('cost_per_unit')})"
+    return (
+        f"SELECT {quote('user_id')}, %s, {quote('category')}, 0, 0, SUM({quote('quantity')}), {value} "
+        f"FROM {quote(FoodItem._meta.db_table)} "
+        f"WHERE {quote('expiry_date')} < %s AND {quote('id')} > %s AND {quote('id')} <= %s "
+        f"GROUP BY {quote('user_id')}, {quote('category')}"
+    )
+
+
+def _tombstone_sql():
+    # Stamped with each user's version as just bumped for this batch
+    quote = connection.ops.quote_name
+    item, counter = quote(FoodItem._meta.db_table), quote(ChangeCounter._meta.db_table)
+    columns = ['user_id', 'kind', 'object_id', 'sync_version', 'deleted_at']
+    return (
+        f"INSERT INTO {quote(Tombstone._meta.db_table)} ({', '.join(map(quote, columns))}) "
+        f"SELECT {item}.{quote('user_id')}, 'item', {item}.{quote('id')}, {counter}.{quote('value')}, %s "
+        f"FROM {item} JOIN {counter} ON {counter}.{quote('key')} = 'inventory:' || {item}.{quote('user_id')} "
+        f"WHERE {quote('expiry_date')} < %s AND {item}.{quote('id')} > %s AND {item}.{quote('id')} <= %s"
+    )
+
+
+def expired_items(cutoff):
+    return FoodItem.objects.filter(expiry_date__lt=cutoff)
+
+
+def sweep_batch(cutoff, after_id, upto_id, today):
+    """Ledgers and removes expired items with after_id < id <= upto_id. Returns rows moved."""
+    batch = expired_items(cutoff).filter(id__gt=after_id, id__lte=upto_id)
+    adapt = connection.ops.adapt_datefield_value
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(_insert_sql(), [adapt(today), adapt(cutoff), after_id, upto_id])
+            moved = cursor.rowcount
+        rollups.add_from_select(_rollup_sql(), [adapt(today), adapt(cutoff), after_id, upto_id])
+        versions.bump_inventory_from_select(_batch_users_sql(), [adapt(cutoff), after_id, upto_id])
+        with connection.cursor() as cursor:
+            cursor.execute(_tombstone_sql(), [connection.ops.adapt_datetimefield_value(timezone.now()), adapt(cutoff), after_id, upto_id])
+        # What Collector would do row by row: SET_NULL the logs, cascade the forecasts, then delete
+        ConsumptionLog.objects.filter(source_item__in=batch).update(source_item=None)
+        forecasts = ItemForecast.objects.filter(item__in=batch)
+        forecasts._raw_delete(forecasts.db)
+        receipt_ids = list(batch.exclude(receipt=None).values_list('receipt_id', flat=True).distinct())
+        batch._raw_delete(batch.db)
+        for receipt_id in receipt_ids:
+            release_receipt(receipt_id)
+    return moved
+
+
+def sweep_expired(today=None, grace_days=0, batch_size=BATCH_SIZE, dry_run=False):
+    """
+    Moves items that expired more than `grace_days` ago into WasteLog.
+    Yields the running total after each batch.
+    """
+    today = today or date.today()
+    cutoff = today - timedelta(days=grace_days)
+    if dry_run:
+        yield expired_items(cutoff).count()
+        return
+
+    after_id, total = 0, 0
+    while True:
+        pending = expired_items(cutoff).filter(id__gt=after_id).order_by('id')
+        # Keyset over id: the batch ends at the batch_size-th expired id (or the last one)
+        upto_id = pending.values_list('id', flat=True)[batch_size - 1:batch_size].first()
+        if upto_id is None:
+            upto_id = pending.aggregate(last=Max('id'))['last']
+        if upto_id is None:
+            break
+        total += sweep_batch(cutoff, after_id, upto_id, today)
+        after_id = upto_id
+        yield total
+
+    if total:
+        # Raw SQL sends no signals; drop every cached dashboard summary at once
+        invalidate_all_summaries()
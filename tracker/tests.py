@@ -1,3 +1,1391 @@
-from django.test import TestCase
+import io
+import json
+import os
+import re
+import tempfile
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (ConsumptionLog, DailyRollup, FoodItem, ItemForecast, ReceiptImage, Resource, Tombstone,
+                     UserInsights, WasteLog)
+from . import analytics, catalog, forecast, recommendations, bench, metrics, rollups, routers, search, versions
+from .importers import import_items
+from .services import consume_items
+from .summary import cache_stats, summary_key
+
+
+def make_items(user, count, start=-5):
+    # Spread expiry dates across expired / soon / fresh
+    FoodItem.objects.bulk_create([
+        FoodItem(
+            user=user,
+            name=f"Item {i}",
+            category=FoodItem.CATEGORIES[i % len(FoodItem.CATEGORIES)][0],
+            quantity=1 + i % 4,
+            expiry_date=date.today() + timedelta(days=start + i % 15),
+            cost_per_unit=10,
+        )
+        for i in range(count)
+    ])
+
+
+class DashboardQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.force_login(self.user)
+        Resource.objects.create(title="Banana Bread", description="x", url="https://example.com",
+                                category="Fruits", resource_type="Recipe")
+
+    def test_status_annotations_match_python_properties(self):
+        make_items(self.user, 30)
+        for item in FoodItem.objects.with_status():
+            python_days = (item.expiry_date - date.today()).days
+            self.assertEqual(item.days_remaining, python_days)
+            expected = 'expired' if python_days < 0 else 'soon' if python_days <= 3 else 'fresh'
+            self.assertEqual(item.status, expected)
+
+        counts = FoodItem.objects.filter(user=self.user).status_counts()
+        self.assertEqual(counts['total'], 30)
+        self.assertEqual(counts['expired_count'], FoodItem.objects.expired().count())
+        self.assertEqual(counts['soon_count'], FoodItem.objects.expiring_soon().count())
+
+    def test_dashboard_query_count_is_constant(self):
+        make_items(self.user, 5)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse('dashboard'))
+
+        # bulk_create sends no signals, so drop the cached summary by hand
+        make_items(self.user, 300)
+        cache.clear()
+        with self.assertNumQueries(len(small.captured_queries)):
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['total'], 305)
+
+    def test_status_filter_runs_in_sql(self):
+        make_items(self.user, 30)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('dashboard'), {'status': 'expired'})
+        items = response.context['items']
+        item_sql = [q['sql'] for q in ctx.captured_queries if '"tracker_receiptimage"' in q['sql']]
+        self.assertIn('"tracker_fooditem"."expiry_date" <', item_sql[0])
+        self.assertTrue(all(i.days_remaining < 0 for i in items))
+        self.assertEqual(len(items), response.context['expired_count'])
+
+
+class HotQueryIndexTests(TestCase):
+    """EXPLAIN the per-user hot queries on a large dataset and fail on full table scans."""
+
+    USERS = 40
+    ROWS_PER_USER = 150
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [User.objects.create_user(f'user{u}') for u in range(cls.USERS)]
+        for user in users:
+            make_items(user, cls.ROWS_PER_USER)
+            ConsumptionLog.objects.bulk_create([
+                ConsumptionLog(user=user, food_name=f"Item {i}", category='Dairy', quantity=1)
+                for i in range(cls.ROWS_PER_USER)
+            ])
+        Resource.objects.bulk_create([
+            Resource(title=f"Res {i}", description="x", url="https://example.com",
+                     category=FoodItem.CATEGORIES[i % 6][0],
+                     resource_type=['Article', 'Video', 'Recipe'][i % 3])
+            for i in range(600)
+        ])
+        cls.user = users[0]
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertNoSeqScan(self, queryset):
+        table = queryset.model._meta.db_table
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            full_scan = f'Seq Scan on {table}' in plan
+        else:
+            full_scan = re.search(rf'\bSCAN {table}\b', plan) is not None
+        self.assertFalse(full_scan, f"Sequential scan on {table}:\n{plan}")
+
+    def test_hot_queries_use_indexes(self):
+        today = date.today()
+        items = FoodItem.objects.filter(user=self.user)
+        self.assertNoSeqScan(items.order_by('expiry_date'))
+        self.assertNoSeqScan(items.filter(expiry_date__range=[today, today + timedelta(days=3)]))
+        self.assertNoSeqScan(items.filter(category='Dairy'))
+        self.assertNoSeqScan(ConsumptionLog.objects.filter(user=self.user).order_by('-date_consumed', '-id'))
+        self.assertNoSeqScan(Resource.objects.filter(category__in=['Dairy', 'Fruits'], resource_type='Recipe'))
+
+
+class HistoryPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='pw')
+        self.client.force_login(self.user)
+        ConsumptionLog.objects.bulk_create([
+            ConsumptionLog(user=self.user, food_name=f"Log {i}",
+                           category='Dairy' if i % 2 else 'Fruits', quantity=1)
+            for i in range(120)
+        ])
+        # auto_now_add pins everything to today; spread rows over several days sharing dates
+        for log in ConsumptionLog.objects.all():
+            ConsumptionLog.objects.filter(pk=log.pk).update(date_consumed=date.today() - timedelta(days=log.pk % 7))
+
+    def walk(self, **params):
+        seen, cursor = [], None
+        while True:
+            query = dict(params, **({'after': cursor} if cursor else {}))
+            page = self.client.get(reverse('history'), query).context['page']
+            seen.extend(page.rows)
+            if not page.has_next:
+                return seen
+            cursor = page.next_cursor
+
+    def test_pages_cover_every_row_once_in_order(self):
+        seen = self.walk()
+        expected = list(ConsumptionLog.objects.filter(user=self.user).order_by('-date_consumed', '-id'))
+        self.assertEqual(seen, expected)
+
+    def test_prev_cursor_returns_previous_page(self):
+        first = self.client.get(reverse('history')).context['page']
+        second = self.client.get(reverse('history'), {'after': first.next_cursor}).context['page']
+        back = self.client.get(reverse('history'), {'before': second.prev_cursor}).context['page']
+        self.assertEqual(back.rows, first.rows)
+        self.assertFalse(back.has_prev)
+
+    def test_filters_and_bad_cursor(self):
+        start = date.today() - timedelta(days=3)
+        seen = self.walk(category='Dairy', start=start.isoformat())
+        self.assertTrue(seen)
+        self.assertTrue(all(log.category == 'Dairy' and log.date_consumed >= start for log in seen))
+        page = self.client.get(reverse('history'), {'after': 'garbage'}).context['page']
+        self.assertEqual(len(page), 50)
+
+    def test_deep_page_costs_same_queries(self):
+        first = self.client.get(reverse('history')).context['page']
+        with CaptureQueriesContext(connection) as page_one:
+            self.client.get(reverse('history'))
+        with self.assertNumQueries(len(page_one.captured_queries)):
+            self.client.get(reverse('history'), {'after': first.next_cursor})
+
+
+class DashboardSummaryCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('carol', password='pw')
+        self.client.force_login(self.user)
+        self.milk = FoodItem.objects.create(user=self.user, name="Milk", category='Dairy',
+                                            expiry_date=date.today() + timedelta(days=1))
+
+    def test_hit_skips_summary_queries(self):
+        with CaptureQueriesContext(connection) as miss:
+            self.client.get(reverse('dashboard'))
+        with CaptureQueriesContext(connection) as hit:
+            response = self.client.get(reverse('dashboard'))
+        self.assertLess(len(hit.captured_queries), len(miss.captured_queries))
+        self.assertEqual(response.context['soon_count'], 1)
+        self.assertEqual(cache_stats()['hits'], 1)
+        self.assertEqual(cache_stats()['misses'], 1)
+
+    def test_signals_invalidate(self):
+        self.client.get(reverse('dashboard'))
+        FoodItem.objects.create(user=self.user, name="Old Bread", category='Grains',
+                                expiry_date=date.today() - timedelta(days=2))
+        self.assertEqual(self.client.get(reverse('dashboard')).context['expired_count'], 1)
+
+        recipe = Resource.objects.create(title="Milk Pancakes", description="x", url="https://example.com",
+                                         category='Dairy', resource_type='Recipe')
+        self.assertEqual(self.client.get(reverse('dashboard')).context['rescue_recipes'], [recipe])
+        self.assertEqual(cache_stats()['hits'], 0)
+
+    def test_summary_cached_before_the_commit_is_dropped_after_it(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            FoodItem.objects.create(user=self.user, name="Old Bread", category='Grains',
+                                    expiry_date=date.today() - timedelta(days=2))
+            # A request between the save and the commit caches the pre-commit rows
+            cache.set(summary_key(self.user.pk), {'stale': True})
+        self.assertIsNone(cache.get(summary_key(self.user.pk)))
+
+    def test_key_rolls_over_at_midnight(self):
+        today = date.today()
+        self.assertNotEqual(summary_key(self.user.pk, today), summary_key(self.user.pk, today + timedelta(days=1)))
+
+
+class ConsumptionServiceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('dave', password='pw')
+        self.client.force_login(self.user)
+
+    def add(self, name, quantity):
+        return FoodItem.objects.create(user=self.user, name=name, category='Dairy', quantity=quantity,
+                                       expiry_date=date.today() + timedelta(days=5))
+
+    def test_meal_decrements_finishes_and_caps(self):
+        milk, eggs, cheese = self.add("Milk", 3), self.add("Eggs", 2), self.add("Cheese", 1)
+        result = consume_items(self.user, {milk.pk: 2, eggs.pk: 5, cheese.pk: 1})
+
+        self.assertEqual(sorted(result['finished']), ["Cheese", "Eggs"])
+        self.assertEqual(FoodItem.objects.get(pk=milk.pk).quantity, 1)
+        self.assertFalse(FoodItem.objects.filter(pk__in=[eggs.pk, cheese.pk]).exists())
+        logged = dict(ConsumptionLog.objects.values_list('food_name', 'quantity'))
+        self.assertEqual(logged, {"Milk": 2, "Eggs": 2, "Cheese": 1})
+
+    def test_meal_query_count_does_not_grow_with_items(self):
+        small = {self.add(f"A{i}", 2).pk: 1 for i in range(2)}
+        large = {self.add(f"B{i}", 2).pk: 1 for i in range(40)}
+        with CaptureQueriesContext(connection) as few:
+            consume_items(self.user, small)
+        with self.assertNumQueries(len(few.captured_queries)):
+            consume_items(self.user, large)
+
+    def test_repeated_post_never_logs_missing_units(self):
+        milk = self.add("Milk", 1)
+        self.client.post(reverse('log_food', args=[milk.pk]))
+        self.client.post(reverse('log_meal'), {'item': [milk.pk], f'quantity-{milk.pk}': 1})
+        self.assertEqual(ConsumptionLog.objects.count(), 1)
+
+    def test_log_food_quantity(self):
+        milk = self.add("Milk", 4)
+        self.client.post(reverse('log_food', args=[milk.pk]), {'quantity': 3})
+        self.assertEqual(FoodItem.objects.get(pk=milk.pk).quantity, 1)
+        self.assertEqual(ConsumptionLog.objects.get().quantity, 3)
+
+
+class ImportItemsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('erin', password='pw')
+        self.client.force_login(self.user)
+
+    def test_csv_upload_keeps_good_rows_and_reports_bad_ones(self):
+        csv_data = (
+            "name,category,quantity,expiry_date,cost_per_unit\n"
+            "Milk,Dairy,2,2030-01-01,1.50\n"
+            "Mystery,Rocks,1,2030-01-01,1\n"
+            "Rice,Grains,1,not-a-date,3\n"
+            "Apple,Fruits,6,2030-02-01,0.40\n"
+        )
+        upload = SimpleUploadedFile("items.csv", csv_data.encode())
+        result = self.client.post(reverse('import_items'), {'file': upload}).context['result']
+
+        self.assertEqual((result['created'], result['failed']), (2, 2))
+        self.assertEqual([line for line, _ in result['errors']], [3, 4])
+        self.assertIn('category', result['errors'][0][1])
+        self.assertEqual(set(FoodItem.objects.filter(user=self.user).values_list('name', flat=True)), {"Milk", "Apple"})
+
+    def test_ndjson_batches(self):
+        lines = [f'{{"name": "Item {i}", "category": "Snacks", "quantity": 1, '
+                 f'"expiry_date": "2030-01-01", "cost_per_unit": "2.00"}}' for i in range(7)]
+        lines.insert(3, '{broken')
+        data = io.BytesIO("\n".join(lines).encode())
+        with CaptureQueriesContext(connection) as ctx:
+            result = import_items(self.user, data, fmt='ndjson', batch_size=3)
+        self.assertEqual((result['created'], result['failed']), (7, 1))
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "tracker_fooditem"')]
+        self.assertEqual(len(inserts), 3)
+
+    def test_undecodable_file_keeps_earlier_batches_and_reports_it(self):
+        # A Latin-1 Excel export: plain ASCII rows, then an accented name well past the first read buffer
+        rows = "".join(f"Item {i},Snacks,1,2030-01-01,1\n" for i in range(1000))
+        latin1 = ("name,category,quantity,expiry_date,cost_per_unit\n" + rows
+                  + "Crème fraîche,Dairy,1,2030-01-01,2\n").encode('latin-1')
+        upload = SimpleUploadedFile("excel.csv", latin1)
+        response = self.client.post(reverse('import_items'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        result = response.context['result']
+        self.assertGreater(result['created'], 0)
+        self.assertEqual(result['created'], FoodItem.objects.filter(user=self.user).count())
+        line, problem = result['errors'][-1]
+        self.assertIsNone(line)
+        self.assertIn('UTF-8', problem['file'][0])
+        self.assertContains(response, 'not UTF-8')
+
+    def test_malformed_csv_is_reported_not_raised(self):
+        data = io.BytesIO(b"name,category,quantity,expiry_date,cost_per_unit\nMilk,Dairy,2,2030-01-01,1\n"
+                          + b"Rice," + b"x" * 200_000 + b"\n")
+        result = import_items(self.user, data)
+        self.assertEqual(result['created'], 1)
+        self.assertIn('Malformed CSV', result['errors'][-1][1]['file'][0])
+
+    def test_management_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as fh:
+            fh.write("name,category,quantity,expiry_date,cost_per_unit\nEggs,Dairy,12,2030-01-01,0.2\n")
+            fh.flush()
+            call_command('import_items', fh.name, user='erin', stdout=io.StringIO())
+        self.assertTrue(FoodItem.objects.filter(user=self.user, name="Eggs", quantity=12).exists())
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('frank', password='pw')
+        self.client.force_login(self.user)
+
+    def test_item_export_formats_and_date_range(self):
+        make_items(self.user, 20)
+        start = date.today()
+        response = self.client.get(reverse('export_items'), {'start': start.isoformat()})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,name,category,quantity,expiry_date,cost_per_unit,created_at')
+        self.assertEqual(len(lines) - 1, FoodItem.objects.filter(user=self.user, expiry_date__gte=start).count())
+
+        response = self.client.get(reverse('export_items'), {'format': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 20)
+
+    def test_history_export_memory_is_bounded(self):
+        # Seed with one INSERT ... SELECT so a million rows take seconds, not minutes
+        rows = int(os.environ.get('EXPORT_TEST_ROWS', 1_000_000))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO tracker_consumptionlog (user_id, food_name, category, quantity, cost_per_unit, "
+                "date_consumed, updated_at, sync_version) "
+                "WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < %s) "
+                "SELECT %s, 'Seeded food', 'Dairy', 1, 0, %s, %s, 0 FROM seq",
+                [rows, self.user.pk, date.today(), timezone.now()],
+            )
+
+        response = self.client.get(reverse('export_history'))
+        tracemalloc.start()
+        try:
+            lines = sum(chunk.count(b'\n') for chunk in response.streaming_content)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(lines, rows + 1)
+        self.assertLess(peak, 10 * 1024 * 1024, f"peak {peak / 1e6:.1f} MB")
+
+
+class SeedCommandTests(TestCase):
+    def snapshot(self):
+        items = FoodItem.objects.filter(user__username__startswith='seed_user_').order_by('user__username', 'id')
+        logs = ConsumptionLog.objects.filter(user__username__startswith='seed_user_').order_by('user__username', 'id')
+        return (list(items.values_list('user__username', 'name', 'category', 'quantity', 'expiry_date')),
+                list(logs.values_list('user__username', 'food_name', 'quantity', 'date_consumed')))
+
+    def test_synthetic_data_is_deterministic_and_rerunnable(self):
+        options = dict(users=3, items_per_user=7, logs_per_user=5, days_of_history=30, seed=7, stdout=io.StringIO())
+        call_command('seed', **options)
+        first = self.snapshot()
+        call_command('seed', **options)
+
+        self.assertEqual(self.snapshot(), first)
+        self.assertEqual(len(first[0]), 21)
+        self.assertEqual(len(first[1]), 15)
+        self.assertEqual(User.objects.filter(username__startswith='seed_user_', profile__isnull=False).count(), 3)
+        oldest = date.today() - timedelta(days=30)
+        self.assertTrue(all(row[3] >= oldest for row in first[1]))
+
+
+class BenchCommandTests(TestCase):
+    def test_bench_reports_every_view_and_rolls_back(self):
+        user = User.objects.create_user('demo_user')
+        make_items(user, 10)
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'bench.json')
+            call_command('bench', iterations=3, output=output, stdout=io.StringIO())
+            results = bench.load(output)
+
+        self.assertEqual(set(results['views']), set(bench.SCENARIOS))
+        for stats in results['views'].values():
+            self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+            self.assertGreater(stats['queries'], 0)
+            self.assertTrue(set(stats['status_codes']) <= {200, 302})
+        self.assertEqual(FoodItem.objects.filter(user=user).count(), 10)
+
+        slower = json.loads(json.dumps(results))
+        slower['views']['dashboard']['queries'] += 5
+        self.assertEqual(len(bench.compare(slower, results)), 1)
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.user = User.objects.create_user('gina', password='pw')
+
+    @override_settings(TRACKER_METRICS_ENABLED=True, METRICS_TOKEN='')
+    def test_server_timing_and_prometheus_output(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('dashboard'))
+        timing = response['Server-Timing']
+        for part in ('db;dur=', 'tpl;dur=', 'app;dur=', 'total;dur='):
+            self.assertIn(part, timing)
+
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('tracker_request_duration_seconds_count{view="dashboard"} 1', body)
+        self.assertIn('tracker_template_duration_seconds_bucket{view="dashboard",le="+Inf"} 1', body)
+        self.assertRegex(body, r'tracker_db_queries_total\{view="dashboard"\} [1-9]')
+        self.assertIn('tracker_dashboard_cache_total{result="miss"}', body)
+
+    @override_settings(TRACKER_METRICS_ENABLED=True, METRICS_TOKEN='')
+    async def test_async_chain_counts_queries(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.get(reverse('dashboard'))
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+    @override_settings(TRACKER_METRICS_ENABLED=True, METRICS_TOKEN='s3cret')
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(TRACKER_METRICS_ENABLED=False)
+    def test_disabled_is_a_no_op(self):
+        self.client.force_login(self.user)
+        self.assertNotIn('Server-Timing', self.client.get(reverse('dashboard')))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+
+def photo_upload(name='receipt.png', color='red', size=(800, 600)):
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class ReceiptPipelineTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media.name, RECEIPT_WORKER='sync')
+        self.settings_override.enable()
+        self.user = User.objects.create_user('hana', password='pw')
+        self.client.force_login(self.user)
+        self.milk, self.eggs = (
+            FoodItem.objects.create(user=self.user, name=name, category='Dairy',
+                                    expiry_date=date.today() + timedelta(days=4))
+            for name in ("Milk", "Eggs")
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.media.cleanup()
+
+    def stored_files(self):
+        return sorted(str(p.relative_to(self.media.name)) for p in Path(self.media.name).rglob('*') if p.is_file())
+
+    def test_same_receipt_is_stored_once_with_small_variants(self):
+        for item in (self.milk, self.eggs):
+            self.client.post(reverse('upload_image', args=[item.pk]), {'receipt_image': photo_upload()})
+
+        receipt = ReceiptImage.objects.get()
+        self.assertEqual(receipt.items.count(), 2)
+        self.assertEqual(len(self.stored_files()), 3)  # original + thumbnail + web
+        from PIL import Image
+        with receipt.thumbnail.open('rb') as fh:
+            self.assertLessEqual(max(Image.open(fh).size), 160)
+
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, receipt.thumbnail.url, count=2)
+
+    def test_files_are_deleted_with_the_last_reference(self):
+        for item in (self.milk, self.eggs):
+            self.client.post(reverse('upload_image', args=[item.pk]), {'receipt_image': photo_upload()})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('delete_image', args=[self.milk.pk]))
+        self.assertEqual(len(self.stored_files()), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('delete_item', args=[self.eggs.pk]))
+        self.assertFalse(ReceiptImage.objects.exists())
+        self.assertEqual(self.stored_files(), [])
+
+    def test_replacing_a_receipt_releases_the_old_one(self):
+        self.client.post(reverse('upload_image', args=[self.milk.pk]), {'receipt_image': photo_upload()})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('upload_image', args=[self.milk.pk]),
+                             {'receipt_image': photo_upload('other.png', color='blue')})
+        self.assertEqual(ReceiptImage.objects.count(), 1)
+        self.assertEqual(len(self.stored_files()), 3)
+
+
+class SweepExpiredTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(f'sweep{i}') for i in range(3)]
+        for user in self.users:
+            make_items(user, 30)
+
+    def test_moves_expired_items_in_batches_without_per_row_queries(self):
+        expired = FoodItem.objects.expired()
+        snapshot = sorted(expired.values_list('id', 'name', 'quantity', 'cost_per_unit'))
+        eaten = expired.first()
+        ConsumptionLog.objects.create(user=eaten.user, source_item=eaten, food_name=eaten.name,
+                                      category=eaten.category, quantity=1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('sweep_expired', batch_size=7, stdout=io.StringIO())
+
+        self.assertFalse(FoodItem.objects.expired().exists())
+        self.assertEqual(sorted(WasteLog.objects.values_list('source_item_id', 'food_name', 'quantity',
+                                                             'cost_per_unit')), snapshot)
+        self.assertIsNone(ConsumptionLog.objects.get().source_item)
+        batches = -(-len(snapshot) // 7)
+        self.assertLessEqual(len(ctx.captured_queries), batches * 11 + 4)
+
+    def test_rerun_is_a_no_op_and_grace_days(self):
+        call_command('sweep_expired', grace_days=3, stdout=io.StringIO())
+        cutoff = date.today() - timedelta(days=3)
+        self.assertTrue(all(d < cutoff for d in WasteLog.objects.values_list('expiry_date', flat=True)))
+        moved = WasteLog.objects.count()
+
+        call_command('sweep_expired', grace_days=3, stdout=io.StringIO())
+        self.assertEqual(WasteLog.objects.count(), moved)
+        self.assertTrue(FoodItem.objects.expired().exists())
+
+
+class DailyRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('rollup', password='pw')
+        self.client.force_login(self.user)
+        make_items(self.user, 30)
+
+    def rollup(self, category):
+        return DailyRollup.objects.get(user=self.user, day=date.today(), category=category)
+
+    def test_eating_discarding_and_sweeping_keep_rollups_in_sync(self):
+        fresh = list(FoodItem.objects.filter(expiry_date__gte=date.today()).order_by('pk')[:3])
+        consume_items(self.user, {fresh[0].pk: 2, fresh[1].pk: 1})
+        self.client.post(reverse('log_food', args=[fresh[2].pk]), {'quantity': 1})
+        discarded = FoodItem.objects.filter(expiry_date__gte=date.today()).order_by('-pk').first()
+        self.client.post(reverse('delete_item', args=[discarded.pk]))
+        call_command('sweep_expired', stdout=io.StringIO())
+
+        self.assertEqual(rollups.verify(), [])
+        self.assertEqual(WasteLog.objects.get(source_item_id=discarded.pk).reason, 'discarded')
+        row = self.rollup(discarded.category)
+        self.assertGreaterEqual(row.wasted_units, discarded.quantity)
+
+        stored = sorted(DailyRollup.objects.values_list('day', 'category', *rollups.MEASURES))
+        rollups.rebuild()
+        self.assertEqual(sorted(DailyRollup.objects.values_list('day', 'category', *rollups.MEASURES)), stored)
+
+    def test_meal_updates_rollups_with_one_statement(self):
+        items = list(FoodItem.objects.filter(expiry_date__gte=date.today()).order_by('pk')[:4])
+        with CaptureQueriesContext(connection) as ctx:
+            consume_items(self.user, {item.pk: 1 for item in items})
+        self.assertEqual(sum('tracker_dailyrollup' in q['sql'] for q in ctx.captured_queries), 1)
+        self.assertEqual(sum(r.consumed_units for r in DailyRollup.objects.all()), 4)
+
+    def test_verify_command_reports_drift_and_rebuild_fixes_it(self):
+        consume_items(self.user, {FoodItem.objects.order_by('pk').first().pk: 1})
+        DailyRollup.objects.update(consumed_units=99)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_rollups', verify=True, stdout=io.StringIO())
+        call_command('rebuild_rollups', stdout=io.StringIO())
+        call_command('rebuild_rollups', verify=True, stdout=io.StringIO())
+
+    def test_history_shows_category_totals_from_rollups(self):
+        item = FoodItem.objects.filter(expiry_date__gte=date.today()).first()
+        consume_items(self.user, {item.pk: 1})
+        response = self.client.get(reverse('history'))
+        totals = response.context['category_totals']
+        self.assertEqual([(row['category'], row['consumed_units']) for row in totals], [(item.category, 1)])
+
+
+class InsightsTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(f'insights{i}', password='pw') for i in range(3)]
+        for i, user in enumerate(self.users):
+            user.profile.household_size = i + 1
+            user.profile.save()
+            make_items(user, 20 + i)
+            ConsumptionLog.objects.bulk_create([
+                ConsumptionLog(user=user, food_name=f'Food {n % 3}', category='Dairy', quantity=n,
+                               cost_per_unit=5, date_consumed=date.today() - timedelta(days=n))
+                for n in range(1, 6 + i)
+            ])
+
+    def test_matches_per_user_orm_aggregates(self):
+        results = analytics.compute([u.pk for u in self.users])
+        for user in self.users:
+            data = results[user.pk]
+            logs = ConsumptionLog.objects.filter(user=user)
+            expired = FoodItem.objects.filter(user=user).expired()
+            self.assertEqual(data['total_consumed'], float(sum(l.quantity * l.cost_per_unit for l in logs)))
+            self.assertEqual(data['total_wasted'], float(sum(i.quantity * i.cost_per_unit for i in expired)))
+            self.assertEqual(sum(r['count'] for r in data['expiry_histogram']), FoodItem.objects.filter(user=user).count())
+            self.assertEqual(data['expiry_histogram'][0]['count'], expired.count())
+            top = data['consumption_rates'][0]
+            best = max({l.food_name for l in logs},
+                       key=lambda name: (sum(l.quantity for l in logs if l.food_name == name), name))
+            self.assertEqual(top['per_day'], round(sum(l.quantity for l in logs if l.food_name == top['name'])
+                                                   / analytics.WINDOW_DAYS, 3))
+            self.assertEqual(sum(l.quantity for l in logs if l.food_name == top['name']),
+                             sum(l.quantity for l in logs if l.food_name == best))
+            self.assertEqual(data['per_person']['wasted'],
+                             round(data['total_wasted'] / user.profile.household_size, 2))
+
+    def test_batch_command_stores_every_user(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('compute_insights', batch_size=2, stdout=io.StringIO())
+        # users, then 4 reads and a delete + insert per batch of users - not per user or per metric
+        self.assertLessEqual(len([q for q in ctx.captured_queries if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))]),
+                             1 + 2 * 6)
+        self.assertEqual(set(UserInsights.objects.values_list('user_id', flat=True)), {u.pk for u in self.users})
+
+        cache.clear()  # another process: the rows are all it shares with the cron job
+        self.client.force_login(self.users[0])
+        with self.assertNumQueries(3):  # session + user + the stored row
+            response = self.client.get(reverse('insights'))
+        self.assertContains(response, 'Dairy')
+        with self.assertNumQueries(2):
+            self.client.get(reverse('insights'))
+
+    def test_page_without_a_stored_row_computes_and_stores_it(self):
+        cache.clear()
+        self.client.force_login(self.users[0])
+        self.assertContains(self.client.get(reverse('insights')), 'Dairy')
+        self.assertTrue(UserInsights.objects.filter(user=self.users[0], computed_on=date.today()).exists())
+
+
+class ForecastTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('forecast', password='pw')
+        today = date.today()
+        # Two milk a day over the last two weeks, bread once
+        ConsumptionLog.objects.bulk_create(
+            [ConsumptionLog(user=self.user, food_name='Milk', category='Dairy', quantity=2,
+                            date_consumed=today - timedelta(days=d)) for d in range(14)]
+            + [ConsumptionLog(user=self.user, food_name='Bread', category='Grains', quantity=1,
+                              date_consumed=today - timedelta(days=3))]
+        )
+        item = lambda name, category, quantity, days: FoodItem.objects.create(
+            user=self.user, name=name, category=category, quantity=quantity,
+            expiry_date=today + timedelta(days=days))
+        self.milk = item('Milk', 'Dairy', 6, 5)          # 3 days at 2/day -> fine
+        self.cheese = item('Cheese', 'Dairy', 6, 1)      # category rate 2/day -> 3 days, expires in 1
+        self.bread = item('Bread', 'Grains', 3, 10)      # 1 per 14 days -> ~42 days
+        self.rice = item('Rice', 'Snacks', 1, 30)        # never eaten
+
+    def test_rates_and_flags(self):
+        call_command('forecast_items', stdout=io.StringIO())
+        rows = {f.item_id: f for f in ItemForecast.objects.all()}
+        today = date.today()
+
+        self.assertAlmostEqual(rows[self.milk.pk].daily_rate, 2.0)
+        self.assertEqual(rows[self.milk.pk].predicted_depletion, today + timedelta(days=3))
+        self.assertFalse(rows[self.milk.pk].at_risk)
+        self.assertTrue(rows[self.cheese.pk].at_risk)
+        self.assertGreaterEqual(rows[self.bread.pk].predicted_depletion, today + timedelta(days=42))
+        self.assertTrue(rows[self.bread.pk].at_risk)
+        # Never eaten: no forecast, so the expiring-soon rule decides (not soon)
+        self.assertNotIn(self.rice.pk, rows)
+
+        self.assertEqual(set(FoodItem.objects.filter(user=self.user).at_risk().values_list('name', flat=True)),
+                         {'Cheese', 'Bread'})
+
+    def test_user_without_history_keeps_the_expiring_soon_rule(self):
+        newcomer = User.objects.create_user('newcomer')
+        today = date.today()
+        FoodItem.objects.bulk_create([
+            FoodItem(user=newcomer, name='Tinned Beans', category='Snacks', quantity=4,
+                     expiry_date=today + timedelta(days=365)),
+            FoodItem(user=newcomer, name='Yogurt', category='Dairy', quantity=1,
+                     expiry_date=today + timedelta(days=2)),
+        ])
+        self.assertEqual(forecast.refresh([newcomer.pk]), 0)
+        self.assertFalse(ItemForecast.objects.filter(user=newcomer).exists())
+        self.assertEqual(list(FoodItem.objects.filter(user=newcomer).at_risk().values_list('name', flat=True)),
+                         ['Yogurt'])
+        profile = {row['category']: row for row in FoodItem.objects.filter(user=newcomer).category_profile()}
+        self.assertEqual(profile['Snacks']['at_risk_quantity'], 0)
+        self.assertEqual(profile['Dairy']['at_risk_quantity'], 1)
+
+    def test_rerun_replaces_rows_and_sweep_drops_forecasts(self):
+        forecast.refresh([self.user.pk])
+        forecast.refresh([self.user.pk])
+        self.assertEqual(ItemForecast.objects.count(), 3)
+
+        self.milk.expiry_date = date.today() - timedelta(days=1)
+        self.milk.save()
+        call_command('sweep_expired', stdout=io.StringIO())
+        self.assertFalse(ItemForecast.objects.filter(item_id=self.milk.pk).exists())
+
+    def test_editing_what_the_forecast_used_drops_it(self):
+        forecast.refresh([self.user.pk])
+        self.client.force_login(self.user)
+        form = lambda **changes: {'name': 'Bread', 'category': 'Grains', 'quantity': 3, 'cost_per_unit': '0.00',
+                                  'expiry_date': self.bread.expiry_date.isoformat(), **changes}
+        self.client.post(reverse('edit_item', args=[self.bread.pk]), form(cost_per_unit='2.50'))
+        self.assertTrue(ItemForecast.objects.get(item_id=self.bread.pk).at_risk)
+
+        later = (date.today() + timedelta(days=60)).isoformat()
+        self.client.post(reverse('edit_item', args=[self.bread.pk]), form(cost_per_unit='2.50', expiry_date=later))
+        self.assertFalse(ItemForecast.objects.filter(item_id=self.bread.pk).exists())
+        self.assertNotIn('Bread', FoodItem.objects.filter(user=self.user).at_risk().values_list('name', flat=True))
+
+    def test_rescue_recipes_follow_the_forecast(self):
+        Resource.objects.create(title='Grain bowl', category='Grains', resource_type='Recipe', url='http://x')
+        Resource.objects.create(title='Milkshake', category='Dairy', resource_type='Recipe', url='http://y')
+        self.cheese.delete()
+        forecast.refresh([self.user.pk])
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual([r.title for r in response.context['rescue_recipes']], ['Grain bowl'])
+        self.assertContains(response, "Won't finish in time", count=1)
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('recs', password='pw')
+        self.client.force_login(self.user)
+        for category in ('Dairy', 'Meat', 'Grains'):
+            for rtype in ('Article', 'Recipe', 'Recipe'):
+                Resource.objects.create(title=f'{category} {rtype} {Resource.objects.count()}', description='x',
+                                        url='https://example.com', category=category, resource_type=rtype)
+        soon = date.today() + timedelta(days=2)
+        FoodItem.objects.create(user=self.user, name='Milk', category='Dairy', quantity=1,
+                                cost_per_unit=2, expiry_date=soon)
+        FoodItem.objects.create(user=self.user, name='Steak', category='Meat', quantity=1,
+                                cost_per_unit=50, expiry_date=soon)
+        FoodItem.objects.create(user=self.user, name='Rice', category='Grains', quantity=10,
+                                cost_per_unit=5, expiry_date=date.today() + timedelta(days=200))
+
+    def test_ranked_by_value_at_risk_and_deterministic(self):
+        rescue, general = recommendations.recommend(
+            recommendations.get_index(), FoodItem.objects.filter(user=self.user).category_profile())
+        # Meat (50 at risk) before Dairy (2); Grains is not at risk
+        self.assertEqual([(r.category, r.resource_type) for r in rescue],
+                         [('Meat', 'Recipe'), ('Dairy', 'Recipe'), ('Meat', 'Recipe')])
+        self.assertEqual([r.category for r in general], ['Meat', 'Dairy', 'Grains'])
+        self.assertFalse({r.pk for r in rescue} & {r.pk for r in general})
+
+    def test_dashboard_reads_no_resources_and_index_follows_edits(self):
+        recommendations.get_index()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('dashboard'))
+        self.assertFalse([q for q in ctx.captured_queries if 'tracker_resource' in q['sql']])
+        self.assertEqual(response.context['rescue_recipes'][0].category, 'Meat')
+
+        Resource.objects.filter(category='Meat').delete()
+        rescue = self.client.get(reverse('dashboard')).context['rescue_recipes']
+        self.assertEqual({r.category for r in rescue}, {'Dairy'})
+
+    def test_write_from_another_process_shows_when_the_version_expires(self):
+        self.client.get(reverse('dashboard'))
+        # What `seed` in another process does: its signals clear only its own cache
+        Resource.objects.filter(category='Meat')._raw_delete(Resource.objects.db)
+        versions.bump(versions.RESOURCES_KEY)
+        rescue = self.client.get(reverse('dashboard')).context['rescue_recipes']
+        self.assertIn('Meat', {r.category for r in rescue})
+
+        cache.delete(recommendations.VERSION_KEY)  # VERSION_TIMEOUT elapsed
+        rescue = self.client.get(reverse('dashboard')).context['rescue_recipes']
+        self.assertEqual({r.category for r in rescue}, {'Dairy'})
+
+
+class DashboardFragmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('frag', password='pw')
+        self.client.force_login(self.user)
+        make_items(self.user, 12)
+
+    def test_filter_renders_only_the_table_with_one_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('dashboard_items'), {'category': 'Dairy'}, HTTP_X_FRAGMENT='1')
+        self.assertEqual(len([q for q in ctx.captured_queries if 'tracker_' in q['sql']]), 1)
+        self.assertTemplateUsed(response, 'tracker/partials/item_table.html')
+        self.assertNotContains(response, 'Smart Tips')
+        self.assertEqual({item.category for item in response.context['items']}, {'Dairy'})
+        self.assertEqual(response.context['current_filter'], 'Dairy')
+
+    def test_log_returns_the_updated_row(self):
+        item = FoodItem.objects.filter(user=self.user, quantity__gt=1).first()
+        response = self.client.post(reverse('log_food', args=[item.pk]), HTTP_X_FRAGMENT='1')
+        self.assertTemplateUsed(response, 'tracker/partials/item_row.html')
+        self.assertContains(response, f'id="item-{item.pk}"')
+        self.assertEqual(response.context['item'].quantity, item.quantity - 1)
+
+    def test_finished_and_deleted_rows_are_204(self):
+        finished, deleted = FoodItem.objects.filter(user=self.user, quantity=1)[:2]
+        response = self.client.post(reverse('log_food', args=[finished.pk]), HTTP_X_FRAGMENT='1')
+        self.assertEqual(response.status_code, 204)
+        response = self.client.post(reverse('delete_item', args=[deleted.pk]), HTTP_X_FRAGMENT='1')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(FoodItem.objects.filter(pk__in=[finished.pk, deleted.pk]).exists())
+
+    def test_without_the_header_actions_still_redirect(self):
+        item = FoodItem.objects.filter(user=self.user).first()
+        self.assertRedirects(self.client.post(reverse('log_food', args=[item.pk])), reverse('dashboard'))
+
+
+class BulkActionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('bulk', password='pw')
+        self.client.force_login(self.user)
+        make_items(self.user, 60, start=1)
+        self.ids = list(FoodItem.objects.filter(user=self.user).order_by('id').values_list('id', flat=True))
+
+    def post(self, ids, action, **extra):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('bulk_items'), {'item': ids, 'action': action, **extra})
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_the_selection(self):
+        few = self.post(self.ids[:5], 'consume')
+        many = self.post(self.ids[10:60], 'consume')
+        self.assertEqual(few, many)
+        self.assertLess(many, 20)
+        self.assertEqual(self.post(self.ids[5:7], 'delete'), self.post(self.ids[7:10], 'delete'))
+
+    def test_consume_all_logs_everything_left(self):
+        units = sum(FoodItem.objects.filter(pk__in=self.ids[:50]).values_list('quantity', flat=True))
+        self.post(self.ids[:50], 'consume')
+        self.assertEqual(FoodItem.objects.filter(user=self.user).count(), 10)
+        self.assertEqual(sum(ConsumptionLog.objects.values_list('quantity', flat=True)), units)
+        self.assertEqual(rollups.verify(), [])
+
+    def test_delete_goes_to_the_waste_ledger_with_tombstones(self):
+        self.post(self.ids[:50], 'delete')
+        self.assertEqual(WasteLog.objects.filter(reason='discarded').count(), 50)
+        self.assertEqual(Tombstone.objects.filter(kind='item').count(), 50)
+        self.assertEqual(rollups.verify(), [])
+
+    def test_shift_expiry(self):
+        before = dict(FoodItem.objects.values_list('id', 'expiry_date'))
+        self.post(self.ids[:50], 'shift', days=-2)
+        after = dict(FoodItem.objects.values_list('id', 'expiry_date'))
+        self.assertTrue(all(after[pk] == before[pk] - timedelta(days=2) for pk in self.ids[:50]))
+        self.assertTrue(all(after[pk] == before[pk] for pk in self.ids[50:]))
+
+    def test_other_users_items_are_untouched(self):
+        other = User.objects.create_user('other', password='pw')
+        make_items(other, 3)
+        theirs = list(FoodItem.objects.filter(user=other).values_list('id', flat=True))
+        self.post(theirs, 'delete')
+        self.assertEqual(FoodItem.objects.filter(user=other).count(), 3)
+
+    def test_shift_needs_days(self):
+        before = list(FoodItem.objects.order_by('id').values_list('expiry_date', flat=True))
+        self.post(self.ids[:2], 'shift')
+        self.assertEqual(list(FoodItem.objects.order_by('id').values_list('expiry_date', flat=True)), before)
+
+
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+
+    def test_reads_stay_on_the_primary_outside_replica_blocks(self):
+        self.assertIsNone(self.router.db_for_read(FoodItem))
+        with routers.replica_reads('replica'):
+            self.assertEqual(self.router.db_for_read(FoodItem), 'replica')
+            self.assertEqual(self.router.db_for_write(FoodItem), 'default')
+            # read-your-writes for the rest of the block
+            self.assertEqual(self.router.db_for_read(FoodItem), 'default')
+        with routers.replica_reads('replica'):
+            self.assertEqual(self.router.db_for_read(FoodItem), 'replica')
+        self.assertIsNone(self.router.db_for_read(FoodItem))
+
+    def test_pin_cookie_keeps_a_view_on_the_primary(self):
+        from django.test import RequestFactory
+
+        @routers.reads_from_replica
+        def view(request):
+            return HttpResponse(str(self.router.db_for_read(FoodItem)))
+
+        request = RequestFactory().get('/')
+        self.assertEqual(view(request).content, routers.replica_alias().encode())
+        request.COOKIES[routers.PIN_COOKIE] = '1'
+        self.assertEqual(view(request).content, b'None')
+
+    def test_async_views_read_from_the_replica_block(self):
+        from asgiref.sync import async_to_sync, sync_to_async
+        from django.test import RequestFactory
+
+        @routers.reads_from_replica
+        async def view(request):
+            alias = await sync_to_async(self.router.db_for_read)(FoodItem)
+            return HttpResponse(str(alias))
+
+        response = async_to_sync(view)(RequestFactory().get('/'))
+        self.assertEqual(response.content, routers.replica_alias().encode())
+
+
+@skipUnless(routers.REPLICA in connections.settings, 'no DATABASE_REPLICA_* configured')
+class ReplicaReadTests(TransactionTestCase):
+    # The replica is a test mirror: a second connection to the same database, which
+    # only sees committed rows, hence TransactionTestCase
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = User.objects.create_user('replica', password='pw')
+        self.client.force_login(self.user)
+        make_items(self.user, 3)
+
+    def queries_on(self, alias, method, *args, **kwargs):
+        with CaptureQueriesContext(connections[alias]) as ctx:
+            method(*args, **kwargs)
+        return [q['sql'] for q in ctx.captured_queries if 'tracker_' in q['sql']]
+
+    def test_read_only_pages_use_the_replica_until_the_client_writes(self):
+        self.assertTrue(self.queries_on(routers.REPLICA, self.client.get, reverse('history')))
+        self.assertFalse(self.queries_on('default', self.client.get, reverse('history')))
+
+        item = FoodItem.objects.filter(user=self.user).first()
+        response = self.client.post(reverse('log_food', args=[item.pk]))
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        self.assertTrue(self.queries_on('default', self.client.get, reverse('history')))
+
+    def test_writes_go_to_the_primary(self):
+        queries = self.queries_on('default', self.client.post, reverse('add_item'), {
+            'name': 'Eggs', 'category': 'Dairy', 'quantity': 6,
+            'expiry_date': date.today() + timedelta(days=9), 'cost_per_unit': 1})
+        self.assertTrue([q for q in queries if q.startswith('INSERT INTO "tracker_fooditem"')])
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('async', password='pw')
+        make_items(self.user, 12)
+        Resource.objects.create(title='Milk Pancakes', description='x', url='https://example.com',
+                                category='Dairy', resource_type='Recipe')
+        consume_items(self.user, {FoodItem.objects.filter(user=self.user).first().pk: 1})
+
+    async def test_read_views_render_under_the_async_client(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+
+        response = await client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        # the first item had one unit and was eaten
+        self.assertEqual(len(response.context['items']), 11)
+        self.assertEqual(response.context['total'], 11)
+        self.assertEqual(len(response.context['recent_logs']), 1)
+
+        response = await client.get(reverse('history'))
+        self.assertEqual(len(response.context['page']), 1)
+        self.assertEqual(len(response.context['category_totals']), 1)
+
+        response = await client.get(reverse('resources'))
+        self.assertContains(response, 'Milk Pancakes')
+
+        response = await AsyncClient().get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 302)
+
+
+class JsonApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('api', password='pw')
+        self.client.force_login(self.user)
+        self.milk = FoodItem.objects.create(user=self.user, name='Milk', category='Dairy', quantity=3,
+                                            expiry_date=date.today() + timedelta(days=5), cost_per_unit=2)
+
+    def etag(self, name='api_items'):
+        response = self.client.get(reverse(name))
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_items_are_compact_rows(self):
+        data = self.client.get(reverse('api_items')).json()
+        self.assertEqual(data['fields'][:2], ['id', 'name'])
+        self.assertEqual(data['items'], [[self.milk.pk, 'Milk', 'Dairy', 3,
+                                          self.milk.expiry_date.isoformat(), '2.00']])
+
+    def test_unchanged_poll_is_304_without_inventory_queries(self):
+        etag = self.etag()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('api_items'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([q for q in ctx.captured_queries if 'tracker_fooditem' in q['sql']])
+        self.assertEqual(len([q for q in ctx.captured_queries if 'tracker_changecounter' in q['sql']]), 1)
+
+    def test_every_write_changes_the_etag(self):
+        seen = {self.etag()}
+        form = {'name': 'Eggs', 'category': 'Dairy', 'quantity': 6,
+                'expiry_date': date.today() + timedelta(days=9), 'cost_per_unit': 1}
+        writes = [
+            lambda: self.client.post(reverse('add_item'), form),
+            lambda: self.client.post(reverse('edit_item', args=[self.milk.pk]), {**form, 'name': 'Milk'}),
+            lambda: self.client.post(reverse('log_food', args=[self.milk.pk]), {'quantity': 1}),
+            lambda: self.client.post(reverse('delete_item', args=[self.milk.pk])),
+        ]
+        for write in writes:
+            write()
+            etag = self.etag()
+            self.assertNotIn(etag, seen)
+            seen.add(etag)
+        self.assertEqual(self.client.get(reverse('api_logs')).json()['logs'][0][1], 'Milk')
+
+    def test_etags_are_per_user(self):
+        other = User.objects.create_user('other', password='pw')
+        etag = self.etag()
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('api_items'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_logs_page_with_a_cursor(self):
+        from .api import LOG_PAGE_SIZE
+        ConsumptionLog.objects.bulk_create([
+            ConsumptionLog(user=self.user, food_name='Milk', category='Dairy', quantity=1, cost_per_unit=2,
+                           date_consumed=date.today() - timedelta(days=i % 30))
+            for i in range(LOG_PAGE_SIZE + 1)
+        ])
+        first = self.client.get(reverse('api_logs')).json()
+        second = self.client.get(reverse('api_logs'), {'after': first['next']}).json()
+        self.assertEqual(len(first['logs']), LOG_PAGE_SIZE)
+        self.assertEqual(len(second['logs']), 1)
+        self.assertIsNone(second['next'])
+
+    def test_resources_etag_follows_resource_writes(self):
+        etag = self.etag('api_resources')
+        Resource.objects.create(title='Milk Pancakes', description='x', url='https://example.com',
+                                category='Dairy', resource_type='Recipe')
+        response = self.client.get(reverse('api_resources'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['resources'][0][1], 'Milk Pancakes')
+
+    def test_resources_body_matches_its_etag_after_another_process_writes(self):
+        Resource.objects.create(title='Milk Pancakes', description='x', url='https://example.com',
+                                category='Dairy', resource_type='Recipe')
+        self.assertEqual(len(self.client.get(reverse('api_resources')).json()['resources']), 1)
+        # What `seed` in another process does: its signals clear only its own cache
+        Resource.objects.all()._raw_delete(Resource.objects.db)
+        versions.bump(versions.RESOURCES_KEY)
+        response = self.client.get(reverse('api_resources'))
+        self.assertEqual(response['ETag'], f'"res-{versions.get(versions.RESOURCES_KEY)[0]}"')
+        self.assertEqual(response.json()['resources'], [])
+
+    def test_anonymous_gets_401(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('api_items')).status_code, 401)
+
+
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('sync', password='pw')
+        self.client.force_login(self.user)
+        make_items(self.user, 6, start=2)
+
+    def sync(self, since=None):
+        params = {} if since is None else {'since': since}
+        return self.client.get(reverse('api_sync'), params).json()
+
+    def ids(self, payload, key='items'):
+        return {row[0] for row in payload[key]['rows']}
+
+    def test_first_sync_is_the_full_inventory(self):
+        data = self.sync()
+        self.assertTrue(data['full'])
+        self.assertEqual(self.ids(data), set(FoodItem.objects.values_list('id', flat=True)))
+        self.assertEqual(self.sync(data['token'])['items']['rows'], [])
+
+    def test_only_changes_since_the_token(self):
+        token = self.sync()['token']
+        first, second, third, *_ = FoodItem.objects.order_by('id')
+        self.client.post(reverse('edit_item', args=[first.pk]), {
+            'name': 'Renamed', 'category': first.category, 'quantity': first.quantity,
+            'expiry_date': first.expiry_date, 'cost_per_unit': first.cost_per_unit})
+        self.client.post(reverse('delete_item', args=[second.pk]))
+        self.client.post(reverse('log_food', args=[third.pk]), {'quantity': third.quantity})
+
+        data = self.sync(token)
+        self.assertFalse(data['full'])
+        self.assertEqual(self.ids(data), {first.pk})
+        self.assertEqual(data['items']['rows'][0][1], 'Renamed')
+        self.assertEqual(set(data['deleted']['items']), {second.pk, third.pk})
+        self.assertEqual(len(data['logs']['rows']), 1)
+        self.assertEqual(self.sync(data['token'])['deleted'], {'items': [], 'logs': []})
+
+    def test_bulk_writes_are_stamped(self):
+        token = self.sync()['token']
+        finished, eaten, expired = FoodItem.objects.order_by('id')[:3]
+        consume_items(self.user, {finished.pk: finished.quantity, eaten.pk: 1})
+        import_items(self.user, io.StringIO("name,category,quantity,expiry_date,cost_per_unit\n"
+                                            "Eggs,Dairy,12,2030-01-01,0.2\n"))
+        FoodItem.objects.filter(pk=expired.pk).update(expiry_date=date.today() - timedelta(days=1))
+        sweep_token = self.sync()['token']
+        call_command('sweep_expired', stdout=io.StringIO())
+
+        data = self.sync(token)
+        eggs = FoodItem.objects.get(name='Eggs')
+        self.assertEqual(self.ids(data), {eaten.pk, eggs.pk})
+        self.assertEqual(set(data['deleted']['items']), {finished.pk, expired.pk})
+        self.assertEqual(len(data['logs']['rows']), 2)
+        self.assertEqual(self.sync(sweep_token)['deleted']['items'], [expired.pk])
+
+    def test_sync_reads_use_the_version_index(self):
+        token = self.sync()['token']
+        with CaptureQueriesContext(connection) as ctx:
+            self.sync(token)
+        scans = [q['sql'] for q in ctx.captured_queries if '"sync_version" >' in q['sql']]
+        self.assertEqual(len(scans), 3)
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + str(
+                FoodItem.objects.filter(user=self.user, sync_version__gt=int(token)).values_list('id').query))
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        self.assertIn('food_user_version_idx', plan)
+
+    def test_unknown_token_gets_a_full_sync(self):
+        self.assertTrue(self.sync('999999')['full'])
+        self.assertTrue(self.sync('garbage')['full'])
+
+
+class ResourceCatalogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reader', password='pw')
+        Resource.objects.bulk_create([
+            Resource(title=f'{category} guide {i}', description='x', url='https://example.com',
+                     category=category, resource_type='Article')
+            for category in ('Dairy', 'Grains') for i in range(catalog.PAGE_SIZE)
+        ])
+        versions.bump(versions.RESOURCES_KEY)  # bulk_create sends no signals
+
+    def test_repeat_views_make_no_queries(self):
+        url = reverse('resource_catalog')
+        first = self.client.get(url, {'category': 'Dairy'})
+        self.assertEqual(first['Cache-Control'], f'public, max-age={catalog.MAX_AGE}')
+        self.assertNotIn('Vary', first)
+        with self.assertNumQueries(0):
+            again = self.client.get(url, {'category': 'Dairy'})
+            revalidated = self.client.get(url, {'category': 'Dairy'}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.content, first.content)
+        self.assertEqual(revalidated.status_code, 304)
+
+        self.client.force_login(self.user)
+        self.client.get(reverse('resources'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('resources'), {'category': 'Dairy'})
+        self.assertContains(response, 'Dairy guide 0')
+        self.assertEqual([q['sql'] for q in ctx.captured_queries if 'tracker_' in q['sql']], [])
+
+    def test_pages_and_categories(self):
+        url = reverse('resource_catalog')
+        self.assertContains(self.client.get(url), 'Page 1 of 2')
+        response = self.client.get(url, {'category': 'Grains'})
+        self.assertContains(response, 'Grains guide 0')
+        self.assertNotContains(response, 'Dairy guide')
+        self.assertNotContains(response, 'Page 1 of')
+        self.assertEqual(self.client.get(url, {'category': 'Nope'}).status_code, 404)
+
+    def test_resource_writes_change_the_version(self):
+        url = reverse('resource_catalog')
+        etag = self.client.get(url, {'category': 'Dairy'})['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Resource.objects.create(title='Milk Pancakes', description='x', url='https://example.com',
+                                    category='Dairy', resource_type='Recipe')
+        response = self.client.get(url, {'category': 'Dairy'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        # Recipes lead their category
+        self.assertLess(response.content.index(b'Milk Pancakes'), response.content.index(b'Dairy guide 0'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Resource.objects.filter(title='Milk Pancakes').delete()
+        self.assertNotContains(self.client.get(url, {'category': 'Dairy'}), 'Milk Pancakes')
+
+    def test_write_from_another_process_shows_within_max_age(self):
+        self.assertLessEqual(recommendations.VERSION_TIMEOUT, catalog.MAX_AGE)
+        url = reverse('resource_catalog')
+        etag = self.client.get(url, {'category': 'Dairy'})['ETag']
+        # What `seed` in another process does: its signals clear only its own cache
+        Resource.objects.filter(title='Dairy guide 0')._raw_delete(Resource.objects.db)
+        versions.bump(versions.RESOURCES_KEY)
+        self.assertEqual(self.client.get(url, {'category': 'Dairy'})['ETag'], etag)
+
+        cache.delete(recommendations.VERSION_KEY)  # VERSION_TIMEOUT elapsed
+        response = self.client.get(url, {'category': 'Dairy'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Dairy guide 0<')
+
+
+@skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'search indexes are SQLite/PostgreSQL only')
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('searcher', password='pw')
+        self.other = User.objects.create_user('neighbour', password='pw')
+        self.client.force_login(self.user)
+        today = date.today()
+        FoodItem.objects.bulk_create([
+            FoodItem(user=self.user, name='Chicken Breast', category='Meat', quantity=2, expiry_date=today),
+            FoodItem(user=self.user, name='Chickpeas', category='Other', quantity=1, expiry_date=today),
+            FoodItem(user=self.user, name='Greek Yogurt', category='Dairy', quantity=1, expiry_date=today),
+            FoodItem(user=self.other, name='Chicken Thighs', category='Meat', quantity=1, expiry_date=today),
+        ])
+
+    def names(self, query, user=None):
+        return [item.name for item in search.search_items(user or self.user, query)[0]]
+
+    def test_prefix_matches_only_the_users_items(self):
+        self.assertEqual(sorted(self.names('chi')), ['Chicken Breast', 'Chickpeas'])
+        self.assertEqual(self.names('chick bre'), ['Chicken Breast'])
+        self.assertEqual(self.names('chi', self.other), ['Chicken Thighs'])
+        self.assertEqual(self.names('  "*( '), [])
+
+    def test_index_follows_bulk_writes_edits_and_raw_deletes(self):
+        yogurt = FoodItem.objects.get(name='Greek Yogurt')
+        yogurt.name = 'Skyr'
+        yogurt.save()
+        self.assertEqual(self.names('greek'), [])
+        self.assertEqual(self.names('sky'), ['Skyr'])
+        # Quantity-only updates leave the index alone but keep it correct
+        FoodItem.objects.filter(pk=yogurt.pk).update(quantity=5)
+        self.assertEqual(self.names('sky'), ['Skyr'])
+        FoodItem.objects.filter(pk=yogurt.pk)._raw_delete(connection.alias)
+        self.assertEqual(self.names('sky'), [])
+
+    def test_title_matches_rank_above_description_matches(self):
+        Resource.objects.bulk_create([
+            Resource(title='Storing herbs', description='Keep compost bins near the kitchen.',
+                     url='https://example.com/a', category='Vegetables', resource_type='Article'),
+            Resource(title='Compost basics', description='Start a heap.',
+                     url='https://example.com/b', category='Other', resource_type='Article'),
+        ])
+        results, has_next = search.search_resources('compost')
+        self.assertEqual([r.title for r in results], ['Compost basics', 'Storing herbs'])
+        self.assertFalse(has_next)
+
+    def test_pages_without_counting(self):
+        make_items(self.user, 25)
+        first, has_next = search.search_items(self.user, 'item', per_page=10)
+        last, no_next = search.search_items(self.user, 'item', page=3, per_page=10)
+        self.assertEqual((len(first), has_next, len(last), no_next), (10, True, 5, False))
+        self.assertFalse({item.pk for item in first} & {item.pk for item in last})
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite query plan')
+    def test_search_uses_the_fts_index(self):
+        with CaptureQueriesContext(connection) as ctx:
+            search.search_items(self.user, 'chi')
+        self.assertEqual(len(ctx.captured_queries), 2)
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN SELECT rowid FROM tracker_fooditem_fts '
+                           'WHERE tracker_fooditem_fts MATCH %s', ['name:"chi"*'])
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        self.assertIn('VIRTUAL TABLE INDEX', plan)
+        self.assertNotIn('SCAN tracker_fooditem ', plan)
+
+    def test_view_renders_fragment_for_search_as_you_type(self):
+        response = self.client.get(reverse('search'), {'q': 'chick'})
+        self.assertTemplateUsed(response, 'tracker/search.html')
+        self.assertContains(response, 'Chickpeas')
+        response = self.client.get(reverse('search'), {'q': 'chick', 'page': 0}, HTTP_X_FRAGMENT='1')
+        self.assertTemplateNotUsed(response, 'tracker/search.html')
+        self.assertTemplateUsed(response, 'tracker/partials/search_results.html')
+        self.assertNotContains(response, 'Chicken Thighs')
+
+
+class AdminTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('operator', password='pw')
+        self.client.force_login(self.admin)
+        self.owners = [User.objects.create_user(f'owner{i}') for i in range(3)]
+        for owner in self.owners:
+            make_items(owner, 10)
+
+    def changelist_queries(self, model):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse(f'admin:tracker_{model}_changelist'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_changelists_do_not_grow_with_rows(self):
+        consume_items(self.owners[0], {FoodItem.objects.filter(user=self.owners[0]).first().pk: 1})
+        before = {model: self.changelist_queries(model)
+                  for model in ('fooditem', 'consumptionlog', 'resource', 'profile')}
+        for owner in [User.objects.create_user(f'late{i}') for i in range(3)]:
+            make_items(owner, 10)
+            consume_items(owner, {FoodItem.objects.filter(user=owner).first().pk: 1})
+        after = {model: self.changelist_queries(model) for model in before}
+        self.assertEqual(after, before)
+
+    def test_search_uses_username_and_full_text_index(self):
+        FoodItem.objects.create(user=self.owners[1], name='Chicken Breast', category='Meat',
+                                expiry_date=date.today())
+        url = reverse('admin:tracker_fooditem_changelist')
+        response = self.client.get(url, {'q': 'chick'})
+        self.assertEqual([item.name for item in response.context['cl'].result_list], ['Chicken Breast'])
+        response = self.client.get(url, {'q': 'owner2'})
+        self.assertEqual({item.user_id for item in response.context['cl'].result_list}, {self.owners[2].pk})
+
+    def test_bulk_delete_confirms_then_runs_set_based(self):
+        url = reverse('admin:tracker_fooditem_changelist')
+        items = list(FoodItem.objects.filter(user__in=self.owners[:2]).order_by('pk')[5:15])
+        owners = {item.user_id for item in items}
+        consume_items(self.owners[0], {items[0].pk: 1})  # leaves a log pointing at it
+        data = {'action': 'delete_selected_items', '_selected_action': [item.pk for item in items]}
+
+        response = self.client.post(url, data)
+        self.assertTemplateUsed(response, 'admin/tracker/bulk_delete_confirmation.html')
+        self.assertEqual(FoodItem.objects.filter(pk__in=[i.pk for i in items]).count(), len(items))
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(url, {**data, 'post': 'yes'})
+        deletes = [q for q in ctx.captured_queries if q['sql'].startswith('DELETE FROM "tracker_fooditem"')]
+        self.assertEqual(len(deletes), 1)
+        self.assertFalse(FoodItem.objects.filter(pk__in=[i.pk for i in items]).exists())
+        self.assertEqual(set(Tombstone.objects.filter(kind='item').values_list('object_id', flat=True)),
+                         {item.pk for item in items})
+        self.assertEqual({t.user_id for t in Tombstone.objects.all()}, owners)
+        self.assertIsNone(ConsumptionLog.objects.get().source_item_id)
+        self.assertFalse(WasteLog.objects.exists())
+
+    def test_shift_expiry_stamps_each_owner(self):
+        items = list(FoodItem.objects.order_by('pk')[8:14])
+        before = {owner.pk: versions.get(versions.inventory_key(owner.pk))[0] for owner in self.owners}
+        self.client.post(reverse('admin:tracker_fooditem_changelist'),
+                         {'action': 'extend_expiry_week', '_selected_action': [item.pk for item in items]})
+        for item in items:
+            moved = FoodItem.objects.get(pk=item.pk)
+            self.assertEqual(moved.expiry_date, item.expiry_date + timedelta(days=7))
+            self.assertEqual(moved.sync_version, before[item.user_id] + 1)
+
+    def test_log_delete_takes_rollups_back(self):
+        owner = self.owners[0]
+        consume_items(owner, {item.pk: 1 for item in FoodItem.objects.filter(user=owner)[:3]})
+        self.client.post(reverse('admin:tracker_consumptionlog_changelist'), {
+            'action': 'delete_selected_logs', 'post': 'yes',
+            '_selected_action': list(ConsumptionLog.objects.values_list('pk', flat=True)),
+        })
+        self.assertFalse(ConsumptionLog.objects.exists())
+        self.assertEqual(Tombstone.objects.filter(kind='log').count(), 3)
+        self.assertEqual(rollups.verify(), [])
+
+    def test_log_edits_and_single_deletes_keep_rollups(self):
+        owner = self.owners[0]
+        consume_items(owner, {item.pk: 1 for item in FoodItem.objects.filter(user=owner)[:2]})
+        edited, doomed = ConsumptionLog.objects.order_by('pk')
+        self.client.post(reverse('admin:tracker_consumptionlog_change', args=[edited.pk]), {
+            'user': owner.pk, 'food_name': edited.food_name, 'category': 'Meat', 'quantity': 4,
+            'cost_per_unit': '3.00', 'date_consumed': (edited.date_consumed - timedelta(days=1)).isoformat(),
+        })
+        self.assertEqual(ConsumptionLog.objects.get(pk=edited.pk).quantity, 4)
+        self.client.post(reverse('admin:tracker_consumptionlog_delete', args=[doomed.pk]), {'post': 'yes'})
+        self.assertFalse(ConsumptionLog.objects.filter(pk=doomed.pk).exists())
+        self.assertEqual(rollups.verify(), [])
+        call_command('rebuild_rollups', verify=True, stdout=io.StringIO())
+
+
+class ConcurrencyBenchTests(TransactionTestCase):
+    def test_wsgi_and_asgi_paths_serve_every_request(self):
+        user = User.objects.create_user('demo_user', password='pw')
+        make_items(user, 5)
+        out = io.StringIO()
+        with tempfile.NamedTemporaryFile(suffix='.json') as fh:
+            call_command('bench_concurrency', clients=3, requests=6, output=fh.name, stdout=out)
+            results = bench.load(fh.name)
+        for name in bench.CONCURRENT_VIEWS:
+            for mode in ('wsgi', 'asgi'):
+                self.assertEqual(results['views'][name][mode]['requests'], 6)
+                self.assertEqual(results['views'][name][mode]['status_codes'], [200])
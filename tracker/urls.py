@@ -1,6 +1,6 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import api, views
 
 urlpatterns = [
     # 1. The Landing Page is now the default route
@@ -9,18 +9,36 @@ urlpatterns = [
     
     # 2. The Dashboard is moved to specific URL
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/items/', views.dashboard_items, name='dashboard_items'),
     path('resources/', views.resources, name='resources'),
+    path('resources/catalog/', views.resource_catalog, name='resource_catalog'),
+    path('search/', views.search, name='search'),
     path('register/', views.register, name='register'),
     path('login/', auth_views.LoginView.as_view(template_name='tracker/login.html'), name='login'),
     path('logout/', auth_views.LogoutView.as_view(next_page='login'), name='logout'),
     path('profile/', views.profile, name='profile'),
     path('log-food/<int:pk>/', views.log_food, name='log_food'),
+    path('log-meal/', views.log_meal, name='log_meal'),
+    path('dashboard/bulk/', views.bulk_items, name='bulk_items'),
     path('history/', views.consumption_history, name='history'),
+    path('insights/', views.insights, name='insights'),
+    path('export/items/', views.export_items, name='export_items'),
+    path('export/history/', views.export_history, name='export_history'),
     path('upload-image/<int:pk>/', views.upload_image, name='upload_image'),
     path('delete-image/<int:pk>/', views.delete_image, name='delete_image'),
     
+    # JSON API (mobile app and widgets)
+    path('api/items/', api.items, name='api_items'),
+    path('api/logs/', api.logs, name='api_logs'),
+    path('api/resources/', api.resources, name='api_resources'),
+    path('api/sync/', api.sync, name='api_sync'),
+
+    # Monitoring (Prometheus scrape target)
+    path('metrics', views.metrics_view, name='metrics'),
+    
     # CRUD
     path('add/', views.add_item, name='add_item'),
+    path('import/', views.import_items_view, name='import_items'),
     path('edit/<int:pk>/', views.edit_item, name='edit_item'),
     path('delete/<int:pk>/', views.delete_item, name='delete_item'),
 ]
\ No newline at end of file
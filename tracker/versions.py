@@ -0,0 +1,109 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ChangeCounter, ConsumptionLog, FoodItem, Resource, Tombstone
+
+# --- Change counters ---
+# One row per cacheable thing; every write bumps it with the same increment-in-
+# place upsert as the rollups, so concurrent writers never lose a bump:
+#   INSERT ... ON CONFLICT (key) DO UPDATE SET value = value + 1
+# Versions only ever grow, so (key, value) never repeats and is safe to use as
+# a strong ETag.
+# Inventory rows are also stamped with the version of the write that touched
+# them (SyncTracked.sync_version) for delta sync. The upsert holds the counter
+# row lock until commit, so a user's versions commit in order and a token never
+# skips a row that commits later.
+
+RESOURCES_KEY = 'resources'
+
+
+def inventory_key(user_id):
+    return f'inventory:{user_id}'
+
+
+def _upsert_suffix():
+    quote = connection.ops.quote_name
+    table = quote(ChangeCounter._meta.db_table)
+    return (f" ON CONFLICT ({quote('key')}) DO UPDATE SET {quote('value')} = {table}.{quote('value')} + 1, "
+            f"{quote('updated_at')} = excluded.{quote('updated_at')}")
+
+
+def _upsert_prefix():
+    quote = connection.ops.quote_name
+    return (f"INSERT INTO {quote(ChangeCounter._meta.db_table)} "
+            f"({quote('key')}, {quote('value')}, {quote('updated_at')}) ")
+
+
+def _now():
+    return connection.ops.adapt_datetimefield_value(timezone.now())
+
+
+def bump(*keys):
+    keys = sorted(set(keys))  # fixed order, so two bumps never deadlock on the rows
+    if not keys:
+        return
+    now = _now()
+    values = ', '.join(['(%s, 1, %s)'] * len(keys))
+    params = [p for key in keys for p in (key, now)]
+    with connection.cursor() as cursor:
+        cursor.execute(_upsert_prefix() + 'VALUES ' + values + _upsert_suffix(), params)
+
+
+def stamp(user_id):
+    """Bumps the user's inventory and returns the new version; call it inside the write's transaction."""
+    with connection.cursor() as cursor:
+        cursor.execute(_upsert_prefix() + 'VALUES (%s, 1, %s)' + _upsert_suffix()
+                       + f" RETURNING {connection.ops.quote_name('value')}", [inventory_key(user_id), _now()])
+        return cursor.fetchone()[0]
+
+
+def stamp_many(user_ids):
+    """stamp() for several users with one upsert; returns {user_id: new version}."""
+    keys = {user_id: inventory_key(user_id) for user_id in user_ids}
+    bump(*keys.values())
+    current = dict(ChangeCounter.objects.filter(key__in=keys.values()).values_list('key', 'value'))
+    return {user_id: current[key] for user_id, key in keys.items()}
+
+
+def bump_inventory_from_select(user_select_sql, params):
+    """Bumps the inventory of every user_id returned by a SELECT (used by the expiry sweep)."""
+    quote = connection.ops.quote_name
+    sql = (f"SELECT DISTINCT 'inventory:' || {quote('user_id')}, 1, %s FROM ({user_select_sql}) changed "
+           f"WHERE 1=1")
+    with connection.cursor() as cursor:
+        cursor.execute(_upsert_prefix() + sql + _upsert_suffix(), [_now(), *params])
+
+
+def get(key):
+    """(version, last change) for the key; (0, None) before the first write."""
+    return ChangeCounter.objects.filter(key=key).values_list('value', 'updated_at').first() or (0, None)
+
+
+async def aget(key):
+    return await ChangeCounter.objects.filter(key=key).values_list('value', 'updated_at').afirst() or (0, None)
+
+
+@receiver(pre_save, sender=FoodItem)
+@receiver(pre_save, sender=ConsumptionLog)
+def stamp_inventory_row(sender, instance, **kwargs):
+    # Runs inside SyncTracked.save()'s transaction
+    instance.sync_version = stamp(instance.user_id)
+
+
+@receiver(post_delete, sender=FoodItem)
+@receiver(post_delete, sender=ConsumptionLog)
+def bury_inventory_row(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, User):
+        return  # the whole account is going; its tombstones would go with it
+    kind = 'item' if sender is FoodItem else 'log'
+    Tombstone.objects.create(user_id=instance.user_id, kind=kind, object_id=instance.pk,
+                             sync_version=stamp(instance.user_id))
+
+
+@receiver(post_save, sender=Resource)
+@receiver(post_delete, sender=Resource)
+def bump_resources(sender, instance, **kwargs):
+    bump(RESOURCES_KEY)
@@ -2,10 +2,11 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
-from .models import FoodItem , Resource , Profile , ConsumptionLog
+from .models import FoodItem , Profile , ConsumptionLog
 from .forms import FoodItemForm ,ProfileForm
 from django.shortcuts import render, redirect
 from datetime import date, timedelta
+import asyncio
 
 def register(request):
     if request.method == 'POST':
@@ -24,106 +25,198 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone # Import timezone
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
 from datetime import date       # Import date
 
-from .forms import FoodItemForm, ProfileForm
-from .models import FoodItem, Resource, Profile, ConsumptionLog
+from .forms import BulkActionForm, FoodItemForm, ProfileForm, HistoryFilterForm
+from .models import FoodItem, Profile, ConsumptionLog, DailyRollup
+from . import analytics, catalog, exporters, rollups, search as full_text
+from .importers import detect_format, import_items
+from .pagination import KeysetPaginator
+from .receipts import attach_receipt, detach_receipt
+from .routers import reads_from_replica
+from .services import consume_all, consume_items, discard_item, discard_items, save_item_edit, shift_expiry
+from .metrics import render_prometheus
+from .summary import aget_summary, cache_stats
 
 # ... (Keep home and register views as they are) ...
 
 # --- UPDATED DASHBOARD (Requirement 3 & 5) ---
 @login_required
-def dashboard(request):
-    # 1. BASE QUERY
-    # Start with all items belonging to this user
-    items = FoodItem.objects.filter(user=request.user).order_by('expiry_date')
+async def dashboard(request):
+    # Async view: under ASGI the item table and the summary are awaited together
+    # instead of blocking a worker thread. Templates can't run queries here, so
+    # everything handed to render() is already fetched.
+    request.user = user = await request.auser()
+
+    # 1. ITEM TABLE, filtered by ?category= / ?status= (shared with the fragment below)
+    items, current_filter = _item_table(user, request.GET)
+
+    # 2. STATS, WASTE RESCUE & RECOMMENDATIONS
+    # Cached per user for the day and invalidated by signals (see tracker/summary.py),
+    # so only the item table above is queried on a cache hit.
+    async def item_rows():
+        return [item async for item in items]
+
+    items, summary = await asyncio.gather(item_rows(), aget_summary(user))
     
-    # 2. FILTER LOGIC (This is what was missing!)
-    cat_filter = request.GET.get('category')
-    status_filter = request.GET.get('status')
+    context = {
+        'items': items,                      # Filtered items (for the Table)
+        'rescue_recipes': summary['rescue_recipes'],    # "Act Now" recipes
+        'resources': summary['resources'],              # General Tips
+        'recent_logs': summary['recent_logs'],
+        'total': summary['total'],
+        'expired_count': summary['expired_count'],
+        'soon_count': summary['soon_count'],
+        'current_filter': current_filter # Helps highlight the active button
+    }
+    return render(request, 'tracker/dashboard.html', context)
+
+
+# --- Dashboard fragments ---
+# The filter buttons and the Eat/Delete actions fetch() these and swap them
+# into the page, so a click re-renders only the item table (one query) or one
+# row instead of the stats, recipes, tips and recent activity as well.
+
+def _item_rows(user):
+    # days_remaining/status computed in SQL; receipt thumbnail and forecast badge joined in
+    return FoodItem.objects.filter(user=user).with_status().select_related('receipt', 'forecast')
+
+
+def _item_table(user, params):
+    """The dashboard item table for ?category= / ?status=; returns (queryset, active filter)."""
+    items = _item_rows(user).order_by('expiry_date')
+    cat_filter = params.get('category')
+    status_filter = params.get('status')
 
     # Filter by Category (e.g., Dairy)
     if cat_filter:
         items = items.filter(category=cat_filter)
-    
-    # Filter by Status (e.g., Expired) using Python list comprehension
-    # Note: This converts the QuerySet to a List, so it must be done last
+
+    # Filter by Status (e.g., Expired) - applied in SQL
     if status_filter == 'expired':
-        items = [i for i in items if i.days_remaining < 0]
+        items = items.expired()
     elif status_filter == 'soon':
-        items = [i for i in items if 0 <= i.days_remaining <= 3]
+        items = items.expiring_soon()
+    return items, cat_filter or status_filter
+
+
+def _is_fragment(request):
+    # Set by the dashboard's fetch() calls; plain links and forms still get full pages
+    return request.headers.get('X-Fragment') == '1'
+
+
+def _item_row_response(request, pk):
+    item = _item_rows(request.user).filter(pk=pk).first()
+    if item is None:
+        return HttpResponse(status=204)  # finished or deleted: the row goes away
+    return render(request, 'tracker/partials/item_row.html', {'item': item})
 
-    # 3. WASTE RESCUE LOGIC (Requirement 5)
-    # We need a fresh query for this so filters don't hide these important alerts
-    fresh_items = FoodItem.objects.filter(user=request.user)
-    expiring_items = fresh_items.filter(expiry_date__range=[date.today(), date.today() + timedelta(days=3)])
-    expiring_categories = expiring_items.values_list('category', flat=True).distinct()
-    
-    rescue_recipes = Resource.objects.filter(
-        category__in=expiring_categories, 
-        resource_type='Recipe'
-    )[:3]
-
-    # 4. SMART RECOMMENDATIONS
-    user_categories = fresh_items.values_list('category', flat=True).distinct()
-    # Exclude recipes we already showed in "Waste Rescue" to keep it fresh
-    general_resources = Resource.objects.filter(category__in=user_categories).exclude(id__in=rescue_recipes.values('id'))[:3]
-
-    # 5. STATS CALCULATIONS
-    # Must query DB again (all_items) to get accurate totals for the top cards
-    # regardless of what filters are currently active on the table.
-    all_items = FoodItem.objects.filter(user=request.user)
-    
-    context = {
-        'items': items,                      # Filtered list (for the Table)
-        'rescue_recipes': rescue_recipes,    # "Act Now" recipes
-        'resources': general_resources,      # General Tips
-        'recent_logs': ConsumptionLog.objects.filter(user=request.user).order_by('-date_consumed')[:3],
-        'total': all_items.count(),
-        'expired_count': sum(1 for i in all_items if i.days_remaining < 0),
-        'soon_count': sum(1 for i in all_items if 0 <= i.days_remaining <= 3),
-        'current_filter': cat_filter or status_filter # Helps highlight the active button
-    }
-    return render(request, 'tracker/dashboard.html', context)
+
+@login_required
+async def dashboard_items(request):
+    request.user = user = await request.auser()
+    items, current_filter = _item_table(user, request.GET)
+    return render(request, 'tracker/partials/item_table.html', {
+        'items': [item async for item in items],
+        'current_filter': current_filter,
+    })
 
 @login_required
 def delete_image(request, pk):
     item = get_object_or_404(FoodItem, pk=pk, user=request.user)
     
-    if item.receipt_image:
-        # delete(save=True) removes the file from disk AND saves the model with the field empty
-        item.receipt_image.delete(save=True)
+    if item.receipt_id:
+        # The file is shared with other items from the same receipt; it is only
+        # removed from disk when this was the last item using it
+        detach_receipt(item)
         messages.success(request, "Receipt image removed successfully.")
     else:
         messages.warning(request, "No image to delete.")
         
     return redirect('upload_image', pk=pk)
 
+def _catalog_params(params):
+    return params.get('category', ''), max(_positive_int(params.get('page')), 1)
+
+
+@login_required
+@reads_from_replica
+async def resources(request):
+    # The catalog part is the cached fragment (tracker/catalog.py); the page
+    # around it carries the user's navbar and CSRF token, so it is not cached
+    request.user = await request.auser()
+    html = await catalog.arender(*_catalog_params(request.GET))
+    return render(request, 'tracker/resources.html', {'catalog': html})
+
+
+def _catalog_etag(request, *args, **kwargs):
+    return catalog.etag(*_catalog_params(request.GET))
+
+
+@cache_control(public=True, max_age=catalog.MAX_AGE)
+@require_GET
+@condition(etag_func=_catalog_etag)
+@reads_from_replica
+def resource_catalog(request):
+    # Public and the same for everyone: no session or user lookup, and a repeat
+    # view (or a 304 revalidation) makes no query at all
+    return HttpResponse(catalog.render(*_catalog_params(request.GET)))
+
 @login_required
-def resources(request):
-    all_resources = Resource.objects.all()
-    return render(request, 'tracker/resources.html', {'resources': all_resources})
+@reads_from_replica
+def search(request):
+    # Search-as-you-type: the page's input fetch()es the results fragment on each pause
+    query = request.GET.get('q', '').strip()
+    kind = 'resources' if request.GET.get('kind') == 'resources' else 'items'
+    page = max(_positive_int(request.GET.get('page')), 1)
+    if kind == 'items':
+        results, has_next = full_text.search_items(request.user, query, page=page)
+    else:
+        results, has_next = full_text.search_resources(query, page=page)
+    context = {'query': query, 'kind': kind, 'results': results, 'page': page, 'has_next': has_next}
+    template = 'tracker/partials/search_results.html' if _is_fragment(request) else 'tracker/search.html'
+    return render(request, template, context)
 
 @login_required
 def add_item(request):
     if request.method == 'POST':
-        form = FoodItemForm(request.POST)
+        form = FoodItemForm(request.POST, request.FILES)
         if form.is_valid():
             obj = form.save(commit=False)
             obj.user = request.user
             obj.save()
+            if form.cleaned_data.get('receipt_image'):
+                attach_receipt(obj, form.cleaned_data['receipt_image'])
             return redirect('dashboard')
     else:
         form = FoodItemForm()
     return render(request, 'tracker/form.html', {'form': form, 'title': 'Add Item'})
 
+@login_required
+def import_items_view(request):
+    # Bulk import from a CSV/NDJSON upload; rows are streamed, validated and batch-inserted
+    result = None
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if upload:
+            result = import_items(request.user, upload, fmt=detect_format(upload.name))
+        else:
+            messages.warning(request, "No file selected.")
+    return render(request, 'tracker/import.html', {'result': result})
+
 @login_required
 def edit_item(request, pk):
     item = get_object_or_404(FoodItem, pk=pk, user=request.user)
     if request.method == 'POST':
-        form = FoodItemForm(request.POST, instance=item)
+        form = FoodItemForm(request.POST, request.FILES, instance=item)
         if form.is_valid():
-            form.save()
+            save_item_edit(form)
+            if form.cleaned_data.get('receipt_image'):
+                attach_receipt(item, form.cleaned_data['receipt_image'])
             return redirect('dashboard')
     else:
         form = FoodItemForm(instance=item)
@@ -133,7 +226,9 @@ def edit_item(request, pk):
 def delete_item(request, pk):
     item = get_object_or_404(FoodItem, pk=pk, user=request.user)
     if request.method == 'POST':
-        item.delete()
+        discard_item(item)
+        if _is_fragment(request):
+            return HttpResponse(status=204)
         return redirect('dashboard')
     return render(request, 'tracker/delete_confirm.html', {'item': item})
 
@@ -164,41 +259,172 @@ def profile(request):
 
 
 # --- REQUIREMENT 2: Log Consumption ---
+def _positive_int(value, default=1):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return default
+
 @login_required
 def log_food(request, pk):
     # Fetch the inventory item
     item = get_object_or_404(FoodItem, pk=pk, user=request.user)
     
     if request.method == 'POST':
-        consumed_qty = 1 
+        consumed_qty = _positive_int(request.POST.get('quantity'))
         
-        # Create the Log Entry with the dependency
-        ConsumptionLog.objects.create(
-            user=request.user,
-            source_item=item,
-            food_name=item.name,
-            category=item.category,
-            quantity=consumed_qty
-        )
+        # Locks the row and logs/decrements in one transaction (see tracker/services.py)
+        result = consume_items(request.user, {item.pk: consumed_qty})
+        if _is_fragment(request):
+            return _item_row_response(request, item.pk)
         
-        # Update Inventory Logic
-        if item.quantity > 1:
-            item.quantity -= 1
-            item.save()
-            messages.success(request, f"Logged 1 unit of {item.name}.")
-        else:
-            item.delete()
+        if result['finished']:
             messages.success(request, f"Finished {item.name}. Moved to history.")
+        elif result['logs']:
+            messages.success(request, f"Logged {result['logs'][0].quantity} unit(s) of {item.name}.")
+        else:
+            messages.warning(request, f"Nothing logged for {item.name}.")
             
         return redirect('dashboard')
         
     return render(request, 'tracker/log_confirm.html', {'item': item})
 
+@login_required
+def log_meal(request):
+    # Consume several items at once: POST item=<pk> (repeated) and quantity-<pk>=<units>
+    if request.method != 'POST':
+        return redirect('dashboard')
+
+    quantities = {}
+    for pk in request.POST.getlist('item'):
+        if pk.isdigit():
+            quantities[int(pk)] = _positive_int(request.POST.get(f'quantity-{pk}'))
+
+    result = consume_items(request.user, quantities)
+    if result['logs']:
+        units = sum(log.quantity for log in result['logs'])
+        messages.success(request, f"Logged {units} unit(s) across {len(result['logs'])} item(s).")
+    else:
+        messages.warning(request, "No items selected.")
+    return redirect('dashboard')
+
+@login_required
+def bulk_items(request):
+    # Checked rows of the dashboard table: POST item=<pk> (repeated), action and days
+    if request.method != 'POST':
+        return redirect('dashboard')
+
+    form = BulkActionForm(request.POST)
+    ids = [int(pk) for pk in request.POST.getlist('item') if pk.isdigit()]
+    if not ids or not form.is_valid():
+        messages.warning(request, "Select some items and an action.")
+        return redirect('dashboard')
+
+    # One transaction per action, however many items are selected (see tracker/services.py)
+    action = form.cleaned_data['action']
+    if action == 'consume':
+        result = consume_all(request.user, ids)
+        messages.success(request, f"Ate {len(result['logs'])} item(s).")
+    elif action == 'delete':
+        entries = discard_items(request.user, ids)
+        messages.success(request, f"Deleted {len(entries)} item(s).")
+    else:
+        days = form.cleaned_data['days']
+        moved = shift_expiry(request.user, ids, days)
+        messages.success(request, f"Moved the expiry date of {moved} item(s) by {days} day(s).")
+    return redirect('dashboard')
+
 # --- REQUIREMENT 2: History Page ---
+HISTORY_PAGE_SIZE = 50
+HISTORY_SUMMARY_DAYS = 30
+
+@login_required
+@reads_from_replica
+async def consumption_history(request):
+    # Keyset pagination on (date_consumed, id): every page is one index range-scan
+    request.user = user = await request.auser()
+    filter_form = HistoryFilterForm(request.GET)
+    logs = filter_form.filter(ConsumptionLog.objects.filter(user=user), 'date_consumed')
+    paginator = KeysetPaginator(logs, keys=('date_consumed', 'id'), per_page=HISTORY_PAGE_SIZE)
+
+    # Carry the active filters over to the next/prev links
+    filters = request.GET.copy()
+    for key in ('after', 'before'):
+        filters.pop(key, None)
+
+    # Per-category totals come from the daily rollups, not the raw logs
+    summary_rows = filter_form.filter(DailyRollup.objects.filter(user=user), 'day')
+    if not filter_form.cleaned_data.get('start'):
+        summary_rows = summary_rows.filter(day__gte=date.today() - timedelta(days=HISTORY_SUMMARY_DAYS))
+
+    async def totals():
+        return [row async for row in rollups.category_totals(summary_rows)]
+
+    page, category_totals = await asyncio.gather(
+        paginator.apage(after=request.GET.get('after'), before=request.GET.get('before')),
+        totals(),
+    )
+
+    return render(request, 'tracker/history.html', {
+        'logs': page,
+        'page': page,
+        'filter_form': filter_form,
+        'filter_query': filters.urlencode(),
+        'category_totals': category_totals,
+        'summary_days': HISTORY_SUMMARY_DAYS,
+    })
+
+
 @login_required
-def consumption_history(request):
-    logs = ConsumptionLog.objects.filter(user=request.user).order_by('-date_consumed')
-    return render(request, 'tracker/history.html', {'logs': logs})
+@reads_from_replica
+def insights(request):
+    # Precomputed nightly by `manage.py compute_insights`; see tracker/analytics.py
+    data = analytics.get_insights(request.user)
+    peak = max([row['count'] for row in data['expiry_histogram']] + [1])
+    return render(request, 'tracker/insights.html', {'insights': data, 'histogram_peak': peak})
+
+
+# --- Data Export ---
+def _export_params(request):
+    # ?format=csv|ndjson&start=YYYY-MM-DD&end=YYYY-MM-DD (bad dates are ignored)
+    fmt = request.GET.get('format', 'csv')
+    fmt = fmt if fmt in exporters.FORMATS else 'csv'
+    form = HistoryFilterForm(request.GET)
+    dates = form.cleaned_data if form.is_valid() else {}
+    return fmt, dates.get('start'), dates.get('end')
+
+@login_required
+@reads_from_replica
+def export_items(request):
+    fmt, start, end = _export_params(request)
+    rows = exporters.item_rows(request.user, start, end)
+    return exporters.export_response(exporters.ITEM_FIELDS, rows, fmt, 'inventory')
+
+@login_required
+@reads_from_replica
+def export_history(request):
+    fmt, start, end = _export_params(request)
+    rows = exporters.log_rows(request.user, start, end)
+    return exporters.export_response(exporters.LOG_FIELDS, rows, fmt, 'consumption-history')
+
+
+# --- Monitoring ---
+def metrics_view(request):
+    # Prometheus text format; 404 unless metrics are on, bearer token if METRICS_TOKEN is set
+    if not settings.TRACKER_METRICS_ENABLED:
+        raise Http404
+    token = settings.METRICS_TOKEN
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse(status=401)
+
+    stats = cache_stats()
+    extra = [
+        '# HELP tracker_dashboard_cache_total Dashboard summary cache lookups.',
+        '# TYPE tracker_dashboard_cache_total counter',
+        f'tracker_dashboard_cache_total{{result="hit"}} {stats["hits"]}',
+        f'tracker_dashboard_cache_total{{result="miss"}} {stats["misses"]}',
+    ]
+    return HttpResponse(render_prometheus(extra), content_type='text/plain; version=0.0.4')
 
 
 # Add this import at the top
@@ -218,8 +444,8 @@ def upload_image(request, pk):
     if request.method == 'POST':
         # Check if a file was actually sent
         if 'receipt_image' in request.FILES:
-            item.receipt_image = request.FILES['receipt_image']
-            item.save()
+            # Stored under its content hash; thumbnails are made in the background
+            attach_receipt(item, request.FILES['receipt_image'])
             messages.success(request, f"Image uploaded for {item.name}!")
             return redirect('dashboard')
         else: